@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks of the DIAL inversion and the optimal estimation retrieval.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import constants
+from dialpy.equations.differential_co2_concentration import xco2_beta
+from dialpy.equations.differential_co2_concentration import xco2_power
+
+
+def _per_profile(fun, *fields):
+    return [fun(*[f[i] for f in fields]) for i in range(fields[0].shape[0])]
+
+
+def bench_xco2_beta(benchmark, scene):
+    benchmark(_per_profile, xco2_beta, scene['delta_sigma_abs'], scene['beta_att_on'], scene['beta_att_off'])
+
+
+def bench_xco2_power(benchmark, scene):
+    benchmark(_per_profile, xco2_power, scene['power_on'], scene['power_off'], scene['delta_sigma_abs'],
+              scene['P_bkg'])
+
+
+class _OptimalEstimation:
+    """Gauss-Newton optimal estimation, Rodgers (2000) Eq. (5.9), with the interface of
+    pyOptimalEstimation.optimalEstimation used in scripts/DIAL_xco2_retrieval.py. Stands in for the vendored package
+    when it is not installed, thus the per-gate loop is benchmarked in any case."""
+
+    def __init__(self, x_vars, x_ap, x_cov, y_vars, y_obs, y_cov, forward):
+        self.x_a = np.asarray(x_ap, dtype=float)
+        self.S_a = np.asarray(x_cov, dtype=float)
+        self.y_obs = np.atleast_1d(y_obs).astype(float)
+        self.S_e = np.diag(np.atleast_1d(y_cov).astype(float))
+        self.forward = forward
+        self.x_op = None
+
+    def _jacobian(self, x_):
+        y_ = np.atleast_1d(self.forward(x_))
+        dx_ = 1e-4 * np.maximum(np.abs(x_), 1.)
+        K_ = np.stack([(np.atleast_1d(self.forward(x_ + np.eye(len(x_))[j] * dx_[j])) - y_) / dx_[j]
+                       for j in range(len(x_))], axis=-1)
+        return y_, K_
+
+    def doRetrieval(self, maxIter=10):
+        x_, converged = self.x_a, False
+        for _ in range(maxIter):
+            y_, K_ = self._jacobian(x_)
+            gain_ = self.S_a @ K_.T @ np.linalg.inv(K_ @ self.S_a @ K_.T + self.S_e)
+            x_next = self.x_a + gain_ @ (self.y_obs - y_ + K_ @ (x_ - self.x_a))
+            converged = np.allclose(x_next, x_, rtol=1e-6, atol=0)
+            x_ = x_next
+            if converged:
+                break
+        self.x_op = x_
+        return converged
+
+
+def _optimal_estimation():
+    """optimalEstimation of the vendored pyOptimalEstimation, or _OptimalEstimation if it is missing."""
+    try:
+        from dialpy.pyOptimalEstimation import pyOptimalEstimation as pyOE
+    except ImportError:
+        return _OptimalEstimation
+    return pyOE.optimalEstimation
+
+
+def bench_oe_retrieval_profile(benchmark, profile_scene):
+    """Per-gate optimal estimation loop of scripts/DIAL_xco2_retrieval.py for one profile."""
+    optimal_estimation = _optimal_estimation()
+    benchmark.extra_info['optimal_estimation'] = optimal_estimation.__module__
+    scene = profile_scene
+    N_d, _ = xco2_beta(scene['delta_sigma_abs'][0], scene['beta_att_on'][0], scene['beta_att_off'][0])
+    co2_ppm, T_, P_ = scene['co2_ppm'][0], scene['temperature'][0], scene['pressure'][0]
+    valid_ = np.flatnonzero(np.isfinite(N_d))
+
+    def forward(X):
+        co2_ppm_, T_, P_ = X
+        return (co2_ppm_ * constants.LOCHSMIDTS_NUMBER_AIR * 273.15 * P_) / (T_ * 1e6) / 1e22
+
+    def retrieval():
+        x_cov = np.array([[5, 0, 0], [0, 1, 0], [0, 0, .1]])
+        for i in valid_:
+            oe = optimal_estimation(["co2_ppm", "temperature", "pressure"], [co2_ppm[i], T_[i], P_[i]], x_cov,
+                                    ["N_d"], np.array(N_d[i] / 1e21), np.array([1]), forward)
+            oe.doRetrieval(maxIter=100)
+
+    benchmark.pedantic(retrieval, rounds=1, iterations=1)
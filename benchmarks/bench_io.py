@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks of the netCDF writer.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import pytest
+
+pytest.importorskip("netCDF4")
+
+
+def bench_write_nc(benchmark, scene, tmp_path):
+    from dialpy.utilities.dl_var_atts import dl_var_atts as vatts
+    from dialpy.utilities import nc_tools
+
+    n_time, n_range = scene['co2_ppm'].shape
+    data_out = [vatts("time", data=scene['time'], dim_size=(n_time, )),
+                vatts("range", data=scene['range'], dim_size=(n_range, )),
+                vatts("temperature", data=scene['temperature'], dim_size=(n_time, n_range)),
+                vatts("pressure", data=scene['pressure'], dim_size=(n_time, n_range)),
+                vatts("carbon_dioxide_concentration", data=scene['co2_ppm'], dim_size=(n_time, n_range)),
+                vatts("number_density", data=scene['number_density'], dim_size=(n_time, n_range))]
+
+    benchmark(nc_tools.write_nc_, "20200508", str(tmp_path / "DIAL_retrieval.nc"), data_out)
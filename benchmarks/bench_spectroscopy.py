@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks of the spectroscopy functions.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import pytest
+from dialpy.equations import constants
+
+bytran = pytest.importorskip("dialpy.equations.bytran_abs_cross_section")
+johnsson = pytest.importorskip("dialpy.equations.Johnsson_absroption_cross_section")
+simulate_dial = pytest.importorskip("dialpy.utilities.simulate_dial")
+
+_NU_ON = 1 / (constants.LAMBDA_ON * 1e2)  # (cm-1)
+
+
+def bench_read_hitran_data(benchmark):
+    benchmark(bytran.read_hitran_data, _NU_ON)
+
+
+def bench_absorption_coefficient(benchmark, scene):
+    benchmark(bytran.absorption_coefficient, scene['range'], _NU_ON, scene['temperature'], scene['co2_ppm'],
+              scene['pressure'])
+
+
+def bench_delta_absorption_cross_section(benchmark, scene):
+    benchmark(johnsson.delta_absorption_cross_section, scene['temperature'],
+              scene['pressure'] * constants.STANDARD_PRESSURE)
+
+
+def bench_absorption_cross_section_field(benchmark, scene):
+    benchmark(simulate_dial.absorption_cross_section, constants.LAMBDA_ON, scene['temperature'],
+              scene['pressure'], scene['co2_ppm'])
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks of the autocorrelation, spectra and velocity statistics functions, run on the attenuated backscatter
+fields of the synthetic scenes as stand-in time series.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import acf
+from dialpy.equations import turbulence_spectra as ts
+from dialpy.equations import velocity_statistics as vs
+
+# number of range gates of the slow per-gate reference implementations
+_N_GATES_PER_GATE_LOOP = 3
+
+
+def _series(scene):
+    x = scene['beta_att_off'] * 1e6
+    return scene['time'] * 3600, x - np.mean(x, axis=0)
+
+
+def bench_acf_fast_normalized_per_gate(benchmark, time_series_scene):
+    _, x = _series(time_series_scene)
+    benchmark(lambda: [acf.acf_fast_normalized(x[:, i]) for i in range(x.shape[1])])
+
+
+def bench_acf_fast_normalized_batch(benchmark, time_series_scene):
+    _, x = _series(time_series_scene)
+    benchmark(acf.acf_fast_normalized_batch, x)
+
+
+def bench_lomb_scargle_periodogram_per_gate(benchmark, time_series_scene):
+    t, x = _series(time_series_scene)
+    benchmark.pedantic(lambda: [ts.lomb_scargle_periodogram(t, x[:, i]) for i in range(_N_GATES_PER_GATE_LOOP)],
+                       rounds=1, iterations=1)
+
+
+def bench_lomb_scargle_periodogram_batch(benchmark, time_series_scene):
+    t, x = _series(time_series_scene)
+    benchmark.pedantic(ts.lomb_scargle_periodogram_batch, args=(t, x[:, :_N_GATES_PER_GATE_LOOP]), rounds=3,
+                       iterations=1)
+
+
+def bench_sigma2w_lenschow_batch(benchmark, time_series_scene):
+    _, x = _series(time_series_scene)
+    benchmark(vs.sigma2w_lenschow_batch, x)
+
+
+def bench_fit_kristensen_model(benchmark):
+    rng = np.random.default_rng(0)
+    k_ = np.logspace(-3, 0, 60)
+    n_ = 1000
+    k_sk = ts.kristensen_spectral_intensity_batch(k_, rng.uniform(.1, 2, n_), rng.uniform(.5, 1.5, n_),
+                                                  rng.uniform(100, 2000, n_)) * np.exp(rng.normal(0, .2, (n_, 60)))
+    benchmark(ts.fit_kristensen_model, k_, k_sk)
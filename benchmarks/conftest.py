@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Shared fixtures for the benchmark suite.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import os
+from functools import lru_cache
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", ".results")
+
+# number of profiles in a synthetic scene, one profile every 30 s
+SCENE_SIZES = {'profile': 1, 'hour': 120, 'day': 2880}
+N_RANGE = 400
+
+
+@lru_cache(maxsize=None)
+def dial_scene(size_name):
+    """Seeded synthetic DIAL scene, generated once per size and session."""
+    from dialpy.utilities.simulate_dial import simulate_dial_scene
+    return simulate_dial_scene(n_time=SCENE_SIZES[size_name], n_range=N_RANGE, dt=30., seed=0)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Saved runs go to benchmarks/.results of the repository whatever the working directory, unless
+    --benchmark-storage is given."""
+    if config.getoption("benchmark_storage") == "file://./.benchmarks":
+        config.option.benchmark_storage = "file://" + RESULTS_DIR
+
+
+@pytest.fixture(autouse=True)
+def _in_repo_root(monkeypatch):
+    """HITRAN and partition sum files are given relative to the repository root, see constants.py."""
+    monkeypatch.chdir(REPO_ROOT)
+
+
+@pytest.fixture(params=list(SCENE_SIZES))
+def scene(request):
+    return dial_scene(request.param)
+
+
+@pytest.fixture(params=['hour', 'day'])
+def time_series_scene(request):
+    return dial_scene(request.param)
+
+
+@pytest.fixture
+def profile_scene():
+    return dial_scene('profile')
@@ -22,6 +22,12 @@ COMMON_ATTRIBUTES = {
         "units": "hours since midnight UTC",
         "dim_name": "time",
         "comment": ""},
+    "time_3min": {
+        "standard_name": "time_hours_utc",
+        "long_name": "Time UTC, center of 3 min blocks",
+        "units": "hours since midnight UTC",
+        "dim_name": "time_3min",
+        "comment": ""},
     "range": {
         "standard_name": "range",
         "long_name": "Range from the instrument",
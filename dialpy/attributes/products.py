@@ -16,6 +16,19 @@ Created on Thu Jun 13 13:48:23 2019
 #               for 1D variable - "dim_name": "time" or "dim_name": "range"
 #               for 2D variable - "dim_name": ("time", "range")
 #               for nD variable - "dim_name": ("time", "range", "foobar", ..., "month")
+# and optionally:
+#   data_type, netCDF4 data type, default "f8"
+#   extra_attributes, dict of additional variable attributes, e.g. flag_values and flag_meanings
+
+import numpy as np
+
+# ABL classes, see equations.abl_classification
+ABL_CLASS_MEANINGS = ("no_signal", "non_turbulent", "convective_mixing", "cloud_driven", "wind_shear_driven",
+                      "intermittent_turbulence", "in_cloud", "precipitation", "free_troposphere")
+
+# cloud_precip flags, see equations.cloud_precip
+CLOUD_PRECIP_FLAG_MEANINGS = ("clear", "cloud", "precipitation", "above_cloud_base")
+
 PRODUCT_ATTRIBUTES = {
     "wind_speed": {
         "standard_name": "wind_speed",
@@ -107,6 +120,92 @@ PRODUCT_ATTRIBUTES = {
         "units": "m s-1",
         "comment": "See Eq. (10-11) in doi:10.5194/amt-8-2251-2015, and Eq. (7) in doi:10.5194/amt-10-1229-2017.",
         "dim_name": ("time", "range")},
+    "vector_wind_shear_3min": {
+        "standard_name": "vector_wind_shear",
+        "long_name": "vector wind shear, 3 min average",
+        "units": "s-1",
+        "comment": "sqrt((du/dz)^2 + (dv/dz)^2) of 3 min block averaged winds, second order finite differences",
+        "dim_name": ("time_3min", "range")},
+    "vector_wind_shear_error_3min": {
+        "standard_name": "vector_wind_shear_error",
+        "long_name": "error of vector wind shear, 3 min average",
+        "units": "s-1",
+        "comment": "errors of the 3 min block averaged winds propagated through the finite differences",
+        "dim_name": ("time_3min", "range")},
+    "epsilon_3min": {
+        "standard_name": "turbulent_kinetic_energy_dissipation_rate",
+        "long_name": "TKE dissipation rate, 3 min blocks",
+        "units": "m2 s-3",
+        "comment": "From the noise free variance of vertical velocity, see Eq. (11) in doi:10.1175/2010JTECHA1455.1",
+        "dim_name": ("time_3min", "range")},
+    "epsilon_error_3min": {
+        "standard_name": "turbulent_kinetic_energy_dissipation_rate_fractional_error",
+        "long_name": "fractional uncertainty of TKE dissipation rate, 3 min blocks",
+        "units": "1",
+        "comment": "Random error of the variance of vertical velocity and, if given, of the wind speed propagated",
+        "dim_name": ("time_3min", "range")},
+    "attbeta_mean_3min": {
+        "standard_name": "attenuated_backscatter_coefficient_mean",
+        "long_name": "mean of attenuated backscatter, 3 min blocks",
+        "units": "m-1 sr-1",
+        "comment": "",
+        "dim_name": ("time_3min", "range")},
+    "attbeta_variance_3min": {
+        "standard_name": "attenuated_backscatter_coefficient_variance",
+        "long_name": "variance of attenuated backscatter, 3 min blocks",
+        "units": "m-2 sr-2",
+        "comment": "unbiased (n - 1)",
+        "dim_name": ("time_3min", "range")},
+    "w_mean_3min": {
+        "standard_name": "upward_air_velocity_mean",
+        "long_name": "mean of vertical velocity, 3 min blocks",
+        "units": "m s-1",
+        "comment": "",
+        "dim_name": ("time_3min", "range")},
+    "w_variance_3min": {
+        "standard_name": "upward_air_velocity_variance",
+        "long_name": "variance of vertical velocity, 3 min blocks",
+        "units": "m2 s-2",
+        "comment": "unbiased (n - 1), noise not removed",
+        "dim_name": ("time_3min", "range")},
+    "attbeta_velo_covariance_3min": {
+        "standard_name": "attenuated_backscatter_upward_air_velocity_covariance",
+        "long_name": "covariance of attenuated backscatter and vertical velocity, 3 min blocks",
+        "units": "m-1 sr-1 m s-1",
+        "comment": "unbiased (n - 1), from samples where both are valid",
+        "dim_name": ("time_3min", "range")},
+    "attbeta_velo_correlation_3min": {
+        "standard_name": "attenuated_backscatter_upward_air_velocity_correlation",
+        "long_name": "correlation coefficient of attenuated backscatter and vertical velocity, 3 min blocks",
+        "units": "1",
+        "comment": "from samples where both are valid",
+        "dim_name": ("time_3min", "range")},
+    "abl_class_3min": {
+        "standard_name": "atmospheric_boundary_layer_classification",
+        "long_name": "atmospheric boundary layer classification, 3 min blocks",
+        "units": "1",
+        "comment": "Rule based classification of turbulence and its source, see doi:10.1029/2017JD028169",
+        "dim_name": ("time_3min", "range"),
+        "data_type": "i1",
+        "extra_attributes": {
+            "flag_values": np.arange(len(ABL_CLASS_MEANINGS), dtype=np.int8),
+            "flag_meanings": " ".join(ABL_CLASS_MEANINGS)}},
+    "cloud_precip_flag": {
+        "standard_name": "cloud_precipitation_flag",
+        "long_name": "cloud and precipitation flag",
+        "units": "1",
+        "comment": "From attenuated backscatter and vertical velocity, cleaned up by morphological opening and closing",
+        "dim_name": ("time", "range"),
+        "data_type": "i1",
+        "extra_attributes": {
+            "flag_values": np.arange(len(CLOUD_PRECIP_FLAG_MEANINGS), dtype=np.int8),
+            "flag_meanings": " ".join(CLOUD_PRECIP_FLAG_MEANINGS)}},
+    "cloud_base_height": {
+        "standard_name": "cloud_base_altitude",
+        "long_name": "range of the lowest cloud base",
+        "units": "m",
+        "comment": "",
+        "dim_name": "time"},
     "number_density": {
         "standard_name": "number_density",
         "long_name": "initial number density",
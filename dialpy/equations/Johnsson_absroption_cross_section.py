@@ -8,11 +8,14 @@ Antti J Manninen
 Finnish Meteorological Institute
 """
 
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from scipy.integrate import quad
 from dialpy.utilities import general_utils as gu
+from dialpy.utilities.profiling import timed_stage
 from dialpy.equations import constants
+from dialpy.equations import spectroscopy
 
 temperature = 293  # (K) = 20 celsius
 
@@ -138,35 +141,44 @@ def absorption_cross_section(S_, gamma_L, gamma_D, nu, nu_0):
     return sigma_abs
 
 
-def delta_absorption_cross_section(T_, P_):
-    """
+_JOHNSSON_MODELS = dict(intensity_model='power_law', width_model='air', pressure_units='Pa', pressure_shift=False)
+
+
+@lru_cache(maxsize=8)
+def _laser_convolution(lambda_, laser_fwhm):
+    """Cached laser line convolution of a channel, see spectroscopy.LaserConvolution."""
+    return spectroscopy.LaserConvolution(spectroscopy.wavelength_to_wavenumber(lambda_), fwhm=laser_fwhm,
+                                         **_JOHNSSON_MODELS)
+
+
+@timed_stage("spectroscopy")
+def delta_absorption_cross_section(T_, P_, lambda_on=constants.LAMBDA_ON, lambda_off=constants.LAMBDA_OFF,
+                                   laser_fwhm=None):
+    """Differential absorption cross section of the ON and OFF wavelengths with the models of Johnson et al. (2013)
+    and Browell et al. (1991): T^(3/2) intensity scaling and air-broadened Lorentz width, Voigt line shape, see
+    spectroscopy.absorption_cross_section. Vectorized over T_ and P_.
 
     Args:
-        T_:
-        P_:
+        T_: (float) temperature (K)
+        P_: (float) pressure (Pa)
+        lambda_on: (float) Optional. ON wavelength (m), default constants.LAMBDA_ON
+        lambda_off: (float) Optional. OFF wavelength (m), default constants.LAMBDA_OFF
+        laser_fwhm: (float) Optional. Linewidth of the (Gaussian) laser line (cm-1), see
+                    spectroscopy.frequency_to_wavenumber. If given, the cross sections are convolved with the laser
+                    line and cached per (T_, P_), default monochromatic
 
     Returns:
+        delta_sigma_abs: (float) sigma_abs_ON - sigma_abs_OFF (m2)
 
     """
 
-    nu_ON = 1 / constants.LAMBDA_ON
-    nu_OFF = 1 / constants.LAMBDA_OFF
-    nu_0_ON, S_0_ON, gamma_0_ON, E_ON, a_ON = read_hitran_data(nu_ON)
-    nu_0_OFF, S_0_OFF, gamma_0_OFF, E_OFF, a_OFF = read_hitran_data(nu_OFF)
-    T_0 = constants.REFERENCE_ABS_TEMPERATURE
-    h_ = constants.PLANCKS_CONSTANT
-    k_ = constants.BOLTZMANNS_CONSTANT_erg
-    c_ = constants.SPEED_OF_LIGHT
-    P_0 = constants.STANDARD_PRESSURE
-    m_ = constants.MOLECULAR_MASS_CO2
-
-    S_ON = line_intensity(S_0_ON, T_0, T_, h_, c_, nu_0_ON, k_, E_ON)
-    S_OFF = line_intensity(S_0_OFF, T_0, T_, h_, c_, nu_0_OFF, k_, E_OFF)
-    gamma_L_ON = pressure_broadened_linewidth(gamma_0_ON, P_, P_0, T_0, T_, a_ON)
-    gamma_L_OFF = pressure_broadened_linewidth(gamma_0_OFF, P_, P_0, T_0, T_, a_OFF)
-    gamma_D_ON = doppler_broadened_linewidth(nu_0_ON, c_, k_, T_, m_)
-    gamma_D_OFF = doppler_broadened_linewidth(nu_0_OFF, c_, k_, T_, m_)
-    sigma_abs_ON = absorption_cross_section(S_ON, gamma_L_ON, gamma_D_ON, nu_ON, nu_0_ON)
-    sigma_abs_OFF = absorption_cross_section(S_OFF, gamma_L_OFF, gamma_D_OFF, nu_OFF, nu_0_OFF)
+    if laser_fwhm is not None:
+        return _laser_convolution(lambda_on, laser_fwhm).cross_section(T_, P_) - \
+            _laser_convolution(lambda_off, laser_fwhm).cross_section(T_, P_)
+
+    sigma_abs_ON = spectroscopy.absorption_cross_section(spectroscopy.wavelength_to_wavenumber(lambda_on), T_, P_,
+                                                         **_JOHNSSON_MODELS)
+    sigma_abs_OFF = spectroscopy.absorption_cross_section(spectroscopy.wavelength_to_wavenumber(lambda_off), T_, P_,
+                                                          **_JOHNSSON_MODELS)
 
     return sigma_abs_ON - sigma_abs_OFF
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for the atmospheric boundary layer classification product (ABLclass).
+
+Following the idea of Manninen et al. (2018) doi:10.1029/2017JD028169, each (time, height) cell is labelled as turbulent
+or not by the dissipation rate (or the variance of vertical velocity), and turbulent cells are attributed to a source by
+their connection to the surface or to a cloud, and by the wind shear. Clouds and precipitation are the masks of the
+cloud_precip product, and the top of the aerosol layer comes from the vertical gradient of attenuated backscatter. Any
+of the inputs may be missing, the rules of the missing ones are skipped. The rules are boolean masks of the whole day,
+and the connection of turbulence to the surface or to a cloud is found with accumulated minima and maxima of gate
+indices along height, thus there is no per-profile logic.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from netCDF4 import Dataset
+from dialpy.attributes.products import ABL_CLASS_MEANINGS
+from dialpy.equations.cloud_precip import DEFAULT_THRESHOLDS as CLOUD_PRECIP_THRESHOLDS, cloud_precip_masks
+from dialpy.equations.rolling_statistics import nc_variables_3min
+
+# class labels, stored as int8
+ABL_CLASSES = {name: np.int8(i) for i, name in enumerate(ABL_CLASS_MEANINGS)}
+
+# thresholds of cloud_precip (beta_cloud, beta_precipitation, w_precipitation) and of the turbulence rules
+DEFAULT_THRESHOLDS = dict(
+    CLOUD_PRECIP_THRESHOLDS,
+    epsilon=1e-4,  # turbulent above (m2 s-3)
+    w_variance=.1,  # turbulent above, used if epsilon not given (m2 s-2)
+    shear=.03,  # wind shear driven above (s-1)
+    beta_signal=1e-8)  # no signal below (m-1 sr-1)
+
+# product variable read for each input of abl_class
+_INPUT_VARIABLES = {
+    "beta_att": "attbeta_mean_3min",
+    "w_mean": "w_mean_3min",
+    "w_variance": "w_variance_3min",
+    "epsilon": "epsilon_3min",
+    "shear": "vector_wind_shear_3min"}
+
+
+def _nearest_above(mask_):
+    """Index of the nearest gate strictly above each gate where 'mask_' is True, n_gates if none, shape of 'mask_'."""
+    n_gates = mask_.shape[1]
+    idx_ = np.where(mask_, np.arange(n_gates), n_gates)
+    at_or_above = np.minimum.accumulate(idx_[:, ::-1], axis=1)[:, ::-1]
+    return np.concatenate([at_or_above[:, 1:], np.full((mask_.shape[0], 1), n_gates)], axis=1)
+
+
+def _nearest_below(mask_):
+    """Index of the nearest gate at or below each gate where 'mask_' is True, -1 if none, shape of 'mask_'."""
+    return np.maximum.accumulate(np.where(mask_, np.arange(mask_.shape[1]), -1), axis=1)
+
+
+def aerosol_layer_top(z_, beta_att, below_=None):
+    """Height of the strongest decrease of log10 attenuated backscatter of each profile.
+
+    Args:
+        z_ (ndarray): heights (m), increasing, shape (height,)
+        beta_att (ndarray): attenuated backscatter (m-1 sr-1), shape (time, height)
+        below_ (ndarray): Optional. Gates considered, e.g. below the cloud base, shape (time, height)
+
+    Returns:
+        i_top (ndarray): gate index of the aerosol layer top, -1 where not found, shape (time,)
+
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gradient_ = np.gradient(np.log10(beta_att), z_, axis=1)
+    if below_ is not None:
+        gradient_ = np.where(below_, gradient_, np.nan)
+    gradient_ = np.where(np.isfinite(gradient_), gradient_, np.inf)
+    i_top = np.argmin(gradient_, axis=1)
+    i_top[~np.isfinite(gradient_[np.arange(len(i_top)), i_top])] = -1
+    return i_top
+
+
+def abl_class(z_, beta_att=None, w_mean=None, w_variance=None, epsilon=None, shear=None, thresholds=None):
+    """Boundary layer class of each (time, height) cell. All inputs are on the same grid, e.g. 3 min blocks, and
+    optional, at least one has to be given.
+
+    Args:
+        z_ (ndarray): heights (m), increasing, shape (height,)
+        beta_att (ndarray): Optional. Attenuated backscatter (m-1 sr-1), shape (time, height)
+        w_mean (ndarray): Optional. Mean vertical velocity (m s-1), for precipitation
+        w_variance (ndarray): Optional. Variance of vertical velocity (m2 s-2), for turbulence if 'epsilon' not given
+        epsilon (ndarray): Optional. TKE dissipation rate (m2 s-3), for turbulence
+        shear (ndarray): Optional. Vector wind shear (s-1)
+        thresholds (dict): Optional. Updates DEFAULT_THRESHOLDS
+
+    Returns:
+        classes (ndarray): int8, see ABL_CLASSES, shape (time, height)
+
+    """
+    limits = dict(DEFAULT_THRESHOLDS)
+    if thresholds is not None:
+        limits.update(thresholds)
+    given = [f_ for f_ in (beta_att, w_mean, w_variance, epsilon, shear) if f_ is not None]
+    if not given:
+        raise ValueError("At least one of beta_att, w_mean, w_variance, epsilon, or shear has to be given")
+    shape_ = np.shape(given[0])
+    z_ = np.asarray(z_, dtype=float)
+
+    def field(f_):
+        return np.full(shape_, np.nan) if f_ is None else np.asarray(f_, dtype=float)
+
+    beta_att, w_mean, w_variance, epsilon, shear = map(field, (beta_att, w_mean, w_variance, epsilon, shear))
+    # cleaned up masks and cloud base (-1 if none) of the cloud_precip product
+    in_cloud, precipitation_, cloud_base = cloud_precip_masks(
+        beta_att, velo=w_mean, thresholds={name: limits[name] for name in CLOUD_PRECIP_THRESHOLDS})
+
+    with np.errstate(invalid='ignore'):
+        # turbulence from epsilon, or from the variance of vertical velocity where epsilon is missing
+        has_turbulence = np.isfinite(epsilon) | np.isfinite(w_variance)
+        turbulent_ = np.where(np.isfinite(epsilon), epsilon > limits["epsilon"], w_variance > limits["w_variance"])
+        no_signal = ~has_turbulence & ~(beta_att > limits["beta_signal"])
+        strong_shear = shear > limits["shear"]
+
+    # connection of turbulence to the surface: no break below, gates below the first valid one are not breaks
+    first_valid = np.cumsum(has_turbulence, axis=1) > 0
+    surface_connected = turbulent_ & (_nearest_below(first_valid & ~turbulent_) < 0)
+    # connection to a cloud: the nearest cloud above is closer than the nearest non-turbulent gate above
+    cloud_connected = turbulent_ & (_nearest_above(in_cloud) < _nearest_above(~turbulent_ & ~in_cloud))
+
+    classes = np.full(shape_, ABL_CLASSES["non_turbulent"], dtype=np.int8)
+    if np.any(np.isfinite(beta_att)):
+        below_cloud = (cloud_base[:, np.newaxis] < 0) | (np.arange(shape_[1]) < cloud_base[:, np.newaxis])
+        i_top = aerosol_layer_top(z_, beta_att, below_=below_cloud)
+        above_aerosol = (np.arange(shape_[1]) > i_top[:, np.newaxis]) & (i_top[:, np.newaxis] >= 0)
+        classes[above_aerosol & ~turbulent_] = ABL_CLASSES["free_troposphere"]
+
+    # rules in increasing priority, later ones overwrite
+    rules = ((turbulent_, "intermittent_turbulence"),
+             (surface_connected, "convective_mixing"),
+             (turbulent_ & strong_shear & ~cloud_connected, "wind_shear_driven"),
+             (cloud_connected & ~surface_connected, "cloud_driven"),
+             (no_signal, "no_signal"),
+             (precipitation_, "precipitation"),
+             (in_cloud, "in_cloud"))
+    for mask_, name in rules:
+        classes[mask_] = ABL_CLASSES[name]
+
+    return classes
+
+
+def read_abl_inputs(file_names):
+    """Reads the inputs of abl_class present in product files on the same 3 min grid, e.g. the outputs of
+    covariance_statistics, dissipation_rate and wind_shear.
+
+    Args:
+        file_names (list): full paths of the netCDF files
+
+    Returns:
+        time_3min (ndarray): block centers (hours), shape (blocks,)
+        range_ (ndarray): range (m), shape (range,)
+        inputs (dict): keyword arguments of abl_class found in the files
+
+    """
+    time_3min = range_ = None
+    inputs = {}
+    for file_name in file_names:
+        with Dataset(file_name, "r") as nc:
+            if time_3min is None:
+                time_3min = nc.variables["time_3min"][:]
+                range_ = nc.variables["range"][:]
+            for arg_name, var_name in _INPUT_VARIABLES.items():
+                if var_name in nc.variables and arg_name not in inputs:
+                    inputs[arg_name] = np.ma.filled(nc.variables[var_name][:].astype(float), np.nan)
+    return time_3min, range_, inputs
+
+
+def abl_class_nc_variables(time_3min, range_, classes):
+    """netCDF variables of the ABLclass product, see nc_tools.write_nc_.
+
+    Returns:
+        obs (list): VarBlueprint of time_3min, range, and abl_class_3min
+
+    """
+    return nc_variables_3min(time_3min, range_, {"abl_class_3min": np.asarray(classes, dtype=np.int8)})
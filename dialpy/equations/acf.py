@@ -84,6 +84,59 @@ def acf_fast_normalized(x):
     return c[:len(x)//2]
 
 
+def acf_fast_unnormalized_batch(x, max_lag=None):
+    """Fast autocovariance of many signals at once using zero-padded FFTs along the first axis. Missing samples (NaN)
+    are masked separately for each signal and each lag is normalized with the number of valid sample pairs.
+
+    Args:
+        x (array like): input signals, shape (time,) or (time, signals), e.g. (time, range)
+        max_lag (int): Optional. Largest lag returned, default len(x)//2 - 1
+
+    Returns:
+        r2 (ndarray): autocovariance as a function of lag, shape (lag,) or (lag, signals)
+        n_pairs (ndarray): number of valid sample pairs at each lag, same shape as r2
+
+    """
+    x = np.asarray(x, dtype=float)
+    n_ = x.shape[0]
+    if max_lag is None:
+        max_lag = n_ // 2 - 1
+
+    mask_ = np.isfinite(x)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x0 = np.where(mask_, x - np.nansum(x, axis=0) / np.sum(mask_, axis=0), 0)
+
+    # zero padding to at least 2n avoids circular wrap around
+    n_fft = 1 << int(np.ceil(np.log2(2 * n_)))
+    r2 = np.fft.irfft(np.abs(np.fft.rfft(x0, n=n_fft, axis=0))**2, n=n_fft, axis=0)[:max_lag+1]
+    n_pairs = np.fft.irfft(np.abs(np.fft.rfft(mask_.astype(float), n=n_fft, axis=0))**2, n=n_fft,
+                           axis=0)[:max_lag+1]
+    n_pairs = np.round(n_pairs)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r2 = np.where(n_pairs > 0, r2 / n_pairs, np.nan)
+
+    return r2, n_pairs
+
+
+def acf_fast_normalized_batch(x, max_lag=None):
+    """Fast autocorrelation of many signals at once using zero-padded FFTs along the first axis, normalized with the
+    lag 0 autocovariance (variance). NaNs are masked, see acf_fast_unnormalized_batch.
+
+    Args:
+        x (array like): input signals, shape (time,) or (time, signals), e.g. (time, range)
+        max_lag (int): Optional. Largest lag returned, default len(x)//2 - 1
+
+    Returns:
+        c (ndarray): autocorrelation as a function of lag, shape (lag,) or (lag, signals)
+
+    """
+    r2, _ = acf_fast_unnormalized_batch(x, max_lag=max_lag)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        c = r2 / r2[0]
+    return c
+
+
 def integrated_autocorr(acorrn, n, window=None):
     """Calculates the integrated autocorellations by integrating
     up to a window length, w, across the autocorrelation function
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for reading model (NWP) or sounding profiles and interpolating them onto the lidar (time, range) grid,
+e.g. the temperature and pressure of the first guess of the DIAL retrieval.
+
+Profiles are interpolated linearly in height at each source time, pressure in log(P), and then linearly in time; values
+beyond the source grid are clamped to the nearest source value. The indices and weights depend only on the source and
+lidar grids, they are found with searchsorted and cached by a digest of the grids, thus the next day with the same
+grids, e.g. hourly model output and the same range gates, reuses them.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import hashlib
+from collections import namedtuple
+import numpy as np
+from netCDF4 import Dataset
+from dialpy.equations.spectroscopy import pressure_to_atm
+from dialpy.equations.spectroscopy_cache import LRUCache
+
+# (i_0, i_1, weight_) of time, shape (time,), and of height, shape (height,) or (time_src, height) as 'height_src'
+GridWeights = namedtuple('GridWeights', ['t_0', 't_1', 't_weight', 'z_0', 'z_1', 'z_weight'])
+
+_WEIGHTS = LRUCache(maxsize=32)
+
+
+def clear_cache():
+    """Empties the cache of interpolation weights and resets the statistics."""
+    _WEIGHTS.clear()
+
+
+def cache_info():
+    """Hits, misses and size of the cache of interpolation weights."""
+    return {"hits": _WEIGHTS.hits, "misses": _WEIGHTS.misses, "size": len(_WEIGHTS.data)}
+
+
+def _bracket(x_src, x_out):
+    """Indices of the bracketing source points and the weight of the upper one, clamped to the source range, along the
+    last axis of 'x_src' (increasing), shape (len(x_out),) or (len(x_src), len(x_out)) of a 2D 'x_src'."""
+    n_src = x_src.shape[-1]
+    if n_src == 1:
+        i_0 = np.zeros(x_src.shape[:-1] + x_out.shape, dtype=int)
+        return i_0, i_0, np.zeros(i_0.shape)
+    if x_src.ndim > 1:
+        # searchsorted of each source profile, e.g. model levels varying in time
+        i_1 = np.stack([np.searchsorted(x_, x_out) for x_ in x_src])
+    else:
+        i_1 = np.searchsorted(x_src, x_out)
+    i_1 = np.clip(i_1, 1, n_src - 1)
+    i_0 = i_1 - 1
+    x_0 = np.take_along_axis(x_src, i_0, axis=-1)
+    x_1 = np.take_along_axis(x_src, i_1, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight_ = np.clip(np.where(x_1 > x_0, (x_out - x_0) / (x_1 - x_0), 0), 0, 1)
+    return i_0, i_1, weight_
+
+
+def grid_weights(time_src, height_src, time_, height_):
+    """Interpolation indices and weights from a source grid to the lidar grid, cached by the grids.
+
+    Args:
+        time_src (ndarray): times of the profiles (hours), increasing, shape (time_src,)
+        height_src (ndarray): heights of the profile levels (m), increasing, shape (level,) or (time_src, level), see
+                              read_profiles_nc
+        time_ (ndarray): lidar times (hours), shape (time,)
+        height_ (ndarray): heights of the lidar gates (m), same reference as 'height_src', shape (height,)
+
+    Returns:
+        weights_ (GridWeights): read-only
+
+    """
+    grids = [np.ascontiguousarray(g_, dtype=float) for g_ in (time_src, height_src, time_, height_)]
+    digest = hashlib.sha1()
+    for g_ in grids:
+        digest.update(repr(g_.shape).encode())
+        digest.update(g_.tobytes())
+    key_ = digest.hexdigest()
+    weights_ = _WEIGHTS.get(key_)
+    if weights_ is not None:
+        return weights_
+
+    time_src, height_src, time_, height_ = grids
+    # levels of the same heights at all source times are bracketed once
+    weights_ = GridWeights(*_bracket(time_src, time_), *_bracket(height_src, height_))
+    for array_ in weights_:
+        array_.setflags(write=False)
+
+    _WEIGHTS.put(key_, weights_)
+    return weights_
+
+
+def interpolate_to_grid(weights_, field_, log_=False):
+    """Interpolates a (time_src, level) field onto the lidar grid with grid_weights.
+
+    Args:
+        weights_ (GridWeights): see grid_weights
+        field_ (ndarray): shape (time_src, level)
+        log_ (bool): Optional. Interpolate log(field_), e.g. pressure
+
+    Returns:
+        field_ (ndarray): shape (time, height)
+
+    """
+    field_ = np.asarray(field_, dtype=float)
+    if log_:
+        field_ = np.log(field_)
+    # in height at each source time, then in time
+    if weights_.z_0.ndim == 1:
+        f_0, f_1 = field_[:, weights_.z_0], field_[:, weights_.z_1]
+    else:
+        f_0 = np.take_along_axis(field_, weights_.z_0, axis=1)
+        f_1 = np.take_along_axis(field_, weights_.z_1, axis=1)
+    f_z = f_0 + weights_.z_weight * (f_1 - f_0)
+    t_weight = weights_.t_weight[:, np.newaxis]
+    f_t = f_z[weights_.t_0] * (1 - t_weight) + f_z[weights_.t_1] * t_weight
+    return np.exp(f_t) if log_ else f_t
+
+
+def read_profiles_nc(file_name, variables=("temperature", "pressure"), time_name="time", height_name="height"):
+    """Reads profiles of a model or sounding netCDF file, e.g. model levels stored from the top down.
+
+    Args:
+        file_name (str): full path to the netCDF file
+        variables (tuple): Optional. Names of the (time, level) variables
+        time_name (str): Optional. Name of the time variable (hours), default 'time'
+        height_name (str): Optional. Name of the height variable (m), shape (level,) or (time, level)
+
+    Returns:
+        profiles (dict): 'time', 'height', and the variables, nan for missing, profiles sorted by time and levels by
+                         height
+
+    """
+    profiles = {}
+    with Dataset(file_name, "r") as nc:
+        for name in (time_name, height_name) + tuple(variables):
+            profiles[name] = np.ma.filled(nc.variables[name][:].astype(float), np.nan)
+    time_ = np.atleast_1d(profiles.pop(time_name))
+    height_ = profiles.pop(height_name)
+
+    # profiles sorted by time, and levels by height at each time
+    t_order = np.argsort(time_, kind='stable')
+    if height_.ndim > 1:
+        height_ = height_[t_order]
+    z_order = np.argsort(height_, axis=-1, kind='stable')
+    profiles["time"] = time_[t_order]
+    profiles["height"] = np.take_along_axis(height_, z_order, axis=-1)
+    for name in variables:
+        field_ = np.atleast_2d(profiles[name])[t_order]
+        profiles[name] = np.take_along_axis(field_, np.broadcast_to(z_order, field_.shape), axis=-1)
+    return profiles
+
+
+def read_profiles_csv(file_name, variables=("temperature", "pressure"), time_name="time", height_name="height",
+                      delimiter=","):
+    """Reads a sounding from a text file with a header row of column names, one row per level. Without a time column
+    the sounding is one profile at time 0.
+
+    Returns:
+        profiles (dict): 'time', 'height', and the variables, see read_profiles_nc
+
+    """
+    table_ = np.genfromtxt(file_name, delimiter=delimiter, names=True, dtype=float)
+    height_ = np.atleast_1d(table_[height_name])
+    time_ = np.atleast_1d(table_[time_name]) if time_name in table_.dtype.names else np.zeros(height_.shape)
+
+    # one profile per unique time, levels sorted by height
+    time_src, inverse_ = np.unique(time_, return_inverse=True)
+    if not np.all(np.bincount(inverse_) == len(height_) // len(time_src)):
+        raise ValueError("Each profile of {} has to have the same number of levels".format(file_name))
+    order_ = np.lexsort((height_, inverse_))
+    shape_ = (len(time_src), -1)
+    profiles = {"time": time_src, "height": height_[order_].reshape(shape_)}
+    for name in variables:
+        profiles[name] = np.atleast_1d(table_[name])[order_].reshape(shape_)
+    return profiles
+
+
+def temperature_pressure(file_name, time_, range_, elevation=90., altitude=0., pressure_units='hPa', **kwargs):
+    """Temperature and pressure of a model or sounding file on the lidar grid, e.g. for the first guess of the
+    retrieval.
+
+    Args:
+        file_name (str): full path to a netCDF or .csv file, see read_profiles_nc and read_profiles_csv
+        time_ (ndarray): lidar times (hours), shape (time,)
+        range_ (ndarray): lidar range (m), shape (range,)
+        elevation (float): Optional. Elevation of the beam (degrees from horizon), default 90
+        altitude (float): Optional. Height of the lidar in the reference of the file (m), default 0
+        pressure_units (str): Optional. Pressure units of the file, 'atm', 'Pa', or 'hPa', default 'hPa'
+        **kwargs: names of the variables, see read_profiles_nc
+
+    Returns:
+        T_ (ndarray): temperature (K), shape (time, range)
+        P_ (ndarray): pressure (atm), shape (time, range)
+
+    """
+    reader = read_profiles_csv if file_name.lower().endswith(('.csv', '.txt')) else read_profiles_nc
+    profiles = reader(file_name, **kwargs)
+    height_ = altitude + np.asarray(range_, dtype=float) * np.sin(np.deg2rad(elevation))
+    weights_ = grid_weights(profiles["time"], profiles["height"], np.atleast_1d(time_), height_)
+    T_name, P_name = kwargs.get("variables", ("temperature", "pressure"))
+    T_ = interpolate_to_grid(weights_, profiles[T_name])
+    P_ = interpolate_to_grid(weights_, pressure_to_atm(profiles[P_name], units=pressure_units), log_=True)
+    return T_, P_
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for estimating the background (noise floor) of lidar profiles and the signal-to-noise ratio (SNR).
+
+The background of each profile is the median of its far range gates, where the backscattered signal has vanished, and
+the noise is the scaled median absolute deviation (MAD) around it, both robust to remaining signal and outliers, e.g.
+clouds. The statistics are reduced along the last (range) axis only, thus arrays of one profile, a day (time, range) or
+several days (day, time, range) are processed at once. The statistics of a file are cached next to it (or in
+'cache_dir'), keyed by the size and modification time of the file and the parameters, so that reprocessing a file
+reads the cache.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import hashlib
+import os
+import numpy as np
+from netCDF4 import Dataset
+from dialpy.equations.spectroscopy_cache import LRUCache
+
+# MAD to standard deviation of a normal distribution
+MAD_TO_STD = 1.4826
+# fraction of the farthest gates used, if neither 'n_far' nor 'min_range' is given
+DEFAULT_FAR_FRACTION = .1
+
+# statistics of the recently used files, by file state and parameters
+_BACKGROUNDS = LRUCache(maxsize=32)
+
+
+def far_range_gates(n_gates, range_=None, n_far=None, min_range=None):
+    """Gates used for the background, either at or beyond 'min_range', the last 'n_far' gates, or by default the last
+    DEFAULT_FAR_FRACTION of the gates.
+
+    Returns:
+        gates_ (slice or ndarray): index of the far range gates along the range axis
+
+    """
+    if min_range is not None:
+        if range_ is None:
+            raise ValueError("'range_' has to be given with 'min_range'")
+        return np.flatnonzero(np.asarray(range_) >= min_range)
+    if n_far is None:
+        n_far = max(int(np.ceil(DEFAULT_FAR_FRACTION * n_gates)), 2)
+    return slice(n_gates - n_far, n_gates)
+
+
+def background_statistics(P_, gates_):
+    """Robust background and noise of each profile from its far range gates.
+
+    Args:
+        P_ (ndarray): received power, shape (..., range), nan for missing
+        gates_ (slice or ndarray): far range gates, see far_range_gates
+
+    Returns:
+        P_bkg (ndarray): median of the far range gates, shape (...,)
+        noise_std (ndarray): MAD_TO_STD * median absolute deviation from 'P_bkg', shape (...,)
+
+    """
+    far_ = np.asarray(P_, dtype=float)[..., gates_]
+    with np.errstate(invalid='ignore'):
+        P_bkg = np.nanmedian(far_, axis=-1)
+        noise_std = MAD_TO_STD * np.nanmedian(np.abs(far_ - P_bkg[..., np.newaxis]), axis=-1)
+    return P_bkg, noise_std
+
+
+def snr(P_, P_bkg, noise_std):
+    """Signal-to-noise ratio of each gate, (P - P_bkg) / noise_std.
+
+    Args:
+        P_ (ndarray): received power, shape (..., range)
+        P_bkg (ndarray): background of each profile, shape (...,)
+        noise_std (ndarray): noise of each profile, shape (...,)
+
+    Returns:
+        snr_ (ndarray): shape of 'P_', nan where the noise is zero
+
+    """
+    noise_std = np.asarray(noise_std, dtype=float)[..., np.newaxis]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(noise_std > 0, (np.asarray(P_, dtype=float) - np.asarray(P_bkg)[..., np.newaxis]) / noise_std,
+                        np.nan)
+
+
+def low_snr_mask(snr_, threshold=3.):
+    """Gates to skip, SNR below 'threshold' or missing, e.g. combined with cloud_precip.dial_mask for the mask_ of
+    differential_co2_concentration.xco2_*."""
+    with np.errstate(invalid='ignore'):
+        return ~(np.asarray(snr_) >= threshold)
+
+
+def background_profiles(P_bkg, n_gates):
+    """Background of each profile repeated over the range gates, the 'P_bkg' of differential_co2_concentration.xco2_*.
+
+    Returns:
+        P_bkg (ndarray): read-only view, shape (..., n_gates)
+
+    """
+    P_bkg = np.asarray(P_bkg, dtype=float)
+    return np.broadcast_to(P_bkg[..., np.newaxis], P_bkg.shape + (n_gates, ))
+
+
+def _cache_keys(file_name, variables, n_far, min_range):
+    """Keys of the statistics of a file, from the parameters, and from the parameters, size and modification time of
+    the file."""
+    stat_ = os.stat(file_name)
+    parameters = repr((os.path.abspath(file_name), tuple(variables), n_far, min_range))
+    state_ = repr((parameters, stat_.st_size, stat_.st_mtime_ns))
+    return hashlib.sha256(parameters.encode()).hexdigest()[:16], hashlib.sha256(state_.encode()).hexdigest()[:16]
+
+
+def background_cache_name(file_name, parameter_key, state_key, cache_dir=None):
+    """Name of the cache of the statistics of a file: <cache_dir>/<file name>.<parameter_key>.<state_key>.bkg.npz, by
+    default next to the file."""
+    cache_dir = os.path.dirname(os.path.abspath(file_name)) if cache_dir is None else cache_dir
+    return os.path.join(cache_dir, '{}.{}.{}.bkg.npz'.format(os.path.basename(file_name), parameter_key, state_key))
+
+
+def _remove_stale_caches(cache_name, parameter_key, state_key):
+    """Removes the caches of earlier versions of the file with the same parameters, caches of other parameters are
+    kept."""
+    cache_dir, base_name = os.path.split(cache_name)
+    prefix_ = base_name[:-len('{}.bkg.npz'.format(state_key))]
+    for old_name in os.listdir(cache_dir):
+        old_key = old_name[len(prefix_):-len('.bkg.npz')]
+        if old_name.startswith(prefix_) and old_name.endswith('.bkg.npz') and len(old_key) == len(state_key) and \
+                '.' not in old_key and old_key != state_key:
+            os.remove(os.path.join(cache_dir, old_name))
+
+
+def file_background(file_name, variables=("power_on", "power_off"), n_far=None, min_range=None, cache_dir=None):
+    """Background and noise of each profile of the power variables of a netCDF file, cached per process and on disk,
+    one cache per parameters. Caches of earlier versions of the file with the same parameters are replaced.
+
+    Args:
+        file_name (str): full path to the netCDF file with (time, range) power variables and 'range'
+        variables (tuple): Optional. Names of the power variables
+        n_far (int): Optional. Number of the farthest gates used, see far_range_gates
+        min_range (float): Optional. Gates at or beyond this range (m) are used, see far_range_gates
+        cache_dir (str): Optional. Folder of the cache, default folder of the file
+
+    Returns:
+        stats (dict): {variable: (P_bkg, noise_std)}, read-only arrays of shape (time,)
+
+    """
+    parameter_key, state_key = _cache_keys(file_name, variables, n_far, min_range)
+    stats = _BACKGROUNDS.get(state_key)
+    if stats is not None:
+        return stats
+
+    cache_name = background_cache_name(file_name, parameter_key, state_key, cache_dir=cache_dir)
+    if os.path.isfile(cache_name):
+        with np.load(cache_name) as cached:
+            stats = {name: (cached[name + "/P_bkg"], cached[name + "/noise_std"]) for name in variables}
+    else:
+        stats = {}
+        with Dataset(file_name, "r") as nc:
+            range_ = nc.variables["range"][:] if "range" in nc.variables else None
+            for name in variables:
+                P_ = np.ma.filled(nc.variables[name][:].astype(float), np.nan)
+                gates_ = far_range_gates(P_.shape[-1], range_=range_, n_far=n_far, min_range=min_range)
+                stats[name] = background_statistics(P_, gates_)
+
+        _remove_stale_caches(cache_name, parameter_key, state_key)
+        # written under a temporary name so that an interrupted run never leaves a truncated cache
+        tmp_name = cache_name + '.{}.tmp'.format(os.getpid())
+        with open(tmp_name, 'wb') as f:
+            np.savez(f, **{name + "/" + stat_name: value_ for name, values_ in stats.items()
+                           for stat_name, value_ in zip(("P_bkg", "noise_std"), values_)})
+        os.replace(tmp_name, cache_name)
+
+    # read-only, the same arrays are returned to all callers of the file
+    for values_ in stats.values():
+        for value_ in values_:
+            value_.setflags(write=False)
+    _BACKGROUNDS.put(state_key, stats)
+    return stats
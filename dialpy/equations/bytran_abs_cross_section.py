@@ -14,7 +14,9 @@ DOCUMENTATION: http://www.bytran.org/howtolbl.htm
 import numpy as np
 import pandas as pd
 from dialpy.utilities import general_utils as gu
+from dialpy.utilities.profiling import timed_stage
 from dialpy.equations import constants
+from dialpy.equations import spectroscopy
 from scipy.integrate import quad
 
 
@@ -63,7 +65,7 @@ def shifted_spectral_line(nu_ij, delta_air, P_):
 
     """
 
-    return nu_ij + delta_air + P_
+    return nu_ij + delta_air * P_
 
 
 def total_internal_partition_sum(T_):
@@ -243,8 +245,6 @@ def voigt_abrarov_quine(x, y):
                       [8.034651067438904e-010, 2.200496182129099e+001, 4.940360170163906e-010],
                       [3.355455275373310e-011, 2.639597461102705e+001, 5.674096644030151e-014]])
 
-    print(coeff.shape)
-
     mMax = 12
     varsigma = 2.75  # define the shift constant
     y = np.abs(y) + varsigma / 2
@@ -280,31 +280,24 @@ def voigt(nu, nu_ij_shifted, alpha_doppler, gamma):
     return voigt_abrarov_quine(x_, y_)
 
 
+@timed_stage("spectroscopy")
 def absorption_coefficient(range_, nu_, T_, co2_ppm, P_):
-    """
+    """Two-way absorption optical depth of CO2 between the instrument and range 'range_', all HITRAN lines with the
+    Voigt line shape, see spectroscopy.absorption_cross_section. Vectorized over range_, T_, co2_ppm and P_.
 
     Args:
-        range_: (float)
-        nu_: (float)
-        T_: (float)
-        co2_ppm: (float)
-        P_: (float)
+        range_: (float) range from instrument (m)
+        nu_: (float) wavenumber (cm-1)
+        T_: (float) temperature (K)
+        co2_ppm: (float) CO2 concentration (ppm)
+        P_: (float) pressure (atm)
 
     Returns:
+        tau_: (float) two-way optical depth (unitless)
 
     """
 
-    nu_0, S_0, gamma_air, gamma_self, E_, n_air, delta_air = read_hitran_data(nu_)
-    Q_T = total_internal_partition_sum(T_)
-    S_L = spectral_line_intensity(range_, S_0, Q_T, E_, T_, nu_, co2_ppm)
-
-    nu_ij_shifted = shifted_spectral_line(nu_0, delta_air, P_)
-    alpha_doppler = doppler_HWHM(nu_0, T_)
-    P_mol = 1 * co2_ppm / 1e4  # (atm), ppm --> % and multiplied with 1 atm
-    gamma = lorentzian_HWHM(T_, n_air, gamma_air, P_, P_mol, gamma_self)
-    f_voigt = voigt(nu_, nu_ij_shifted, alpha_doppler, gamma)
-
-    return S_L * f_voigt
-
-
+    sigma_abs = spectroscopy.absorption_cross_section(nu_, T_, P_, co2_ppm) * 1e4  # m2 --> cm2
+    L_ = np.asarray(range_) * 1e2 * 2  # 1e2 for m --> cm, 2 for round trip
 
+    return sigma_abs * spectroscopy.number_density_cm3(T_, P_, co2_ppm) * L_
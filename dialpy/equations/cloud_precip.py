@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for the cloud and precipitation product (cloud_precip) and the screening of DIAL profiles.
+
+Cloud is where attenuated backscatter exceeds a threshold and precipitation where it exceeds a lower one while the
+particles are falling. The candidate masks of the whole day are cleaned up with morphological opening and closing in
+(time, range), and objects smaller than a minimum number of pixels are removed by connected component labelling
+(scipy.ndimage). Above the cloud base the lidar signal is dominated by the cloud, thus the DIAL mask covers the cloud,
+the precipitation and everything above the cloud base, and it is given to differential_co2_concentration.xco2_* so that
+the masked gates are not computed.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from scipy import ndimage
+from dialpy.utilities.dl_var_atts import dl_var_atts as vatts
+
+# cloud_precip_flag values
+CLEAR = np.int8(0)
+CLOUD = np.int8(1)
+PRECIPITATION = np.int8(2)
+ABOVE_CLOUD_BASE = np.int8(3)
+
+DEFAULT_THRESHOLDS = {
+    "beta_cloud": 1e-5,  # cloud above (m-1 sr-1)
+    "beta_precipitation": 1e-6,  # precipitation above, if falling (m-1 sr-1)
+    "w_precipitation": -1.}  # precipitation below (m s-1)
+
+
+def _cleanup(mask_, structure=(3, 3), min_size=10):
+    """Morphological opening and closing of a (time, range) mask, and removal of objects smaller than 'min_size'
+    pixels. The mask is extended by its edge values before the opening and closing, thus objects touching the first or
+    last profile or gate are not eroded there."""
+    pad_ = [(n_, n_) for n_ in structure]
+    structure = np.ones(structure, dtype=bool)
+    mask_ = np.pad(mask_, pad_, mode='edge')
+    mask_ = ndimage.binary_closing(ndimage.binary_opening(mask_, structure=structure), structure=structure)
+    mask_ = mask_[tuple(slice(n_, -n_) for n_, _ in pad_)]
+    labels_, n_labels = ndimage.label(mask_)
+    if n_labels == 0:
+        return mask_
+    size_ = np.bincount(labels_.ravel(), minlength=n_labels + 1)
+    keep_ = size_ >= min_size
+    keep_[0] = False
+    return keep_[labels_]
+
+
+def cloud_precip_masks(beta_att, velo=None, thresholds=None, structure=(3, 3), min_size=10):
+    """Cloud and precipitation masks of a (time, range) field.
+
+    Args:
+        beta_att (ndarray): attenuated backscatter (m-1 sr-1), shape (time, range), nan for missing
+        velo (ndarray): Optional. Vertical (radial) velocity (m s-1), positive upward, shape (time, range); without it
+                        precipitation is not detected
+        thresholds (dict): Optional. Updates DEFAULT_THRESHOLDS
+        structure (tuple): Optional. Shape of the (time, range) structuring element of the opening and closing
+        min_size (int): Optional. Smallest object kept (pixels)
+
+    Returns:
+        cloud_ (ndarray): bool, shape (time, range)
+        precipitation_ (ndarray): bool, shape (time, range), not overlapping 'cloud_'
+        cloud_base (ndarray): gate index of the lowest cloud, -1 if none, shape (time,)
+
+    """
+    limits = dict(DEFAULT_THRESHOLDS)
+    if thresholds is not None:
+        limits.update(thresholds)
+    beta_att = np.asarray(beta_att, dtype=float)
+
+    with np.errstate(invalid='ignore'):
+        cloud_ = _cleanup(beta_att > limits["beta_cloud"], structure=structure, min_size=min_size)
+        if velo is None:
+            precipitation_ = np.zeros(beta_att.shape, dtype=bool)
+        else:
+            falling_ = (beta_att > limits["beta_precipitation"]) & (np.asarray(velo) < limits["w_precipitation"])
+            precipitation_ = _cleanup(falling_, structure=structure, min_size=min_size) & ~cloud_
+
+    cloud_base = np.where(np.any(cloud_, axis=1), np.argmax(cloud_, axis=1), -1)
+    return cloud_, precipitation_, cloud_base
+
+
+def cloud_precip_flag(cloud_, precipitation_, cloud_base):
+    """Flags of the cloud_precip product, int8 of CLEAR, CLOUD, PRECIPITATION and ABOVE_CLOUD_BASE."""
+    gate_ = np.arange(cloud_.shape[1])
+    flag_ = np.full(cloud_.shape, CLEAR, dtype=np.int8)
+    flag_[(cloud_base[:, np.newaxis] >= 0) & (gate_ > cloud_base[:, np.newaxis])] = ABOVE_CLOUD_BASE
+    flag_[precipitation_] = PRECIPITATION
+    flag_[cloud_] = CLOUD
+    return flag_
+
+
+def dial_mask(beta_att, velo=None, **kwargs):
+    """Gates of DIAL profiles to skip in the differencing: cloud, precipitation and everything above the cloud base.
+
+    Args:
+        beta_att (ndarray): attenuated backscatter (m-1 sr-1), e.g. of the offline wavelength, shape (time, range)
+        velo (ndarray): Optional. Vertical velocity (m s-1), shape (time, range)
+        **kwargs: see cloud_precip_masks
+
+    Returns:
+        mask_ (ndarray): bool, True for gates to skip, shape (time, range), e.g. xco2_beta(..., mask_=mask_[i])
+
+    """
+    return cloud_precip_flag(*cloud_precip_masks(beta_att, velo=velo, **kwargs)) != CLEAR
+
+
+def cloud_precip_nc_variables(time_, range_, flag_, cloud_base):
+    """netCDF variables of the cloud_precip product, see nc_tools.write_nc_.
+
+    Returns:
+        obs (list): VarBlueprint of time, range, cloud_precip_flag, and cloud_base_height
+
+    """
+    range_ = np.asarray(range_, dtype=float)
+    base_height = np.where(cloud_base >= 0, range_[np.maximum(cloud_base, 0)], np.nan)
+    return [vatts("time", data=time_, dim_size=(len(time_), )),
+            vatts("range", data=range_, dim_size=(len(range_), )),
+            vatts("cloud_precip_flag", data=np.asarray(flag_, dtype=np.int8), dim_size=(len(time_), len(range_))),
+            vatts("cloud_base_height", data=base_height, dim_size=(len(time_), ))]
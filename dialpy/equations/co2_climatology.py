@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for monthly and seasonal diurnal cycle climatologies of retrieved CO2 concentration.
+
+Daily carbon_dioxide_concentration files are streamed one at a time and reduced into (period, hour of day, height)
+bins, period being the month or the season (DJF, MAM, JJA, SON). Each bin keeps a count, sums of the values and their
+squares (relative to a fixed shift to limit round off), and a quantile sketch similar to the t-digest of Dunning and
+Ertl (2019) arXiv:1902.04023: at most 'n_centroids' centroids (mean, weight), whose sizes are limited by the arcsine
+scale function, thus the quantiles near 0 and 1 are resolved best. All bins are compressed at once: the centroids are
+sorted within bins, assigned to groups by their quantile and reduced with bincount, so neither adding a file nor
+merging two climatologies loops over bins. Climatologies of parallel workers, or saved earlier, merge into the same
+result, thus the data never has to fit in memory.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from netCDF4 import Dataset
+
+DEFAULT_N_CENTROIDS = 100
+DEFAULT_QUANTILES = (.05, .25, .5, .75, .95)
+SEASONS = ("DJF", "MAM", "JJA", "SON")
+# season index of months 1-12
+_MONTH_TO_SEASON = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+
+
+def _scale_group(q_, n_centroids):
+    """Centroid group of each quantile 0 <= q_ <= 1, by the arcsine scale function k(q) of the t-digest."""
+    k_ = (np.arcsin(2 * np.clip(q_, 0, 1) - 1) / np.pi + .5) * n_centroids
+    return np.minimum(k_.astype(int), n_centroids - 1)
+
+
+def compress(bin_, value_, weight_, n_bins, n_centroids=DEFAULT_N_CENTROIDS):
+    """Reduces weighted values of many bins into at most 'n_centroids' centroids per bin.
+
+    Args:
+        bin_ (ndarray): bin of each value, shape (n,)
+        value_ (ndarray): values, or means of centroids, shape (n,), finite
+        weight_ (ndarray): weights, shape (n,), > 0
+        n_bins (int): number of bins
+        n_centroids (int): Optional. Max number of centroids per bin
+
+    Returns:
+        means_ (ndarray): centroid means, nan for empty centroids, shape (n_bins, n_centroids)
+        weights_ (ndarray): centroid weights, zero for empty centroids, shape (n_bins, n_centroids)
+
+    """
+    order_ = np.lexsort((value_, bin_))
+    bin_, value_, weight_ = bin_[order_], value_[order_], weight_[order_]
+
+    # quantile of the center of each weight within its bin
+    total_ = np.bincount(bin_, weights=weight_, minlength=n_bins)
+    cumulative_ = np.cumsum(weight_)
+    start_ = np.concatenate([[0.], np.cumsum(total_)[:-1]])
+    q_ = (cumulative_ - weight_ / 2 - start_[bin_]) / total_[bin_]
+
+    cell_ = bin_ * n_centroids + _scale_group(q_, n_centroids)
+    weights_ = np.bincount(cell_, weights=weight_, minlength=n_bins * n_centroids)
+    sums_ = np.bincount(cell_, weights=weight_ * value_, minlength=n_bins * n_centroids)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means_ = np.where(weights_ > 0, sums_ / weights_, np.nan)
+    return means_.reshape(n_bins, n_centroids), weights_.reshape(n_bins, n_centroids)
+
+
+def sketch_quantiles(means_, weights_, quantiles=DEFAULT_QUANTILES):
+    """Quantiles of the sketches of many bins, by linear interpolation between the centroids.
+
+    Args:
+        means_ (ndarray): centroid means, shape (..., n_centroids), nan for empty
+        weights_ (ndarray): centroid weights, shape (..., n_centroids)
+        quantiles (array like): Optional. Quantiles, 0-1
+
+    Returns:
+        values_ (ndarray): shape (..., quantile), nan for empty bins
+
+    """
+    quantiles = np.asarray(quantiles, dtype=float)
+    total_ = np.sum(weights_, axis=-1, keepdims=True)
+    # empty centroids are moved last, with the largest value of the bin, at the upper end of the quantiles
+    order_ = np.argsort(np.where(weights_ > 0, means_, np.inf), axis=-1, kind='stable')
+    means_ = np.take_along_axis(means_, order_, axis=-1)
+    weights_ = np.take_along_axis(weights_, order_, axis=-1)
+    valid_ = weights_ > 0
+    filled_ = np.where(valid_, means_, np.nanmax(np.where(valid_, means_, -np.inf), axis=-1, keepdims=True))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centers_ = np.where(valid_, (np.cumsum(weights_, axis=-1) - weights_ / 2) / total_, 1.)
+
+    # index of the first centroid center at or above each quantile
+    i_1 = np.sum(centers_[..., np.newaxis, :] < quantiles[:, np.newaxis], axis=-1)
+    i_1 = np.clip(i_1, 1, weights_.shape[-1] - 1)
+    i_0 = i_1 - 1
+    c_0, c_1 = np.take_along_axis(centers_, i_0, axis=-1), np.take_along_axis(centers_, i_1, axis=-1)
+    v_0, v_1 = np.take_along_axis(filled_, i_0, axis=-1), np.take_along_axis(filled_, i_1, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_ = np.clip(np.where(c_1 > c_0, (quantiles - c_0) / (c_1 - c_0), 0), 0, 1)
+        values_ = v_0 + f_ * (v_1 - v_0)
+    return np.where(total_ > 0, values_, np.nan)
+
+
+class Climatology:
+    """Streaming diurnal cycle climatology of (time, height) fields of daily files.
+
+    Args:
+        height_edges (ndarray): edges of the height bins (m), increasing, shape (height+1,)
+        period (str): Optional. 'month' (12 periods) or 'season' (4 periods, see SEASONS), default 'month'
+        n_hours (int): Optional. Number of hour of day bins, default 24
+        n_centroids (int): Optional. Max number of centroids per bin of the quantile sketch
+        shift (float): Optional. Reference subtracted from the values in the sums, default 400 (ppm)
+
+    """
+
+    def __init__(self, height_edges, period="month", n_hours=24, n_centroids=DEFAULT_N_CENTROIDS, shift=400.):
+        if period not in ("month", "season"):
+            raise ValueError("period has to be 'month' or 'season'")
+        self.height_edges = np.asarray(height_edges, dtype=float)
+        self.period = period
+        self.n_hours = n_hours
+        self.n_centroids = n_centroids
+        self.shift = shift
+        n_periods = 12 if period == "month" else len(SEASONS)
+        self.shape = (n_periods, n_hours, len(self.height_edges) - 1)
+        n_bins = int(np.prod(self.shape))
+        self.count = np.zeros(n_bins)
+        self.sum = np.zeros(n_bins)
+        self.sum_squares = np.zeros(n_bins)
+        self.means = np.full((n_bins, n_centroids), np.nan)
+        self.weights = np.zeros((n_bins, n_centroids))
+
+    def _compress(self, bin_, value_, weight_):
+        """Merges weighted values into the sketch."""
+        had_ = self.weights > 0
+        bins_old = np.broadcast_to(np.arange(len(self.weights))[:, np.newaxis], self.weights.shape)[had_]
+        self.means, self.weights = compress(np.concatenate([bins_old, bin_]),
+                                            np.concatenate([self.means[had_], value_]),
+                                            np.concatenate([self.weights[had_], weight_]),
+                                            len(self.weights), self.n_centroids)
+
+    def add(self, month, time_, range_, values_):
+        """Adds the fields of one day.
+
+        Args:
+            month (int): month of the day, 1-12
+            time_ (ndarray): time (hours UTC), shape (time,)
+            range_ (ndarray): height of the gates (m), shape (range,)
+            values_ (ndarray): e.g. CO2 concentration (ppm), shape (time, range), nan for missing
+
+        """
+        period_ = month - 1 if self.period == "month" else _MONTH_TO_SEASON[month - 1]
+        hour_ = np.clip((np.asarray(time_, dtype=float) % 24 * self.n_hours / 24).astype(int), 0, self.n_hours - 1)
+        height_ = np.searchsorted(self.height_edges, range_, side='right') - 1
+        in_grid = (height_ >= 0) & (height_ < self.shape[2])
+
+        values_ = np.asarray(values_, dtype=float)[:, in_grid]
+        bins_ = (period_ * self.n_hours + hour_[:, np.newaxis]) * self.shape[2] + height_[in_grid]
+        valid_ = np.isfinite(values_)
+        bin_, value_ = bins_[valid_], values_[valid_]
+        if len(value_) == 0:
+            return
+
+        n_bins = len(self.count)
+        self.count += np.bincount(bin_, minlength=n_bins)
+        self.sum += np.bincount(bin_, weights=value_ - self.shift, minlength=n_bins)
+        self.sum_squares += np.bincount(bin_, weights=(value_ - self.shift)**2, minlength=n_bins)
+        self._compress(bin_, value_, np.ones(len(value_)))
+
+    def add_file(self, file_name, variable="carbon_dioxide_concentration"):
+        """Adds a daily product file, see nc_tools.write_nc_ for the 'month' global attribute."""
+        with Dataset(file_name, "r") as nc:
+            month = int(nc.month)
+            time_ = nc.variables["time"][:]
+            range_ = nc.variables["range"][:]
+            values_ = np.ma.filled(nc.variables[variable][:].astype(float), np.nan)
+        self.add(month, time_, range_, values_)
+
+    def merge(self, other):
+        """Merges another Climatology of the same grid, e.g. computed in a parallel worker."""
+        if other.shape != self.shape or not np.array_equal(other.height_edges, self.height_edges) or \
+                other.shift != self.shift:
+            raise ValueError("Climatologies of different grids can not be merged")
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        had_ = other.weights > 0
+        bins_other = np.broadcast_to(np.arange(len(other.weights))[:, np.newaxis], other.weights.shape)[had_]
+        self._compress(bins_other, other.means[had_], other.weights[had_])
+
+    def result(self, quantiles=DEFAULT_QUANTILES):
+        """Climatology of each (period, hour, height) bin, nan for empty bins.
+
+        Returns:
+            stats (dict): 'count', 'mean', 'std' of shape (period, hour, height), and 'quantiles' of shape
+                          (period, hour, height, quantile)
+
+        """
+        n_ = self.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_ = np.where(n_ > 0, self.sum / n_, np.nan)
+            var_ = np.where(n_ > 1, np.maximum(self.sum_squares - n_ * mean_**2, 0) / (n_ - 1), np.nan)
+        return {"count": n_.reshape(self.shape),
+                "mean": (mean_ + self.shift).reshape(self.shape),
+                "std": np.sqrt(var_).reshape(self.shape),
+                "quantiles": sketch_quantiles(self.means, self.weights, quantiles).reshape(self.shape + (-1, ))}
+
+    def save(self, file_name):
+        """Saves the partial result, see load."""
+        np.savez(file_name, height_edges=self.height_edges, period=self.period, n_hours=self.n_hours,
+                 n_centroids=self.n_centroids, shift=self.shift, count=self.count, sum=self.sum,
+                 sum_squares=self.sum_squares, means=self.means, weights=self.weights)
+
+    @classmethod
+    def load(cls, file_name):
+        """Loads a partial result saved with save, e.g. to merge it with new data."""
+        with np.load(file_name) as saved:
+            climatology = cls(saved["height_edges"], period=str(saved["period"]), n_hours=int(saved["n_hours"]),
+                              n_centroids=int(saved["n_centroids"]), shift=float(saved["shift"]))
+            for name in ("count", "sum", "sum_squares", "means", "weights"):
+                setattr(climatology, name, saved[name])
+        return climatology
+
+
+def _aggregate_chunk(file_names, variable, kwargs):
+    """Climatology of one chunk of files, run by a worker."""
+    climatology = Climatology(**kwargs)
+    for file_name in file_names:
+        climatology.add_file(file_name, variable=variable)
+    return climatology
+
+
+def aggregate_files(file_names, height_edges, variable="carbon_dioxide_concentration", n_workers=1, **kwargs):
+    """Climatology of many daily files, computed in parallel over chunks of files and merged.
+
+    Args:
+        file_names (list): full paths of the daily netCDF files
+        height_edges (ndarray): edges of the height bins (m)
+        variable (str): Optional. Name of the (time, range) variable, default 'carbon_dioxide_concentration'
+        n_workers (int): Optional. Number of worker processes, default 1 (no workers)
+        **kwargs: see Climatology
+
+    Returns:
+        climatology (Climatology): see Climatology.result
+
+    """
+    kwargs = dict(kwargs, height_edges=height_edges)
+    if n_workers <= 1:
+        return _aggregate_chunk(file_names, variable, kwargs)
+
+    chunks = [list(c) for c in np.array_split(np.asarray(file_names, dtype=object), n_workers) if len(c) > 0]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        partial_ = list(executor.map(_aggregate_chunk, chunks, [variable] * len(chunks), [kwargs] * len(chunks)))
+    climatology = partial_[0]
+    for other in partial_[1:]:
+        climatology.merge(other)
+    return climatology
@@ -33,6 +33,7 @@ BOLTZMANNS_CONSTANT_erg = 1.3806488e-16  # (erg K-1)
 BOLTZMANNS_CONSTANT = 1.3806503e-23  # (m2 kg s−2 K−1)
 # h
 PLANCKS_CONSTANT = 6.62606957e-27  # erg s
+PLANCKS_CONSTANT_J = 6.62606957e-34  # (J s)
 # c
 SPEED_OF_LIGHT = 2.99792458e8  # (m s-1)
 # n_0 Lochsmidt's number
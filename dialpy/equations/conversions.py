@@ -9,8 +9,9 @@ Created on Tue May 21 11:10:04 2019
 from codecs import decode
 import numpy as np
 import struct
+from dialpy.equations import constants
 
-_SPEED_OF_LIGHT = 1
+_SPEED_OF_LIGHT = constants.SPEED_OF_LIGHT
 
 
 def optical_wavenumber(lambda_):
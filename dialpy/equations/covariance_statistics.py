@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for the attenuated backscatter / vertical velocity covariance product (attbeta_velo_covar, wstats).
+
+Counts, means, sums of squared deviations (M2) and the sum of cross deviations (C) of attenuated backscatter and
+vertical velocity are accumulated per averaging block and range gate. The moments of each added chunk are computed with
+two passes (block means first, then deviations from them) and merged into the accumulated ones with the pairwise update
+of Chan et al. (1979),
+    n = n_a + n_b, d = mean_b - mean_a, mean = mean_a + d n_b / n, M2 = M2_a + M2_b + d^2 n_a n_b / n,
+which is exact and numerically stable, thus chunks computed by parallel workers or partial daily files can be merged in
+any order without reprocessing.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations.rolling_statistics import BLOCK_LENGTH_3MIN, block_edges, block_index, nc_variables_3min
+
+
+def _block_sums(i_, x):
+    """Sums of the rows of 'x' within blocks [i_[k], i_[k+1]) from cumulative sums along the first axis."""
+    cs = np.zeros((x.shape[0] + 1,) + x.shape[1:])
+    np.cumsum(x, axis=0, out=cs[1:])
+    return cs[i_[1:]] - cs[i_[:-1]]
+
+
+def _merge_moments(a_, b_):
+    """Chan et al. (1979) merge of two (n, mean, M2) states of the same shape, returns the merged state."""
+    n_a, mean_a, m2_a = a_
+    n_b, mean_b, m2_b = b_
+    n_ = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d_ = np.where(n_b > 0, mean_b, 0) - np.where(n_a > 0, mean_a, 0)
+        f_ = np.where(n_ > 0, n_b / n_, 0)
+        mean_ = np.where(n_a > 0, mean_a, 0) + d_ * f_
+        m2_ = m2_a + m2_b + d_**2 * n_a * f_
+    return n_, mean_, m2_
+
+
+def _merge_cross_moments(a_, b_):
+    """Chan et al. (1979) merge of two (n, mean_x, mean_y, M2_x, M2_y, C) states of the same shape, returns the merged
+    state."""
+    n_a, mx_a, my_a, m2x_a, m2y_a, c_a = a_
+    n_b, mx_b, my_b, m2x_b, m2y_b, c_b = b_
+    n_ = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_ = np.where(n_ > 0, n_b / n_, 0)
+        dx_ = np.where(n_b > 0, mx_b, 0) - np.where(n_a > 0, mx_a, 0)
+        dy_ = np.where(n_b > 0, my_b, 0) - np.where(n_a > 0, my_a, 0)
+        mx_ = np.where(n_a > 0, mx_a, 0) + dx_ * f_
+        my_ = np.where(n_a > 0, my_a, 0) + dy_ * f_
+        m2x_ = m2x_a + m2x_b + dx_**2 * n_a * f_
+        m2y_ = m2y_a + m2y_b + dy_**2 * n_a * f_
+        c_ = c_a + c_b + dx_ * dy_ * n_a * f_
+    return n_, mx_, my_, m2x_, m2y_, c_
+
+
+def _chunk_moments(i_, block_, x, y):
+    """Two pass (n, mean, M2) of 'x' and 'y', and (n, mean_x, mean_y, M2_x, M2_y, C) of their jointly valid samples,
+    per block.
+
+    Args:
+        i_ (ndarray): first sample of each block and the end of the last one, shape (blocks+1,)
+        block_ (ndarray): block of each sample within [i_[0], i_[-1]), shape (samples,)
+        x, y (ndarray): samples within [i_[0], i_[-1]), shape (samples, range), nan for missing
+
+    """
+    def moments(valid_, *fields):
+        n_ = _block_sums(i_, valid_.astype(float))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means_ = [_block_sums(i_, np.where(valid_, f_, 0)) / n_ for f_ in fields]
+        deviations_ = [np.where(valid_, f_ - m_[block_], 0) for f_, m_ in zip(fields, means_)]
+        return n_, means_, deviations_
+
+    n_x, (mean_x,), (dx_,) = moments(np.isfinite(x), x)
+    n_y, (mean_y,), (dy_,) = moments(np.isfinite(y), y)
+    n_xy, (mx_xy, my_xy), (dx_xy, dy_xy) = moments(np.isfinite(x) & np.isfinite(y), x, y)
+    return ((n_x, mean_x, _block_sums(i_, dx_**2)),
+            (n_y, mean_y, _block_sums(i_, dy_**2)),
+            (n_xy, mx_xy, my_xy, _block_sums(i_, dx_xy**2), _block_sums(i_, dy_xy**2),
+             _block_sums(i_, dx_xy * dy_xy)))
+
+
+class CovarianceBlocks:
+    """Streaming block moments of attenuated backscatter and vertical velocity and their covariance.
+
+    Args:
+        n_gates (int): number of range gates
+        t_min (float): Optional. Start of the block grid, default 0 (hours)
+        t_max (float): Optional. End of the block grid, default 24 (hours)
+        block_length (float): Optional. Length of an averaging block, default 3 min (hours)
+
+    """
+
+    def __init__(self, n_gates, t_min=0, t_max=24, block_length=BLOCK_LENGTH_3MIN):
+        self.n_gates = n_gates
+        self.edges, self.time_blocks = block_edges(block_length=block_length, t_min=t_min, t_max=t_max)
+        shape_ = (len(self.time_blocks), n_gates)
+        self.beta_moments = (np.zeros(shape_), np.full(shape_, np.nan), np.zeros(shape_))
+        self.velo_moments = (np.zeros(shape_), np.full(shape_, np.nan), np.zeros(shape_))
+        self.cross_moments = (np.zeros(shape_), np.full(shape_, np.nan), np.full(shape_, np.nan), np.zeros(shape_),
+                              np.zeros(shape_), np.zeros(shape_))
+
+    def add(self, time_, beta_att, velo):
+        """Adds the profiles of one chunk, e.g. a file or a part of it.
+
+        Args:
+            time_ (ndarray): times (hours), increasing, shape (time,)
+            beta_att (ndarray): attenuated backscatter (m-1 sr-1), shape (time, range), nan for missing
+            velo (ndarray): vertical velocity (m s-1), shape (time, range), nan for missing
+
+        """
+        time_ = np.asarray(time_, dtype=float)
+        i_, block_ = block_index(time_, self.edges)
+        samples_ = slice(i_[0], i_[-1])
+        beta_, velo_, cross_ = _chunk_moments(i_ - i_[0], block_, np.asarray(beta_att, dtype=float)[samples_],
+                                              np.asarray(velo, dtype=float)[samples_])
+        self.beta_moments = _merge_moments(self.beta_moments, beta_)
+        self.velo_moments = _merge_moments(self.velo_moments, velo_)
+        self.cross_moments = _merge_cross_moments(self.cross_moments, cross_)
+
+    def merge(self, other):
+        """Merges the moments of another CovarianceBlocks of the same grid, e.g. computed in a parallel worker or from
+        another partial file of the same day."""
+        self.beta_moments = _merge_moments(self.beta_moments, other.beta_moments)
+        self.velo_moments = _merge_moments(self.velo_moments, other.velo_moments)
+        self.cross_moments = _merge_cross_moments(self.cross_moments, other.cross_moments)
+
+    def result(self):
+        """Block statistics, nan where not defined.
+
+        Returns:
+            stats (dict): 'time_3min' block centers (hours), shape (blocks,), and 'attbeta_mean', 'attbeta_variance',
+                          'w_mean', 'w_variance', 'attbeta_velo_covariance', 'attbeta_velo_correlation', shape
+                          (blocks, range); variances and covariance are unbiased (n - 1)
+
+        """
+        n_beta, mean_beta, m2_beta = self.beta_moments
+        n_velo, mean_velo, m2_velo = self.velo_moments
+        n_xy, _, _, m2x_xy, m2y_xy, c_xy = self.cross_moments
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var_beta = np.where(n_beta > 1, m2_beta / (n_beta - 1), np.nan)
+            var_velo = np.where(n_velo > 1, m2_velo / (n_velo - 1), np.nan)
+            covar_ = np.where(n_xy > 1, c_xy / (n_xy - 1), np.nan)
+            correlation_ = c_xy / np.sqrt(m2x_xy * m2y_xy)
+        return {"time_3min": self.time_blocks,
+                "attbeta_mean": np.where(n_beta > 0, mean_beta, np.nan),
+                "attbeta_variance": var_beta,
+                "w_mean": np.where(n_velo > 0, mean_velo, np.nan),
+                "w_variance": var_velo,
+                "attbeta_velo_covariance": covar_,
+                "attbeta_velo_correlation": np.where(n_xy > 1, correlation_, np.nan)}
+
+
+def covariance_3min(time_, beta_att, velo, t_min=0, t_max=24):
+    """Block statistics of attenuated backscatter and vertical velocity in 3 min blocks of one file, see
+    CovarianceBlocks."""
+    blocks = CovarianceBlocks(np.shape(velo)[1], t_min=t_min, t_max=t_max)
+    blocks.add(time_, beta_att, velo)
+    return blocks.result()
+
+
+def covariance_nc_variables(range_, stats):
+    """netCDF variables of the attbeta_velo_covar product, see nc_tools.write_nc_.
+
+    Args:
+        range_ (ndarray): range (m), shape (range,)
+        stats (dict): output of CovarianceBlocks.result
+
+    Returns:
+        obs (list): VarBlueprint of time_3min, range and the *_3min statistics
+
+    """
+    return nc_variables_3min(stats["time_3min"], range_,
+                             {name + "_3min": data_ for name, data_ in stats.items() if name != "time_3min"})
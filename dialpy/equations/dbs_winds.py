@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for retrieving winds from Doppler beam swinging (DBS) scans of a Doppler lidar with 3, 4 or 5 beams.
+
+The inversion matrix of the beam geometry, the pseudo-inverse of vad_winds.vad_design_matrix, is cached per
+(beam count, elevation, azimuth set) configuration. The beams of a DBS cycle are measured one after another, thus the
+radial velocities of each beam are interpolated to common output times before the inversion, which is applied to the
+stacked (beam, time, range) radial velocities as one einsum.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+from functools import lru_cache
+import numpy as np
+from dialpy.equations.vad_winds import vad_design_matrix, wind_speed_direction
+
+_WIND_COMPONENTS = ("u", "v", "w")
+
+
+@lru_cache(maxsize=64)
+def dbs_inversion_matrix(n_beams, elevation_, azimuth_):
+    """Inversion matrix of a DBS configuration, cached and read-only.
+
+    Args:
+        n_beams (int): number of beams, 3-5
+        elevation_ (tuple): elevation of each beam (degrees from horizon), 90 for a vertical beam
+        azimuth_ (tuple): azimuth of each beam (degrees from North)
+
+    Returns:
+        M_ (ndarray): shape (3, beam), (u, v, w) = M_ @ radial velocities
+
+    """
+    if not 3 <= n_beams <= 5 or len(elevation_) != n_beams or len(azimuth_) != n_beams:
+        raise ValueError("DBS configuration has to have 3-5 beams, each with an elevation and an azimuth")
+    A_ = vad_design_matrix(azimuth_, elevation_)
+    if np.linalg.matrix_rank(A_) < 3:
+        raise ValueError("Beam geometry does not resolve all three wind components")
+    M_ = np.linalg.pinv(A_)
+    M_.setflags(write=False)
+    return M_
+
+
+def interpolation_weights(time_beam, time_out, max_time_gap=np.inf):
+    """Linear interpolation indices and weights from the measurement times of a beam to the output times.
+
+    Args:
+        time_beam (ndarray): measurement times of the beam, increasing, shape (time_beam,)
+        time_out (ndarray): output times, same units, shape (time,)
+        max_time_gap (float): Optional. Max distance between the bracketing measurements, larger gaps are masked
+
+    Returns:
+        i_0 (ndarray): index of the earlier measurement, shape (time,)
+        weight_ (ndarray): weight of the later measurement, nan where masked, shape (time,)
+
+    """
+    i_1 = np.clip(np.searchsorted(time_beam, time_out), 1, len(time_beam) - 1)
+    i_0 = i_1 - 1
+    dt_ = time_beam[i_1] - time_beam[i_0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight_ = np.where(dt_ > 0, (time_out - time_beam[i_0]) / dt_, 0.)
+    weight_[(weight_ < 0) | (weight_ > 1) | (dt_ > max_time_gap)] = np.nan
+    return i_0, weight_
+
+
+def _interpolate(field_, i_0, weight_):
+    """Applies interpolation_weights along the first axis of a (time_beam, range) field."""
+    weight_ = weight_[:, np.newaxis]
+    return field_[i_0] * (1 - weight_) + field_[i_0 + 1] * weight_
+
+
+def dbs_winds(velo, time_, azimuth_, elevation_, time_out=None, velo_precision=None, max_time_gap=np.inf):
+    """Wind vector of every (time, gate) from DBS scans.
+
+    Args:
+        velo (list): radial velocities (m s-1) of each beam, arrays of shape (time_beam, range), time_beam >= 2
+        time_ (list): measurement times of each beam, arrays of shape (time_beam,), e.g. hours UTC
+        azimuth_ (array like): azimuth of each beam (degrees from North), shape (beam,)
+        elevation_ (array like): elevation of each beam (degrees from horizon), shape (beam,) or scalar
+        time_out (ndarray): Optional. Output times, default the times of the first beam
+        velo_precision (list): Optional. Instrumental precision of the radial velocities of each beam (m s-1), arrays
+                               of shape (time_beam, range) or scalars
+        max_time_gap (float): Optional. Max gap between the measurements a beam is interpolated over, in the units of
+                              'time_', default no limit
+
+    Returns:
+        winds (dict): 'u', 'v', 'w', 'wind_speed', 'wind_direction', and if 'velo_precision' given their
+                      '_instrumental_precision', shape (time, range), see vad_winds.wind_nc_variables for writing
+
+    """
+    n_beams = len(velo)
+    azimuth_ = tuple(float(a_) for a_ in np.broadcast_to(azimuth_, (n_beams,)))
+    elevation_ = tuple(float(e_) for e_ in np.broadcast_to(elevation_, (n_beams,)))
+    M_ = dbs_inversion_matrix(n_beams, elevation_, azimuth_)
+    time_out = np.asarray(time_[0], dtype=float) if time_out is None else np.asarray(time_out, dtype=float)
+
+    # stacked (beam, time, range) fields on the output times
+    weights_ = [interpolation_weights(np.asarray(t_, dtype=float), time_out, max_time_gap) for t_ in time_]
+    velo_ = np.stack([_interpolate(np.asarray(v_, dtype=float), *w_) for v_, w_ in zip(velo, weights_)])
+    wind_ = np.einsum('kb,btr->ktr', M_, velo_)
+
+    winds = {}
+    for k, name in enumerate(_WIND_COMPONENTS):
+        winds[name] = wind_[k]
+
+    if velo_precision is None:
+        winds["wind_speed"], winds["wind_direction"], _, _ = wind_speed_direction(wind_[0], wind_[1], 0, 0, 0)
+        return winds
+
+    var_ = np.stack([_interpolate(np.broadcast_to(np.asarray(p_, dtype=float)**2, np.shape(v_)), *w_)
+                     for p_, v_, w_ in zip(velo_precision, velo, weights_)])
+    cov_ = np.einsum('kb,lb,btr->kltr', M_, M_, var_)
+    for k, name in enumerate(_WIND_COMPONENTS):
+        winds[name + "_instrumental_precision"] = np.sqrt(cov_[k, k])
+    winds["wind_speed"], winds["wind_direction"], winds["wind_speed_instrumental_precision"], \
+        winds["wind_direction_instrumental_precision"] = wind_speed_direction(wind_[0], wind_[1], cov_[0, 0],
+                                                                              cov_[1, 1], cov_[0, 1])
+
+    return winds
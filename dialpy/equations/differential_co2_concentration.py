@@ -10,16 +10,70 @@ Finnish Meteorological Institute
 
 import numpy as np
 from dialpy.equations import constants
+from dialpy.equations.spectroscopy import number_density_cm3
+from dialpy.utilities.profiling import timed_stage
 
 
-def xco2_power(P_on, P_off, delta_sigma_abs, P_bkg=None):
+def _h2o_number_density(h2o_ppm, T_, P_):
+    """H2O number density (# m-3) of a humidity profile, None without one."""
+    if h2o_ppm is None:
+        return None
+    if T_ is None or P_ is None:
+        raise ValueError("T_ and P_ have to be given with h2o_ppm")
+    return number_density_cm3(T_, P_, h2o_ppm) * 1e6  # cm-3 --> m-3
+
+
+def _subtract_h2o(log_ratio_of_powers, N_h2o, delta_sigma_h2o, i_):
+    """Removes the two-way differential optical depth of water vapour from the log ratio of powers of gate pairs
+    'i_'."""
+    if N_h2o is None or delta_sigma_h2o is None:
+        return log_ratio_of_powers
+    return log_ratio_of_powers - 2 * constants.DELTA_RANGE * np.asarray(delta_sigma_h2o)[i_] * np.asarray(N_h2o)[i_]
+
+
+def _pair_index(n_gates, mask_=None):
+    """Lower gates of the adjacent gate pairs of the differencing, pairs with a masked gate are skipped."""
+    if mask_ is None:
+        return np.arange(n_gates - 1)
+    mask_ = np.asarray(mask_, dtype=bool)
+    return np.flatnonzero(~(mask_[:-1] | mask_[1:]))
+
+
+def _number_density(P_on, P_off, P_bkg, delta_sigma_abs, N_h2o, delta_sigma_h2o, mask_):
+    """Log ratio of powers and number density of the gate pairs not masked, nan for the masked ones."""
+    i_ = _pair_index(len(P_on), mask_)
+    j_ = i_ + 1
+    log_ratio_of_powers = np.full((len(P_on) - 1, ), np.nan)
+    N_d = np.full((len(P_on) - 1, ), np.nan)
+
+    # Calculation the log ratio of powers
+    log_ratio_of_powers[i_] = np.log(np.divide(np.multiply(P_on[i_] - P_bkg[i_], P_off[j_] - P_bkg[j_]),
+                                               np.multiply(P_on[j_] - P_bkg[j_], P_off[i_] - P_bkg[i_])))
+
+    # calculate number density
+    N_d[i_] = np.multiply((1 / (2 * constants.DELTA_RANGE * np.asarray(delta_sigma_abs)[i_])),
+                          _subtract_h2o(log_ratio_of_powers[i_], N_h2o, delta_sigma_h2o, i_))
+
+    return N_d, log_ratio_of_powers
+
+
+@timed_stage("dial_differencing")
+def xco2_power(P_on, P_off, delta_sigma_abs, P_bkg=None, h2o_ppm=None, delta_sigma_h2o=None, T_=None, P_=None,
+               mask_=None):
     """
 
     Args:
         P_on:
         P_off:
         delta_sigma_abs:
-        P_bkg:
+        P_bkg: Optional. Background power, shape (range,), see background_noise.background_profiles, default zeros
+        h2o_ppm: Optional. H2O volume mixing ratio profile (ppm), shape (range,), requires T_ and P_
+        delta_sigma_h2o: Optional. H2O differential absorption cross section (m2), see
+                         spectroscopy.differential_absorption_cross_section
+        T_: Optional. Temperature profile (K) for the H2O number density, shape (range,)
+        P_: Optional. Pressure profile (atm) for the H2O number density, shape (range,)
+        mask_: Optional. Gates to skip, e.g. cloud and precipitation, see cloud_precip.dial_mask; gate pairs with a
+               masked gate are not computed and are nan in the outputs
 
     Returns:
         N_d (numpy array): Number density
@@ -30,24 +84,17 @@ def xco2_power(P_on, P_off, delta_sigma_abs, P_bkg=None):
     n_c = np.empty([len(P_on), ])
     n_c[:] = 0
 
-    # Exclude the last for calculation
-    delta_sigma_abs = delta_sigma_abs[:-1]
-
     # If P_bkg given, use it, otherwise assume constant value
     if P_bkg is None:
         P_bkg = np.zeros((len(P_on),))
 
-    # Calculation the log ratio of powers
-    log_ratio_of_powers = np.log(np.divide(np.multiply(P_on[:-1] - P_bkg[0:-1], P_off[1:] - P_bkg[1:]),
-                                           np.multiply(P_on[1:] - P_bkg[1:], P_off[:-1] - P_bkg[0:-1])))
+    return _number_density(P_on, P_off, P_bkg, delta_sigma_abs, _h2o_number_density(h2o_ppm, T_, P_), delta_sigma_h2o,
+                           mask_)
 
-    # calculate concentration
-    N_d = np.multiply((1 / (2 * constants.DELTA_RANGE * delta_sigma_abs)), log_ratio_of_powers)
 
-    return N_d, log_ratio_of_powers
-
-
-def xco2_beta(delta_sigma_abs, beta_att_on, beta_att_off, P_out_on=None, P_out_off=None, P_bkg=None):
+@timed_stage("dial_differencing")
+def xco2_beta(delta_sigma_abs, beta_att_on, beta_att_off, P_out_on=None, P_out_off=None, P_bkg=None, h2o_ppm=None,
+              delta_sigma_h2o=None, T_=None, P_=None, mask_=None):
     """
 
     Args:
@@ -56,7 +103,14 @@ def xco2_beta(delta_sigma_abs, beta_att_on, beta_att_off, P_out_on=None, P_out_o
         beta_att_off:
         P_out_on:
         P_out_off:
-        P_bkg:
+        P_bkg: Optional. Background power, shape (range,), see background_noise.background_profiles, default zeros
+        h2o_ppm: Optional. H2O volume mixing ratio profile (ppm), shape (range,), requires T_ and P_
+        delta_sigma_h2o: Optional. H2O differential absorption cross section (m2), see
+                         spectroscopy.differential_absorption_cross_section
+        T_: Optional. Temperature profile (K) for the H2O number density, shape (range,)
+        P_: Optional. Pressure profile (atm) for the H2O number density, shape (range,)
+        mask_: Optional. Gates to skip, e.g. cloud and precipitation, see cloud_precip.dial_mask; gate pairs with a
+               masked gate are not computed and are nan in the outputs
 
     Returns:
         N_d (numpy array): number density
@@ -68,9 +122,6 @@ def xco2_beta(delta_sigma_abs, beta_att_on, beta_att_off, P_out_on=None, P_out_o
     n_c = np.empty([len(beta_att_on), ])
     n_c[:] = 0
 
-    # Exclude the last for calculation
-    delta_sigma_abs = delta_sigma_abs[:-1]
-
     # If P_out given, use it, otherwise assume constant value
     if P_out_on is None:
         P_out_on = constants.POWER_OUT_LAMBDA_ON
@@ -84,14 +135,8 @@ def xco2_beta(delta_sigma_abs, beta_att_on, beta_att_off, P_out_on=None, P_out_o
     P_on = P_out_on * constants.DELTA_RANGE * beta_att_on + P_bkg
     P_off = P_out_off * constants.DELTA_RANGE * beta_att_off + P_bkg
 
-    # Calculation the log ratio of powers
-    log_ratio_of_powers = np.log(np.divide(np.multiply(P_on[:-1] - P_bkg[0:-1], P_off[1:] - P_bkg[1:]),
-                                           np.multiply(P_on[1:] - P_bkg[1:], P_off[:-1] - P_bkg[0:-1])))
-
-    # calculate number density
-    N_d = (1 / (2 * constants.DELTA_RANGE * delta_sigma_abs)) * log_ratio_of_powers
-
-    return N_d, log_ratio_of_powers
+    return _number_density(P_on, P_off, P_bkg, delta_sigma_abs, _h2o_number_density(h2o_ppm, T_, P_), delta_sigma_h2o,
+                           mask_)
 
 
 def C_co2_ppm(N_d, T_, P_):
@@ -110,4 +155,3 @@ def C_co2_ppm(N_d, T_, P_):
     N_L = constants.LOCHSMIDTS_NUMBER_AIR
 
     return (N_d / N_L) * (T_ / 273.15) * (1 / P_) * 1e6
-
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for the turbulent kinetic energy (TKE) dissipation rate product (epsilon, epsilon_vad, epsilon_dbs).
+
+Epsilon is estimated from the variance of vertical velocity in 3 min blocks following O'Connor et al. (2010)
+doi:10.1175/2010JTECHA1455.1,
+    epsilon = 2 pi (2 / (3 a))^(3/2) sigma_w^3 (L_N^(2/3) - L_1^(2/3))^(-3/2),
+where a is the Kolmogorov constant and L_1 = U t_1 and L_N = U N t_1 are the lengths advected past the beam by the
+horizontal wind U in one sample and in the N samples of the block. The noise free variance sigma_w^2 is from the
+Lenschow et al. (2000) extrapolation of the autocovariance, see velocity_statistics.sigma2w_lenschow_batch. The samples
+of each block are laid out as columns of one (sample, block * range) array, thus the autocovariances of all blocks and
+gates are computed with one FFT per chunk of blocks.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations.velocity_statistics import sigma2w_lenschow_batch
+from dialpy.equations.dbs_winds import interpolation_weights
+from dialpy.equations.rolling_statistics import BLOCK_LENGTH_3MIN, block_edges, block_index, nc_variables_3min
+
+# Kolmogorov constant of the one dimensional spectrum, O'Connor et al. (2010)
+KOLMOGOROV_CONSTANT = .55
+# lags (in samples) of the Lenschow et al. (2000) extrapolation
+_LENSCHOW_LAGS = range(1, 7)
+
+
+def epsilon_from_variance(sigma2_w, wind_speed, n_samples, dwell_time, a_=KOLMOGOROV_CONSTANT):
+    """TKE dissipation rate from the noise free variance of vertical velocity, O'Connor et al. (2010) Eq. (11).
+
+    Args:
+        sigma2_w (ndarray): variance of vertical velocity (m2 s-2)
+        wind_speed (ndarray): horizontal wind speed (m s-1)
+        n_samples (ndarray): number of samples the variance is computed from
+        dwell_time (float): time of one sample (s)
+        a_ (float): Optional. Kolmogorov constant, default 0.55
+
+    Returns:
+        epsilon (ndarray): (m2 s-3), nan where not defined
+
+    """
+    l_1 = np.asarray(wind_speed, dtype=float) * dwell_time
+    l_n = l_1 * n_samples
+    with np.errstate(divide='ignore', invalid='ignore'):
+        epsilon = 2 * np.pi * (2 / (3 * a_))**1.5 * np.asarray(sigma2_w)**1.5 * (l_n**(2/3) - l_1**(2/3))**-1.5
+    return np.where(np.isfinite(epsilon) & (epsilon > 0), epsilon, np.nan)
+
+
+def _block_layout(time_, edges):
+    """Block and in-block position of each sample, samples outside the grid get block -1.
+
+    Returns:
+        block_ (ndarray): block index of each sample, shape (time,)
+        position_ (ndarray): position of each sample within its block, shape (time,)
+        n_max (int): largest number of samples in a block
+
+    """
+    i_, in_grid = block_index(time_, edges)
+    block_ = np.full(len(time_), -1)
+    block_[i_[0]:i_[-1]] = in_grid
+    position_ = np.arange(len(time_)) - i_[np.maximum(block_, 0)]
+    n_max = int(position_[block_ >= 0].max()) + 1 if np.any(block_ >= 0) else 0
+    return block_, position_, n_max
+
+
+def block_velocity_variance(time_, velo, t_min=0, t_max=24, block_length=BLOCK_LENGTH_3MIN, chunk_size=32):
+    """Noise free variance of vertical velocity in blocks, vectorized over blocks and range gates.
+
+    Args:
+        time_ (ndarray): times (hours), increasing, shape (time,)
+        velo (ndarray): vertical velocity (m s-1), shape (time, range), nan for missing
+        t_min (float): Optional. Start of the block grid, default 0 (hours)
+        t_max (float): Optional. End of the block grid, default 24 (hours)
+        block_length (float): Optional. Length of a block, default 3 min (hours)
+        chunk_size (int): Optional. Number of blocks per FFT, limits the memory use
+
+    Returns:
+        time_blocks (ndarray): block centers (hours), shape (blocks,)
+        n_ (ndarray): number of valid samples, shape (blocks, range)
+        velo_var (ndarray): unbiased variance (m2 s-2), shape (blocks, range)
+        noise_var (ndarray): noise variance (m2 s-2), shape (blocks, range)
+
+    """
+    time_ = np.asarray(time_, dtype=float)
+    velo = np.asarray(velo, dtype=float)
+    edges, time_blocks = block_edges(block_length=block_length, t_min=t_min, t_max=t_max)
+    n_blocks, n_gates = len(edges) - 1, velo.shape[1]
+    block_, position_, n_max = _block_layout(time_, edges)
+
+    n_ = np.zeros((n_blocks, n_gates))
+    velo_var = np.full((n_blocks, n_gates), np.nan)
+    noise_var = np.full((n_blocks, n_gates), np.nan)
+    for b_0 in range(0, n_blocks, chunk_size):
+        b_1 = min(b_0 + chunk_size, n_blocks)
+        in_chunk = (block_ >= b_0) & (block_ < b_1)
+        if not np.any(in_chunk):
+            continue
+        # (sample, block, range), nan padded
+        samples_ = np.full((n_max, b_1 - b_0, n_gates), np.nan)
+        samples_[position_[in_chunk], block_[in_chunk] - b_0] = velo[in_chunk]
+        n_[b_0:b_1] = np.sum(np.isfinite(samples_), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var_, noise_ = sigma2w_lenschow_batch(samples_.reshape(n_max, -1), lags=_LENSCHOW_LAGS)
+        velo_var[b_0:b_1] = var_.reshape(b_1 - b_0, n_gates)
+        noise_var[b_0:b_1] = noise_.reshape(b_1 - b_0, n_gates)
+
+    return time_blocks, n_, velo_var, noise_var
+
+
+def wind_speed_to_blocks(time_ws, wind_speed, time_blocks, max_time_gap=np.inf):
+    """Linear interpolation of horizontal wind speed, e.g. from vad_winds, to the block centers.
+
+    Args:
+        time_ws (ndarray): times of the winds (hours), increasing, shape (time_ws,), at least 2
+        wind_speed (ndarray): wind speed (m s-1), shape (time_ws, range)
+        time_blocks (ndarray): block centers (hours), shape (blocks,)
+        max_time_gap (float): Optional. Max gap between the winds interpolated over (hours), default no limit
+
+    Returns:
+        wind_speed (ndarray): shape (blocks, range), nan outside the winds or over gaps
+
+    """
+    wind_speed = np.asarray(wind_speed, dtype=float)
+    i_0, weight_ = interpolation_weights(np.asarray(time_ws, dtype=float), time_blocks, max_time_gap)
+    weight_ = weight_[:, np.newaxis]
+    return wind_speed[i_0] * (1 - weight_) + wind_speed[i_0 + 1] * weight_
+
+
+def epsilon_3min(time_, velo, wind_speed, wind_speed_error=None, dwell_time=None, t_min=0, t_max=24,
+                 min_samples=20, a_=KOLMOGOROV_CONSTANT):
+    """TKE dissipation rate in 3 min blocks from vertical stare data and horizontal winds.
+
+    Args:
+        time_ (ndarray): times (hours), increasing, shape (time,)
+        velo (ndarray): vertical velocity (m s-1), shape (time, range), nan for missing
+        wind_speed (ndarray): horizontal wind speed (m s-1) on the block grid, broadcastable to (blocks, range), see
+                              wind_speed_to_blocks
+        wind_speed_error (ndarray): Optional. Error (std) of 'wind_speed' (m s-1), added to the uncertainty
+        dwell_time (float): Optional. Time of one sample (s), default the median sampling interval
+        t_min (float): Optional. Start of the block grid, default 0 (hours)
+        t_max (float): Optional. End of the block grid, default 24 (hours)
+        min_samples (int): Optional. Blocks with fewer valid samples are masked, default 20
+        a_ (float): Optional. Kolmogorov constant, default 0.55
+
+    Returns:
+        time_3min (ndarray): block centers (hours), shape (blocks,)
+        epsilon (ndarray): (m2 s-3), shape (blocks, range)
+        epsilon_error (ndarray): fractional uncertainty, shape (blocks, range)
+
+    """
+    time_ = np.asarray(time_, dtype=float)
+    if dwell_time is None:
+        dwell_time = np.median(np.diff(time_)) * 3600
+    time_3min, n_, velo_var, noise_var = block_velocity_variance(time_, velo, t_min=t_min, t_max=t_max)
+    wind_speed = np.broadcast_to(np.asarray(wind_speed, dtype=float), n_.shape)
+
+    epsilon = epsilon_from_variance(velo_var, wind_speed, n_, dwell_time, a_=a_)
+    epsilon[n_ < min_samples] = np.nan
+
+    # random error of the sample variance with noise, Var(s^2) = 2 (sigma_w^2 + sigma_e^2)^2 / N, and
+    # epsilon ~ sigma_w^3 / U
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_error = np.sqrt(2 / n_) * (velo_var + noise_var) / velo_var
+        epsilon_error = 1.5 * var_error
+        if wind_speed_error is not None:
+            epsilon_error = np.hypot(epsilon_error, np.asarray(wind_speed_error) / wind_speed)
+    epsilon_error = np.where(np.isfinite(epsilon), epsilon_error, np.nan)
+
+    return time_3min, epsilon, epsilon_error
+
+
+def epsilon_nc_variables(time_3min, range_, epsilon, epsilon_error):
+    """netCDF variables of the epsilon product, see nc_tools.write_nc_.
+
+    Returns:
+        obs (list): VarBlueprint of time_3min, range, epsilon_3min, and epsilon_error_3min
+
+    """
+    return nc_variables_3min(time_3min, range_, {"epsilon_3min": epsilon, "epsilon_error_3min": epsilon_error})
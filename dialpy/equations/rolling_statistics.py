@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for sliding window and block statistics of vertical velocity (wstats).
+
+Running power sums of the data are kept per range gate together with NaN-aware counts, thus adding (or removing) a
+profile costs O(range) regardless of the window length. Power sums are accumulated relative to a per gate shift to
+limit round off in the variance and skewness.
+
+The regular block grid (e.g. the 3 min blocks of the turbulence products), the block index of the samples and the
+netCDF variables of block products are shared by the *_3min products, see block_edges.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+from collections import deque
+import numpy as np
+from dialpy.utilities.dl_var_atts import dl_var_atts as vatts
+
+# 3 min blocks, in hours
+BLOCK_LENGTH_3MIN = 3 / 60
+
+
+def _central_moments(n_, s1, s2, s3):
+    """Mean, variance and skewness from power sums of shifted data.
+
+    Args:
+        n_ (ndarray): number of valid samples
+        s1, s2, s3 (ndarray): sums of (x-shift), (x-shift)**2 and (x-shift)**3
+
+    Returns:
+        mean_ (ndarray): mean of (x-shift)
+        var_ (ndarray): (biased) variance
+        skew_ (ndarray): skewness
+
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_ = s1 / n_
+        var_ = np.maximum(s2 / n_ - mean_**2, 0)
+        m3_ = s3 / n_ - 3 * mean_ * s2 / n_ + 2 * mean_**3
+        skew_ = m3_ / var_**1.5
+    mean_ = np.where(n_ > 0, mean_, np.nan)
+    var_ = np.where(n_ > 1, var_, np.nan)
+    skew_ = np.where(n_ > 2, skew_, np.nan)
+
+    return mean_, var_, skew_
+
+
+class RollingMoments:
+    """Sliding window moments (count, mean, variance, skewness) and lagged autocovariance of profiles, e.g. vertical
+    velocity of a stare, updated one profile at a time.
+
+    Args:
+        n_gates (int): number of range gates in a profile
+        window (float): window length, in the same units as the times given to push()
+        max_lag (int): Optional. Largest lag (in profiles) for the autocovariance, default 0
+
+    """
+
+    def __init__(self, n_gates, window, max_lag=0):
+        self.n_gates = n_gates
+        self.window = window
+        self.max_lag = max_lag
+        self._times = deque()
+        self._profiles = deque()
+        self._shift = np.full(n_gates, np.nan)
+        self._n = np.zeros(n_gates)
+        self._s1 = np.zeros(n_gates)
+        self._s2 = np.zeros(n_gates)
+        self._s3 = np.zeros(n_gates)
+        self._n_lag = np.zeros((max_lag+1, n_gates))
+        self._s_lag = np.zeros((max_lag+1, n_gates))
+
+    def _accumulate(self, idx, sign):
+        """Adds (sign=1) or removes (sign=-1) the profile at position 'idx' of the window and its lagged products."""
+        x_ = self._profiles[idx] - self._shift
+        valid_ = np.isfinite(x_)
+        x0 = np.where(valid_, x_, 0)
+        self._n += sign * valid_
+        self._s1 += sign * x0
+        self._s2 += sign * x0**2
+        self._s3 += sign * x0**3
+
+        # products with the 'max_lag' neighbouring profiles inside the window, towards the window interior
+        for lag in range(1, min(self.max_lag, len(self._profiles)-1) + 1):
+            y_ = self._profiles[idx - lag if sign > 0 else idx + lag] - self._shift
+            valid_xy = valid_ & np.isfinite(y_)
+            self._n_lag[lag] += sign * valid_xy
+            self._s_lag[lag] += sign * np.where(valid_xy, x0 * y_, 0)
+
+    def push(self, time_, profile):
+        """Adds a new profile and drops profiles older than 'window' from the newest one.
+
+        Args:
+            time_ (float): time of the profile, must not decrease between calls
+            profile (ndarray): profile values, shape (n_gates,), NaN for missing
+
+        """
+        profile = np.asarray(profile, dtype=float)
+        self._shift = np.where(np.isnan(self._shift), profile, self._shift)
+        self._times.append(time_)
+        self._profiles.append(profile)
+        self._accumulate(-1, 1)
+
+        while self._times and self._times[0] <= time_ - self.window:
+            self._accumulate(0, -1)
+            self._times.popleft()
+            self._profiles.popleft()
+
+    @property
+    def count(self):
+        """Number of valid samples per gate in the current window."""
+        return self._n.copy()
+
+    def moments(self):
+        """Current window statistics.
+
+        Returns:
+            mean_ (ndarray): mean, shape (n_gates,)
+            var_ (ndarray): variance, shape (n_gates,)
+            skew_ (ndarray): skewness, shape (n_gates,)
+
+        """
+        mean_, var_, skew_ = _central_moments(self._n, self._s1, self._s2, self._s3)
+        return mean_ + self._shift, var_, skew_
+
+    def acf(self):
+        """Current window autocorrelation at lags 0, 1, ..., max_lag, normalized with the window variance.
+
+        Returns:
+            acf_ (ndarray): autocorrelation, shape (max_lag+1, n_gates)
+
+        """
+        mean_, var_, _ = _central_moments(self._n, self._s1, self._s2, self._s3)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            acov = self._s_lag / self._n_lag - mean_**2
+        acov[0] = var_
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return acov / var_
+
+
+def _cumulative_sums(x):
+    """Cumulative counts and power sums along the first axis, with a leading row of zeros."""
+    x = np.asarray(x, dtype=float)
+    valid_ = np.isfinite(x)
+    with np.errstate(invalid='ignore'):
+        shift_ = np.nanmedian(x, axis=0)
+    x0 = np.where(valid_, x - np.where(np.isfinite(shift_), shift_, 0), 0)
+    sums = np.stack([valid_, x0, x0**2, x0**3]).astype(float)
+    cs = np.zeros((4, x.shape[0]+1) + x.shape[1:])
+    np.cumsum(sums, axis=1, out=cs[:, 1:])
+
+    return cs, np.where(np.isfinite(shift_), shift_, 0)
+
+
+def window_statistics(time_, x, t_start, t_end):
+    """Count, mean, variance and skewness of 'x' within arbitrary time windows [t_start, t_end), computed from
+    cumulative sums, thus vectorized over windows and range gates.
+
+    Args:
+        time_ (ndarray): times of the samples, increasing, shape (time,)
+        x (ndarray): data, shape (time, range), NaN for missing
+        t_start (ndarray): window start times, shape (windows,)
+        t_end (ndarray): window end times, shape (windows,)
+
+    Returns:
+        n_ (ndarray): number of valid samples, shape (windows, range)
+        mean_ (ndarray): mean, shape (windows, range)
+        var_ (ndarray): variance, shape (windows, range)
+        skew_ (ndarray): skewness, shape (windows, range)
+
+    """
+    cs, shift_ = _cumulative_sums(x)
+    i0 = np.searchsorted(time_, t_start, side='left')
+    i1 = np.searchsorted(time_, t_end, side='left')
+    n_, s1, s2, s3 = cs[:, i1] - cs[:, i0]
+    mean_, var_, skew_ = _central_moments(n_, s1, s2, s3)
+
+    return n_, mean_ + shift_, var_, skew_
+
+
+def sliding_window_statistics(time_, x, window, time_out=None):
+    """Centered sliding window statistics of 'x', e.g. 30 min window variance of vertical velocity.
+
+    Args:
+        time_ (ndarray): times of the samples, increasing, shape (time,)
+        x (ndarray): data, shape (time, range), NaN for missing
+        window (float): window length, same units as 'time_'
+        time_out (ndarray): Optional. Window centers, default 'time_'
+
+    Returns:
+        n_, mean_, var_, skew_ (ndarray): see window_statistics, shape (len(time_out), range)
+
+    """
+    time_out = time_ if time_out is None else np.asarray(time_out)
+    return window_statistics(time_, x, time_out - window/2, time_out + window/2)
+
+
+def block_statistics(time_, x, block_length, t_min=0, t_max=24):
+    """Block averaged statistics of 'x' on a regular time grid, e.g. 3 min blocks over a day given in hours.
+
+    Args:
+        time_ (ndarray): times of the samples, increasing, shape (time,)
+        x (ndarray): data, shape (time, range), NaN for missing
+        block_length (float): length of a block, same units as 'time_'
+        t_min (float): Optional. Start of the grid, default 0
+        t_max (float): Optional. End of the grid, default 24
+
+    Returns:
+        time_blocks (ndarray): block centers, shape (blocks,)
+        n_, mean_, var_, skew_ (ndarray): see window_statistics, shape (blocks, range)
+
+    """
+    edges, time_blocks = block_edges(block_length=block_length, t_min=t_min, t_max=t_max)
+    n_, mean_, var_, skew_ = window_statistics(time_, x, edges[:-1], edges[1:])
+
+    return time_blocks, n_, mean_, var_, skew_
+
+
+def block_edges(block_length=BLOCK_LENGTH_3MIN, t_min=0, t_max=24):
+    """Regular grid of blocks, by default 3 min blocks over a day given in hours.
+
+    Args:
+        block_length (float): Optional. Length of a block, default 3 min (hours)
+        t_min (float): Optional. Start of the grid, default 0
+        t_max (float): Optional. End of the grid, default 24, e.g. 24 * 31 for a month
+
+    Returns:
+        edges (ndarray): block edges, shape (blocks+1,)
+        time_blocks (ndarray): block centers, shape (blocks,)
+
+    """
+    edges = np.arange(t_min, t_max + block_length/2, block_length)
+    return edges, (edges[:-1] + edges[1:]) / 2
+
+
+def block_index(time_, edges):
+    """Samples of each block, the samples of block b are time_[i_[b]:i_[b+1]].
+
+    Args:
+        time_ (ndarray): times of the samples, increasing, shape (time,)
+        edges (ndarray): block edges, see block_edges
+
+    Returns:
+        i_ (ndarray): index of the first sample at or after each edge, shape (blocks+1,)
+        block_ (ndarray): block of each of the samples time_[i_[0]:i_[-1]]
+
+    """
+    i_ = np.searchsorted(time_, edges, side='left')
+    return i_, np.repeat(np.arange(len(edges) - 1), np.diff(i_))
+
+
+def nc_variables_3min(time_3min, range_, fields):
+    """netCDF variables of a product on the 3 min grid, see nc_tools.write_nc_.
+
+    Args:
+        time_3min (ndarray): block centers (hours), shape (blocks,)
+        range_ (ndarray): range (m), shape (range,)
+        fields (dict): {variable name: data of shape (blocks, range)}
+
+    Returns:
+        obs (list): VarBlueprint of time_3min, range and the fields
+
+    """
+    dim_size = (len(time_3min), len(range_))
+    return [vatts("time_3min", data=time_3min, dim_size=(len(time_3min), )),
+            vatts("range", data=range_, dim_size=(len(range_), ))] + \
+        [vatts(name, data=data_, dim_size=dim_size) for name, data_ in fields.items()]
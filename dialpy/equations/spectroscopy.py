@@ -0,0 +1,675 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Line-by-line absorption cross sections with explicit units, pluggable line shapes and temperature scaling models.
+
+Units used throughout the module:
+    wavenumber: cm-1
+    temperature: K
+    pressure: atm, other units are converted at the entry point with 'pressure_units'
+    line intensity: cm-1 / (molecule cm-2), HITRAN convention
+    cross section: m2 (per molecule)
+
+The functions are vectorized: state variables (T_, P_, co2_ppm) of any broadcastable shape are evaluated against all
+lines of the line list at once, lines being the last axis. Line lists may contain several species and isotopologues,
+each line is scaled with the abundance and molar mass of its isotopologue, see ISOTOPOLOGUES, and with the partition sum
+of its isotopologue where tabulated in PARTITION_SUM_TABLES, otherwise with that of the main isotopologue of its species
+(CO2) or a power law (H2O). Both bytran_abs_cross_section.absorption_coefficient and
+Johnsson_absroption_cross_section.delta_absorption_cross_section are adapters over absorption_cross_section.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import hashlib
+import os
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from scipy.signal import fftconvolve
+from scipy.special import wofz
+from dialpy.equations import constants
+from dialpy.equations.spectroscopy_cache import LRUCache, memoized
+
+_T_REF = 296.  # reference temperature of the HITRAN line parameters (K)
+_PRESSURE_IN_ATM = {'atm': 1., 'Pa': 1 / constants.STANDARD_PRESSURE, 'hPa': 1e2 / constants.STANDARD_PRESSURE}
+# lines further than this from the evaluated wavenumber are neglected (cm-1)
+_WING_CUTOFF = 25.
+# names of the HITRAN (molecule, isotopologue) numbers
+HITRAN_ISOTOPOLOGUES = {(1, 1): 'H216O', (1, 2): 'H218O', (1, 3): 'H217O', (1, 4): 'HD16O',
+                        (2, 1): '12C16O2', (2, 2): '13C16O2', (2, 3): '16O12C18O', (2, 4): '16O12C17O'}
+# species, natural abundance (as included in the HITRAN intensities) and molar mass (g mol-1) of the isotopologues
+ISOTOPOLOGUES = {'12C16O2': ('CO2', 9.84204e-1, 43.989830), '13C16O2': ('CO2', 1.10574e-2, 44.993185),
+                 '16O12C18O': ('CO2', 3.94707e-3, 45.994076), '16O12C17O': ('CO2', 7.33989e-4, 44.994045),
+                 'H216O': ('H2O', 9.97317e-1, 18.010565), 'H218O': ('H2O', 1.99983e-3, 20.014811),
+                 'H217O': ('H2O', 3.71884e-4, 19.014780), 'HD16O': ('H2O', 3.10693e-4, 19.016740)}
+# tabulated total internal partition sums, text files of (T (K), Q) rows, per isotopologue; isotopologues without a table
+# use the table of the main isotopologue of their species, e.g. TIPS tables of 13C16O2 can be added here
+PARTITION_SUM_TABLES = {'12C16O2': constants.PATH_TO_TOTAL_INTERNAL_SUM}
+_MAIN_ISOTOPOLOGUES = {'CO2': '12C16O2', 'H2O': 'H216O'}
+# species without a tabulated partition sum, Q(T) approximated by T^exponent (rigid rotor)
+_PARTITION_SUM_EXPONENTS = {'H2O': 1.5}
+# record of the binary line list cache
+_LINE_LIST_DTYPE = np.dtype([('isotopologue', 'U16'), ('nu_0', 'f8'), ('S_0', 'f8'), ('gamma_air', 'f8'),
+                             ('gamma_self', 'f8'), ('E_', 'f8'), ('n_air', 'f8'), ('delta_air', 'f8')])
+# (start, end) columns of the fields in the 160 character HITRAN2004+ .par format
+_HITRAN_PAR_COLUMNS = {'molecule': (0, 2), 'isotopologue': (2, 3), 'nu_0': (3, 15), 'S_0': (15, 25),
+                       'gamma_air': (35, 40), 'gamma_self': (40, 45), 'E_': (45, 55), 'n_air': (55, 59),
+                       'delta_air': (59, 67)}
+_MMAP_LINE_LISTS = LRUCache(maxsize=8)
+
+LineParameters = namedtuple('LineParameters', ['nu_0', 'S_0', 'gamma_air', 'gamma_self', 'E_', 'n_air', 'delta_air',
+                                               'isotopologue'], defaults=(None,))
+LineParameters.__doc__ = """HITRAN line parameters, each field is an array of shape (lines,) sorted by nu_0.
+
+    nu_0: vacuum wavenumber of the transition (cm-1)
+    S_0: line intensity at 296 K (cm-1 / (molecule cm-2))
+    gamma_air: air-broadened HWHM at 296 K and 1 atm (cm-1 atm-1)
+    gamma_self: self-broadened HWHM at 296 K and 1 atm (cm-1 atm-1)
+    E_: lower-state energy of the transition (cm-1)
+    n_air: coefficient of the temperature dependence of the air-broadened half width
+    delta_air: air pressure-induced line shift (cm-1 atm-1)
+    isotopologue: isotopologue name, see ISOTOPOLOGUES, None = all lines of 12C16O2
+"""
+
+
+def _read_text_line_list(file_name):
+    """Parses a line list text file into a structured array of _LINE_LIST_DTYPE sorted by nu_0. Tab separated
+    extracts (as constants.PATH_TO_HITRAN) and the fixed width 160 character HITRAN .par format are supported."""
+
+    with open(file_name, 'r') as f:
+        first_line = f.readline().rstrip('\n')
+
+    if '\t' in first_line:
+        # Columns:  Isotopologue nu S A gamma_air gamma_self E" n_air delta_air J' J"
+        data = pd.read_csv(file_name, delimiter='\t', header=None)
+        lines = np.empty(len(data), dtype=_LINE_LIST_DTYPE)
+        lines['isotopologue'] = data.values[:, 0].astype(str)
+        lines['isotopologue'] = np.char.strip(lines['isotopologue'])
+        for i, name in zip((1, 2, 4, 5, 6, 7, 8), _LINE_LIST_DTYPE.names[1:]):
+            lines[name] = data.values[:, i].astype(float)
+    else:
+        columns_ = _HITRAN_PAR_COLUMNS
+        data = pd.read_fwf(file_name, colspecs=list(columns_.values()), names=list(columns_), header=None,
+                           dtype={'molecule': int, 'isotopologue': str})
+        # isotopologues 10, 11, 12,... are denoted 0, A, B,... in the .par format
+        iso_ = ['1234567890ABCDEFGHIJ'.index(i_) + 1 for i_ in data['isotopologue'].astype(str)]
+        lines = np.empty(len(data), dtype=_LINE_LIST_DTYPE)
+        lines['isotopologue'] = [HITRAN_ISOTOPOLOGUES.get((m_, i_), 'M{}I{}'.format(m_, i_))
+                                 for m_, i_ in zip(data['molecule'], iso_)]
+        for name in _LINE_LIST_DTYPE.names[1:]:
+            lines[name] = data[name].values.astype(float)
+
+    return lines[np.argsort(lines['nu_0'], kind='stable')]
+
+
+def file_checksum(file_name, block_size=2**20):
+    """SHA-256 of a file, read in blocks.
+
+    Args:
+        file_name (str): full path to the file
+        block_size (int): Optional. Bytes read at a time
+
+    Returns:
+        checksum (str): hexadecimal digest
+
+    """
+    sha = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def line_list_cache_name(file_name, checksum, cache_dir=None):
+    """Name of the binary cache of a line list: <cache_dir>/<file name>.<checksum[:16]>.lines.npy, by default next
+    to the source file."""
+    cache_dir = os.path.dirname(os.path.abspath(file_name)) if cache_dir is None else cache_dir
+    return os.path.join(cache_dir, '{}.{}.lines.npy'.format(os.path.basename(file_name), checksum[:16]))
+
+
+def _remove_stale_line_list_caches(file_name, checksum, cache_dir):
+    """Removes the caches <file name>.<checksum[:16]>.lines.npy of earlier versions of the source, caches of other
+    sources, e.g. <file name>.v2, are kept."""
+    prefix_ = os.path.basename(file_name) + '.'
+    for old_name in os.listdir(cache_dir):
+        old_checksum = old_name[len(prefix_):-len('.lines.npy')]
+        if old_name.startswith(prefix_) and old_name.endswith('.lines.npy') and len(old_checksum) == 16 and \
+                all(c_ in '0123456789abcdef' for c_ in old_checksum) and old_checksum != checksum[:16]:
+            os.remove(os.path.join(cache_dir, old_name))
+
+
+def convert_line_list(file_name, cache_dir=None):
+    """One-time conversion of a line list text file into a binary, memory mappable .npy file of structured records
+    sorted by wavenumber. The cache name contains the checksum of the source, thus an edited source gets a new cache
+    and caches of earlier versions of the same source are removed.
+
+    Args:
+        file_name (str): full path to the line list text file, see _read_text_line_list
+        cache_dir (str): Optional. Folder of the cache, default folder of the source
+
+    Returns:
+        cache_name (str): full path to the cache
+
+    """
+    checksum = file_checksum(file_name)
+    cache_name = line_list_cache_name(file_name, checksum, cache_dir=cache_dir)
+    if os.path.isfile(cache_name):
+        return cache_name
+
+    _remove_stale_line_list_caches(file_name, checksum, os.path.dirname(cache_name))
+
+    # written under a temporary name so that an interrupted conversion never leaves a truncated cache
+    tmp_name = cache_name + '.{}.tmp'.format(os.getpid())
+    with open(tmp_name, 'wb') as f:
+        np.save(f, _read_text_line_list(file_name))
+    os.replace(tmp_name, cache_name)
+
+    return cache_name
+
+
+def load_line_list(file_name=constants.PATH_TO_HITRAN, nu_min=None, nu_max=None, cache_dir=None):
+    """Line list from the binary cache, converted on the first call and whenever the checksum of the source changes.
+    The cache is memory mapped once per version (size and modification time) of the source, and only the records
+    within the spectral window are read.
+
+    Args:
+        file_name (str): Optional. Full path to the line list text file, default constants.PATH_TO_HITRAN
+        nu_min (float): Optional. Lower edge of the spectral window (cm-1), default all lines
+        nu_max (float): Optional. Upper edge of the spectral window (cm-1), default all lines
+        cache_dir (str): Optional. Folder of the cache, default folder of the source
+
+    Returns:
+        lines (LineParameters): read-only arrays sorted by nu_0
+
+    """
+    stat_ = os.stat(file_name)
+    key_ = (os.path.abspath(file_name), stat_.st_size, stat_.st_mtime_ns, cache_dir)
+    records = _MMAP_LINE_LISTS.get(key_)
+    if records is None:
+        records = np.load(convert_line_list(file_name, cache_dir=cache_dir), mmap_mode='r')
+        _MMAP_LINE_LISTS.put(key_, records)
+
+    nu_ = records['nu_0']
+    i_0 = 0 if nu_min is None else np.searchsorted(nu_, nu_min, side='left')
+    i_1 = len(records) if nu_max is None else np.searchsorted(nu_, nu_max, side='right')
+    window_ = np.array(records[i_0:i_1])
+    fields = []
+    for name in LineParameters._fields:
+        field_ = np.ascontiguousarray(window_[name])
+        field_.setflags(write=False)
+        fields.append(field_)
+
+    return LineParameters(*fields)
+
+
+@lru_cache(maxsize=8)
+def read_line_list(file_name=constants.PATH_TO_HITRAN):
+    """All lines of a line list, read through the binary cache (see load_line_list) only once per file name.
+
+    Args:
+        file_name (str): Optional. Full path to the file, default constants.PATH_TO_HITRAN
+
+    Returns:
+        lines (LineParameters): read-only arrays sorted by nu_0
+
+    """
+    return load_line_list(file_name)
+
+
+def select_lines(lines, nu_min, nu_max):
+    """Lines with nu_min <= nu_0 <= nu_max, as views of the (sorted) line list.
+
+    Args:
+        lines (LineParameters): line list
+        nu_min (float): lower edge of the spectral window (cm-1)
+        nu_max (float): upper edge of the spectral window (cm-1)
+
+    Returns:
+        lines (LineParameters):
+
+    """
+    i_0 = np.searchsorted(lines.nu_0, nu_min, side='left')
+    i_1 = np.searchsorted(lines.nu_0, nu_max, side='right')
+    return LineParameters(*[None if field_ is None else field_[i_0:i_1] for field_ in lines])
+
+
+def _line_isotopologues(lines):
+    """Unique isotopologue names of the lines and the index of each line into them."""
+    if lines.isotopologue is None:
+        return np.array(['12C16O2']), np.zeros(len(lines.nu_0), dtype=int)
+    names, inverse_ = np.unique(lines.isotopologue, return_inverse=True)
+    unknown = [name for name in names if name not in ISOTOPOLOGUES]
+    if unknown:
+        raise ValueError("Unknown isotopologues {}, add them into ISOTOPOLOGUES".format(', '.join(unknown)))
+    return names, np.ravel(inverse_)
+
+
+def line_species(lines):
+    """Species of each line, e.g. 'CO2', shape (lines,)"""
+    names, inverse_ = _line_isotopologues(lines)
+    return np.array([ISOTOPOLOGUES[name][0] for name in names])[inverse_]
+
+
+def select_species(lines, species):
+    """Lines of one species.
+
+    Args:
+        lines (LineParameters): line list
+        species (str): e.g. 'CO2' or 'H2O'
+
+    Returns:
+        lines (LineParameters):
+
+    """
+    mask_ = line_species(lines) == species
+    if lines.isotopologue is None:
+        return lines if mask_.all() else LineParameters(*[field_[mask_] for field_ in lines[:-1]])
+    return LineParameters(*[field_[mask_] for field_ in lines])
+
+
+def pressure_to_atm(P_, units='atm'):
+    """Converts pressure to atm.
+
+    Args:
+        P_ (array like): pressure
+        units (str): Optional. Units of 'P_', 'atm', 'Pa', or 'hPa'
+
+    Returns:
+        P_atm (ndarray): pressure (atm)
+
+    """
+    if units not in _PRESSURE_IN_ATM:
+        raise ValueError("Pressure units can be {}".format(', '.join(_PRESSURE_IN_ATM)))
+    return np.asarray(P_, dtype=float) * _PRESSURE_IN_ATM[units]
+
+
+def wavelength_to_wavenumber(lambda_):
+    """
+    Args:
+        lambda_ (float): vacuum wavelength (m)
+
+    Returns:
+        nu_ (float): wavenumber (cm-1)
+
+    """
+    return 1 / (lambda_ * 1e2)
+
+
+@lru_cache(maxsize=16)
+def _partition_sum_table(file_name):
+    data = pd.read_csv(file_name, delimiter=',', header=None).values
+    return data[:, 0].astype(float), data[:, 1].astype(float)
+
+
+def _partition_sum_file(isotopologue):
+    """Table of the isotopologue, or of the main isotopologue of its species, None if neither is tabulated."""
+    species = ISOTOPOLOGUES[isotopologue][0]
+    return PARTITION_SUM_TABLES.get(isotopologue, PARTITION_SUM_TABLES.get(_MAIN_ISOTOPOLOGUES.get(species)))
+
+
+def partition_sum(T_, isotopologue='12C16O2'):
+    """Total internal partition sum of an isotopologue, linearly interpolated from its table in PARTITION_SUM_TABLES,
+    or from the table of the main isotopologue of its species if it has none.
+
+    Args:
+        T_ (array like): temperature (K)
+        isotopologue (str): Optional. See ISOTOPOLOGUES, default '12C16O2'
+
+    Returns:
+        Q_T (ndarray):
+
+    """
+    file_name = _partition_sum_file(isotopologue)
+    if file_name is None:
+        raise ValueError("No partition sum table for {}, add it into PARTITION_SUM_TABLES".format(isotopologue))
+    T_table, Q_table = _partition_sum_table(file_name)
+    return np.interp(T_, T_table, Q_table)
+
+
+def partition_sum_ratio(lines, T_):
+    """Ratio of the partition sums Q(296 K) / Q(T) of the isotopologue of each line, from the tables of
+    PARTITION_SUM_TABLES (see partition_sum), or the power law of _PARTITION_SUM_EXPONENTS for species without one.
+
+    Args:
+        lines (LineParameters): line list
+        T_ (array like): temperature (K)
+
+    Returns:
+        Q_ratio (ndarray): shape of T_ broadcast against (lines,)
+
+    """
+    T_ = np.asarray(T_, dtype=float)
+    names, inverse_ = _line_isotopologues(lines)
+    Q_ratio = np.empty(np.broadcast(T_, inverse_).shape)
+    for i, name in enumerate(names):
+        species = ISOTOPOLOGUES[name][0]
+        if _partition_sum_file(name) is not None:
+            ratio_ = partition_sum(_T_REF, name) / partition_sum(T_, name)
+        elif species in _PARTITION_SUM_EXPONENTS:
+            ratio_ = (_T_REF / T_)**_PARTITION_SUM_EXPONENTS[species]
+        else:
+            raise ValueError("No partition sum for species {}".format(species))
+        is_ = inverse_ == i
+        Q_ratio[..., is_] = np.broadcast_to(ratio_, Q_ratio.shape)[..., is_]
+    return Q_ratio
+
+
+# Temperature scaling of the line intensities, functions of (lines, T_) returning S(T) (cm-1 / (molecule cm-2))
+
+def intensity_hitran(lines, T_):
+    """HITRAN temperature scaling with the total internal partition sum, see http://www.bytran.org/howtolbl.htm"""
+    c_2 = constants.SECOND_BLACK_BODY_RADIATION_CONSTANT  # (cm K)
+    return lines.S_0 * partition_sum_ratio(lines, T_) * np.exp(-c_2 * lines.E_ * (1 / T_ - 1 / _T_REF)) \
+        * ((1 - np.exp(-c_2 * lines.nu_0 / T_)) / (1 - np.exp(-c_2 * lines.nu_0 / _T_REF)))
+
+
+def intensity_power_law(lines, T_):
+    """Partition sum approximated by T^(3/2), see Johnson et al. (2013) Eq. (4) http://dx.doi.org/10.1364/AO.52.002994,
+    and Browell et al. (1991) Eq. (1) https://doi.org/10.1364/AO.30.001517"""
+    c_2 = constants.SECOND_BLACK_BODY_RADIATION_CONSTANT  # (cm K)
+    return lines.S_0 * (_T_REF / T_)**(3 / 2) * np.exp(-c_2 * lines.E_ * (1 / T_ - 1 / _T_REF)) \
+        * ((1 - np.exp(-c_2 * lines.nu_0 / T_)) / (1 - np.exp(-c_2 * lines.nu_0 / _T_REF)))
+
+
+INTENSITY_MODELS = {'hitran': intensity_hitran,
+                    'power_law': intensity_power_law}
+
+
+# Lorentz half widths, functions of (lines, T_, P_, P_mol) returning HWHM (cm-1), pressures in atm
+
+def lorentz_hwhm_hitran(lines, T_, P_, P_mol):
+    """Air and self broadening, see http://www.bytran.org/howtolbl.htm"""
+    return (_T_REF / T_)**lines.n_air * (lines.gamma_air * (P_ - P_mol) + lines.gamma_self * P_mol)
+
+
+def lorentz_hwhm_air(lines, T_, P_, P_mol):
+    """Air broadening only, see Browell et al. (1991) Eq. (2) https://doi.org/10.1364/AO.30.001517"""
+    return lines.gamma_air * P_ * (_T_REF / T_)**lines.n_air
+
+
+WIDTH_MODELS = {'hitran': lorentz_hwhm_hitran,
+                'air': lorentz_hwhm_air}
+
+
+def doppler_hwhm(nu_0, T_, molar_mass=constants.MOLAR_MASS_CO2):
+    """Doppler half width at half maximum.
+
+    Args:
+        nu_0 (array like): line center (cm-1)
+        T_ (array like): temperature (K)
+        molar_mass (float): Optional. Molar mass of the molecule (g mol-1), default CO2
+
+    Returns:
+        alpha_doppler (ndarray): HWHM (cm-1)
+
+    """
+    return nu_0 / constants.SPEED_OF_LIGHT * np.sqrt(2 * constants.AVOGADRO_NUMBER * constants.BOLTZMANNS_CONSTANT *
+                                                     T_ * np.log(2) / (1e-3 * molar_mass))
+
+
+# Line shapes, functions of (nu_ - nu_center, alpha_doppler, gamma) returning the normalized profile (cm)
+
+def doppler_profile(delta_nu, alpha_doppler, gamma):
+    """Gaussian profile, Doppler broadening dominates in the low-pressure upper atmosphere"""
+    return np.sqrt(np.log(2) / np.pi) / alpha_doppler * np.exp(-np.log(2) * (delta_nu / alpha_doppler)**2)
+
+
+def lorentz_profile(delta_nu, alpha_doppler, gamma):
+    """Lorentz profile, pressure broadening dominates in the lower atmosphere"""
+    return gamma / (np.pi * (gamma**2 + delta_nu**2))
+
+
+def voigt_profile(delta_nu, alpha_doppler, gamma):
+    """Voigt profile, real part of the Faddeeva function"""
+    z_ = np.sqrt(np.log(2)) * (delta_nu + 1j * gamma) / alpha_doppler
+    return np.sqrt(np.log(2) / np.pi) / alpha_doppler * wofz(z_).real
+
+
+LINE_SHAPES = {'doppler': doppler_profile,
+               'lorentz': lorentz_profile,
+               'voigt': voigt_profile}
+
+
+def absorption_cross_section(nu_, T_, P_, co2_ppm=400., lines=None, line_shape='voigt', intensity_model='hitran',
+                             width_model='hitran', pressure_units='atm', pressure_shift=True, wing_cutoff=_WING_CUTOFF,
+                             species='CO2', self_ppm=None, abundances=None):
+    """Absorption cross section of a species at wavenumber 'nu_', sum over its lines (all isotopologues) within
+    'wing_cutoff'. Memoized per quantized state when spectroscopy_cache is enabled.
+
+    Args:
+        nu_ (array like): wavenumber (cm-1), a grid of shape (nu,) gives spectra when the state variables have a
+                          trailing axis of length 1
+        T_ (array like): temperature (K)
+        P_ (array like): pressure, in 'pressure_units'
+        co2_ppm (array like): Optional. CO2 concentration (ppm), for self broadening, default 400
+        lines (LineParameters): Optional. Line list, default read_line_list()
+        line_shape (str): Optional. 'voigt', 'lorentz' or 'doppler', see LINE_SHAPES
+        intensity_model (str): Optional. 'hitran' or 'power_law', see INTENSITY_MODELS
+        width_model (str): Optional. 'hitran' or 'air', see WIDTH_MODELS
+        pressure_units (str): Optional. 'atm', 'Pa' or 'hPa'
+        pressure_shift (bool): Optional. Shift line centers by delta_air * P_, default True
+        wing_cutoff (float): Optional. Max distance of the evaluated lines from 'nu_' (cm-1), default 25
+        species (str): Optional. Absorbing species, e.g. 'CO2' or 'H2O', default 'CO2'
+        self_ppm (array like): Optional. Concentration of the absorbing species (ppm) for self broadening, default
+                               'co2_ppm'
+        abundances (dict): Optional. {isotopologue: abundance} replacing the natural abundances of ISOTOPOLOGUES
+
+    Returns:
+        sigma_abs (ndarray): absorption cross section (m2 per molecule of the species), shape of the broadcast T_, P_,
+                             co2_ppm
+
+    """
+    for name, value_, options in (('line_shape', line_shape, LINE_SHAPES),
+                                  ('intensity_model', intensity_model, INTENSITY_MODELS),
+                                  ('width_model', width_model, WIDTH_MODELS)):
+        if value_ not in options:
+            raise ValueError("Optional input {}= can be {}".format(name, ', '.join(options)))
+
+    return _cross_section(nu_, T_, pressure_to_atm(P_, pressure_units), co2_ppm,
+                          co2_ppm if self_ppm is None else self_ppm, lines=lines, line_shape=line_shape,
+                          intensity_model=intensity_model, width_model=width_model, pressure_shift=pressure_shift,
+                          wing_cutoff=wing_cutoff, species=species, abundances=abundances)
+
+
+@memoized(static=('lines', 'line_shape', 'intensity_model', 'width_model', 'pressure_shift', 'wing_cutoff', 'species',
+                  'abundances'))
+def _cross_section(nu_, T_, P_, co2_ppm, self_ppm, lines=None, line_shape='voigt', intensity_model='hitran',
+                   width_model='hitran', pressure_shift=True, wing_cutoff=_WING_CUTOFF, species='CO2',
+                   abundances=None):
+    """absorption_cross_section with validated options and pressure in atm, cached by spectroscopy_cache when it is
+    enabled."""
+    lines = read_line_list() if lines is None else lines
+    nu_ = np.asarray(nu_, dtype=float)
+    lines = select_species(select_lines(lines, nu_.min() - wing_cutoff, nu_.max() + wing_cutoff), species)
+    T_ = np.asarray(T_, dtype=float)[..., np.newaxis]
+    P_ = np.asarray(P_, dtype=float)[..., np.newaxis]
+    P_mol = P_ * np.asarray(self_ppm, dtype=float)[..., np.newaxis] / 1e6  # (atm)
+
+    # properties of the isotopologue of each line
+    names, inverse_ = _line_isotopologues(lines)
+    molar_mass = np.array([ISOTOPOLOGUES[name][2] for name in names])[inverse_]
+    S_T = INTENSITY_MODELS[intensity_model](lines, T_)
+    if abundances is not None:
+        abundance_ratio = np.array([abundances.get(name, ISOTOPOLOGUES[name][1]) / ISOTOPOLOGUES[name][1]
+                                    for name in names])
+        S_T = S_T * abundance_ratio[inverse_]
+    alpha_doppler = doppler_hwhm(lines.nu_0, T_, molar_mass=molar_mass)
+    gamma = WIDTH_MODELS[width_model](lines, T_, P_, P_mol)
+    nu_center = lines.nu_0 + lines.delta_air * P_ if pressure_shift else lines.nu_0
+    f_ = LINE_SHAPES[line_shape](nu_[..., np.newaxis] - nu_center, alpha_doppler, gamma)
+
+    return np.sum(S_T * f_, axis=-1) * 1e-4  # cm2 --> m2
+
+
+def number_density_cm3(T_, P_, co2_ppm):
+    """Number density of CO2 (or of any species given its concentration) from the ideal gas law.
+
+    Args:
+        T_ (array like): temperature (K)
+        P_ (array like): pressure (atm)
+        co2_ppm (array like): CO2 concentration (ppm)
+
+    Returns:
+        N_ (ndarray): number density (molecule cm-3)
+
+    """
+    return constants.LOCHSMIDTS_NUMBER_AT_1ATM_296K * (_T_REF / np.asarray(T_)) * np.asarray(P_) * \
+        np.asarray(co2_ppm) / 1e6
+
+
+def differential_absorption_cross_section(nu_on, nu_off, T_, P_, co2_ppm=400., **kwargs):
+    """Differential absorption cross section sigma(nu_on) - sigma(nu_off) (m2) of one species, see
+    absorption_cross_section for the optional inputs, e.g. species='H2O' with an H2O line list for the water vapour
+    interference of a CO2 DIAL.
+
+    Args:
+        nu_on (float): wavenumber of the ON channel (cm-1)
+        nu_off (float): wavenumber of the OFF channel (cm-1)
+        T_ (array like): temperature (K)
+        P_ (array like): pressure
+        co2_ppm (array like): Optional. CO2 concentration (ppm), default 400
+
+    Returns:
+        delta_sigma_abs (ndarray): (m2)
+
+    """
+    return absorption_cross_section(nu_on, T_, P_, co2_ppm, **kwargs) - \
+        absorption_cross_section(nu_off, T_, P_, co2_ppm, **kwargs)
+
+
+def frequency_to_wavenumber(f_):
+    """
+    Args:
+        f_ (float): frequency (Hz), e.g. a laser linewidth
+
+    Returns:
+        nu_ (float): wavenumber (cm-1)
+
+    """
+    return f_ / (constants.SPEED_OF_LIGHT * 1e2)
+
+
+def gaussian_laser_profile(delta_nu, fwhm):
+    """Normalized Gaussian spectral profile of the transmitter.
+
+    Args:
+        delta_nu (array like): distance from the laser center wavenumber (cm-1)
+        fwhm (float): full width at half maximum of the laser line (cm-1)
+
+    Returns:
+        f_laser (ndarray): (cm)
+
+    """
+    sigma_ = fwhm / (2 * np.sqrt(2 * np.log(2)))
+    return np.exp(-.5 * (delta_nu / sigma_)**2) / (np.sqrt(2 * np.pi) * sigma_)
+
+
+class LaserConvolution:
+    """Absorption cross section seen by a transmitter of finite linewidth: the cross section on a fine spectral grid
+    around the laser wavenumber is weighted with the laser spectral profile, i.e. the convolution at the laser center.
+    Results are cached per quantized (T, P, CO2) state in an LRUCache, thus repeated states, e.g. the same prior profile
+    for every time step, cost a lookup.
+
+    Examples:
+        laser_on = LaserConvolution(wavelength_to_wavenumber(constants.LAMBDA_ON),
+                                    fwhm=frequency_to_wavenumber(5e6))
+        sigma_on = laser_on.cross_section(T_, P_, co2_ppm)
+
+    """
+
+    def __init__(self, nu_laser, fwhm=None, profile=None, n_grid=257, grid_half_width=None, maxsize=4096,
+                 tolerances=(1e-2, 1e-5, 1e-2), **kwargs):
+        """
+        Args:
+            nu_laser (float): center wavenumber of the laser (cm-1)
+            fwhm (float): Optional. FWHM of a Gaussian laser line (cm-1)
+            profile (tuple): Optional. Measured laser spectrum (delta_nu (cm-1), intensity), used instead of 'fwhm',
+                             normalized to unit area on the grid
+            n_grid (int): Optional. Number of points of the spectral grid (odd), default 257
+            grid_half_width (float): Optional. Half width of the grid (cm-1), default 4 * fwhm or the measured span
+            maxsize (int): Optional. Max number of cached states, default 4096
+            tolerances (tuple): Optional. Quantization of the cache keys, (T (K), P (atm), CO2 (ppm))
+            **kwargs: optional inputs of absorption_cross_section, pressure_units is applied before caching
+
+        """
+        if fwhm is None and profile is None:
+            raise ValueError("Either fwhm= or profile= is required")
+        n_grid += 1 - n_grid % 2  # odd, so that the laser center is a grid point
+        if grid_half_width is None:
+            grid_half_width = 4 * fwhm if profile is None else np.max(np.abs(profile[0]))
+
+        self.nu_laser = nu_laser
+        self.delta_nu = np.linspace(-grid_half_width, grid_half_width, n_grid)
+        self.step = self.delta_nu[1] - self.delta_nu[0]
+        if profile is None:
+            f_laser = gaussian_laser_profile(self.delta_nu, fwhm)
+        else:
+            f_laser = np.interp(self.delta_nu, profile[0], profile[1], left=0., right=0.)
+        # convolution at the center = integral of sigma(nu) * f_laser(nu - nu_laser) = sigma_ @ weights_
+        self.weights = f_laser / np.sum(f_laser)
+        self.kernel = (self.weights / self.step)[::-1]
+
+        self.pressure_units = kwargs.pop('pressure_units', 'atm')
+        self.kwargs = kwargs
+        self.tolerances = np.asarray(tolerances, dtype=float)
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def convolved_spectrum(self, T_, P_, co2_ppm=400.):
+        """Convolved cross section on the spectral grid nu_laser + delta_nu.
+
+        Args:
+            T_ (array like): temperature (K)
+            P_ (array like): pressure (atm)
+            co2_ppm (array like): Optional. CO2 concentration (ppm), default 400
+
+        Returns:
+            sigma_abs (ndarray): (m2), shape (..., grid)
+
+        """
+        sigma_ = absorption_cross_section(self.nu_laser + self.delta_nu, np.asarray(T_)[..., np.newaxis],
+                                          np.asarray(P_)[..., np.newaxis], np.asarray(co2_ppm)[..., np.newaxis],
+                                          **self.kwargs)
+        return fftconvolve(sigma_, self.kernel.reshape((1,) * (sigma_.ndim - 1) + (-1,)),
+                           mode='same', axes=-1) * self.step
+
+    def cross_section(self, T_, P_, co2_ppm=400.):
+        """Effective cross section of the laser line, vectorized over the unique quantized states, see
+        self.cache.hits and self.cache.misses for the statistics.
+
+        Args:
+            T_ (array like): temperature (K)
+            P_ (array like): pressure, in the pressure units given at initialization
+            co2_ppm (array like): Optional. CO2 concentration (ppm), default 400
+
+        Returns:
+            sigma_abs (ndarray): (m2), shape of the broadcast inputs
+
+        """
+        T_, P_, co2_ppm = np.broadcast_arrays(np.asarray(T_, dtype=float),
+                                              pressure_to_atm(P_, self.pressure_units),
+                                              np.asarray(co2_ppm, dtype=float))
+        shape_ = T_.shape
+        q_ = np.round(np.stack([T_.ravel(), P_.ravel(), co2_ppm.ravel()], axis=1) / self.tolerances)
+        keys_, inverse_ = np.unique(q_, axis=0, return_inverse=True)
+
+        sigma_ = np.empty(len(keys_))
+        missing = []
+        for i, key_ in enumerate(map(tuple, keys_)):
+            value_ = self.cache.get(key_)
+            if value_ is None:
+                missing.append(i)
+            else:
+                sigma_[i] = value_
+
+        if missing:
+            state_ = keys_[missing] * self.tolerances
+            sigma_grid = absorption_cross_section(self.nu_laser + self.delta_nu, state_[:, :1], state_[:, 1:2],
+                                                  state_[:, 2:], **self.kwargs)
+            sigma_[missing] = sigma_grid @ self.weights
+            for i in missing:
+                self.cache.put(tuple(keys_[i]), sigma_[i])
+
+        return sigma_[np.ravel(inverse_)].reshape(shape_)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in memoization of the spectroscopy functions.
+
+Neighbouring range gates and consecutive profiles often share (nearly) identical temperature and pressure, e.g. when
+the priors come from a model or a sounding. When enabled, calls of the decorated functions, e.g.
+spectroscopy.absorption_cross_section, are keyed by their inputs, quantized to absolute tolerances per argument name,
+and results are kept in a bounded least recently used (LRU) cache per function. Static arguments, e.g. the line shape
+or a line list, are keyed by their exact value, arrays by a digest of their data. The digest of a read-only array, e.g.
+the fields of spectroscopy.load_line_list, is computed once per array object.
+
+Array inputs are reduced to their unique quantized combinations, only combinations not in the cache are computed (in
+one vectorized call), and the results are scattered back to the input shape.
+
+NOTE: cached results are computed at the quantized input values, thus they may differ from the exact ones within the
+tolerances.
+
+Examples:
+    from dialpy.equations import spectroscopy_cache
+    spectroscopy_cache.enable(maxsize=10000, tolerances={"T_": .05})
+    ...  # run processing
+    print(spectroscopy_cache.cache_info())
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import functools
+import hashlib
+import inspect
+import weakref
+from collections import OrderedDict
+import numpy as np
+
+# absolute quantization tolerances per argument name
+DEFAULT_TOLERANCES = {
+    "nu_": 1e-6,  # (cm-1)
+    "T_": 1e-2,  # (K)
+    "P_": 1e-5,  # (atm)
+    "co2_ppm": 1e-2,  # (ppm)
+    "self_ppm": 1e-2}  # (ppm)
+DEFAULT_MAXSIZE = 4096
+
+_ENABLED = False
+_MAXSIZE = DEFAULT_MAXSIZE
+_TOLERANCES = dict(DEFAULT_TOLERANCES)
+_CACHES = {}
+# digests of read-only arrays by id: (weak reference, digest)
+_DIGESTS = {}
+
+
+class LRUCache:
+    """Bounded mapping with least recently used eviction and hit statistics, also used for the caches of
+    spectroscopy.LaserConvolution and atmospheric_profiles.grid_weights.
+
+    Args:
+        maxsize (int): Optional. Maximum number of entries, default the 'maxsize' given to enable()
+
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        """Empties the cache and resets the statistics."""
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key_):
+        try:
+            value_ = self.data[key_]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key_)
+        self.hits += 1
+        return value_
+
+    def put(self, key_, value_):
+        self.data[key_] = value_
+        self.data.move_to_end(key_)
+        while len(self.data) > (_MAXSIZE if self.maxsize is None else self.maxsize):
+            self.data.popitem(last=False)
+
+
+def enable(maxsize=DEFAULT_MAXSIZE, tolerances=None):
+    """Enables the caches.
+
+    Args:
+        maxsize (int): Optional. Maximum number of cached results per function
+        tolerances (dict): Optional. Absolute tolerances per argument name, updates DEFAULT_TOLERANCES
+
+    """
+    global _ENABLED, _MAXSIZE, _TOLERANCES
+    _ENABLED = True
+    _MAXSIZE = maxsize
+    _TOLERANCES = dict(DEFAULT_TOLERANCES)
+    if tolerances is not None:
+        _TOLERANCES.update(tolerances)
+    clear()
+
+
+def disable():
+    """Disables and empties the caches."""
+    global _ENABLED
+    _ENABLED = False
+    clear()
+
+
+def clear():
+    """Empties the caches and resets the statistics."""
+    for cache in _CACHES.values():
+        cache.clear()
+
+
+def cache_info():
+    """Hit rate statistics per cached function.
+
+    Returns:
+        info (dict): {function name: {"hits", "misses", "hit_rate", "size"}}
+
+    """
+    return {name: {"hits": c.hits,
+                   "misses": c.misses,
+                   "hit_rate": c.hits / (c.hits + c.misses) if (c.hits + c.misses) > 0 else np.nan,
+                   "size": len(c.data)}
+            for name, c in _CACHES.items()}
+
+
+def _quantize(name, value_):
+    tol = _TOLERANCES.get(name)
+    return value_ if tol is None else np.round(np.asarray(value_, dtype=float) / tol)
+
+
+def _dequantize(name, q_):
+    tol = _TOLERANCES.get(name)
+    return q_ if tol is None else q_ * tol
+
+
+def _is_read_only(value_):
+    """True if neither the array nor any array it is a view of can be written."""
+    while isinstance(value_, np.ndarray):
+        if value_.flags.writeable:
+            return False
+        value_ = value_.base
+    return True
+
+
+def _array_digest(value_):
+    """SHA1 of the data of an array, of a read-only array only on the first call with that array object."""
+    read_only = _is_read_only(value_)
+    if read_only and id(value_) in _DIGESTS:
+        ref_, digest = _DIGESTS[id(value_)]
+        if ref_() is value_:
+            return digest
+    digest = hashlib.sha1(np.ascontiguousarray(value_).tobytes()).hexdigest()
+    if read_only:
+        id_ = id(value_)
+        _DIGESTS[id_] = (weakref.ref(value_, lambda _: _DIGESTS.pop(id_, None)), digest)
+    return digest
+
+
+def _static_key(value_):
+    """Hashable key of a static argument, arrays by a digest of their data, e.g. the fields of a line list."""
+    if isinstance(value_, np.ndarray):
+        return value_.dtype.str, value_.shape, _array_digest(value_)
+    if isinstance(value_, dict):
+        return tuple(sorted((name, _static_key(v)) for name, v in value_.items()))
+    if isinstance(value_, (tuple, list)):
+        return tuple(_static_key(v) for v in value_)
+    return value_
+
+
+def memoized(fun=None, static=()):
+    """Decorator adding the opt-in cache in front of a spectroscopy function with numeric arguments, returning one value
+    per broadcast input element. Arguments named in 'static' are passed through unchanged and keyed by their exact
+    value.
+
+    Examples:
+        @memoized(static=("line_shape", ))
+        def cross_section(nu_, T_, P_, line_shape="voigt"):
+            ...
+
+    """
+    if fun is None:
+        return functools.partial(memoized, static=static)
+    signature_ = inspect.signature(fun)
+    arg_names = [name for name in signature_.parameters if name not in static]
+    cache = _CACHES.setdefault(fun.__name__, LRUCache())
+
+    @functools.wraps(fun)
+    def wrapper(*args, **kwargs):
+        if not _ENABLED:
+            return fun(*args, **kwargs)
+        bound = signature_.bind(*args, **kwargs)
+        bound.apply_defaults()
+        values_ = [bound.arguments[name] for name in arg_names]
+        static_ = {name: bound.arguments[name] for name in static}
+        static_key = tuple(_static_key(v) for v in static_.values())
+
+        def evaluate(keys_):
+            return fun(**{n: _dequantize(n, k) for n, k in zip(arg_names, keys_)}, **static_)
+
+        # scalar inputs
+        if all(np.ndim(v) == 0 for v in values_):
+            key_ = static_key + tuple(float(_quantize(n, v)) for n, v in zip(arg_names, values_))
+            result = cache.get(key_)
+            if result is None:
+                result = float(evaluate(key_[len(static_key):]))
+                cache.put(key_, result)
+            return result
+
+        # array inputs, unique quantized combinations
+        arrays = np.broadcast_arrays(*[np.asarray(_quantize(n, v), dtype=float) for n, v in zip(arg_names, values_)])
+        shape_ = arrays[0].shape
+        keys_, inverse_ = np.unique(np.stack([a.ravel() for a in arrays], axis=1), axis=0, return_inverse=True)
+        results = np.empty(len(keys_))
+        missing = []
+        for i, row in enumerate(map(tuple, keys_)):
+            result = cache.get(static_key + row)
+            if result is None:
+                missing.append(i)
+            else:
+                results[i] = result
+        if missing:
+            computed = np.broadcast_to(evaluate(keys_[missing].T), (len(missing),))
+            results[missing] = computed
+            for i, value_ in zip(missing, computed):
+                cache.put(static_key + tuple(keys_[i]), float(value_))
+
+        return results[np.ravel(inverse_)].reshape(shape_)
+
+    return wrapper
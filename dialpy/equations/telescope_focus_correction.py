@@ -3,20 +3,28 @@
 """
 Python3 functions for DIAL processing chain.
 
-Created 2020-04-02, last edited 2020-04-02
+Created 2020-04-02, last edited 2020-05-20
 Antti J Manninen
 Finnish Meteorological Institute
 """
 
+import hashlib
 import numpy as np
+from dialpy.equations import constants
+from dialpy.equations.conversions import optical_frequency
+from dialpy.equations.spectroscopy_cache import LRUCache
 
-_ROO_ZERO = 1
-_PLANCK_CONSTANT = 1
-_BOLTZMANN_CONSTANT = 1
-_RECEIVER_BANDWIDTH = 1
+# transverse coherence length of the turbulence (m), infinite = effect of turbulence on the beam neglected
+_ROO_ZERO = np.inf
+_PLANCK_CONSTANT = constants.PLANCKS_CONSTANT_J  # (J s)
+_SPEED_OF_LIGHT = constants.SPEED_OF_LIGHT  # (m s-1)
+# receiver bandwidth (Hz), HALO Photonics Stream Line, see Pentikainen et al. (2020)
+_RECEIVER_BANDWIDTH = 50e6
+# focus functions by instrument configuration and range grid
+_FOCUS_FUNCTIONS = LRUCache(maxsize=32)
 
 
-def effective_receiver_area(range_, D_eff, f_eff, lambda_):
+def effective_receiver_area(range_, D_eff, f_eff, lambda_, roo_zero=_ROO_ZERO):
     """Calculate effective receiver area as a function of range based on the estimated effective laser beam diameter,
     effective focal length, and laser wavelength. For more detail see Pentikainen et al. (2020) Eq. (2),
     https://doi.org/10.5194/amt-2019-491
@@ -26,15 +34,17 @@ def effective_receiver_area(range_, D_eff, f_eff, lambda_):
         D_eff (float):  Effective laser beam diameter (m) estimated by using Pentikainen et al. (2020) method
         f_eff (float): Effective focal length (m) estimated with using Pentikainen et al. (2020) method
         lambda_ (float): Wavelength of the laser (m)
+        roo_zero (float): Optional. Transverse coherence length of the turbulence (m), default infinite
 
     Returns:
         A_e (np.ndarray): Effective receiver area as a function of range (m)
 
     """
 
-    A_e = np.divide(np.pi * D_eff**2, 4 * (1 + (np.divide(np.pi * D_eff**2, 4 * lambda_ * range_))**2) *
-                    (1 - range_ / f_eff)**2 +
-                    (D_eff / (2 * _ROO_ZERO))**2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A_e = np.divide(np.pi * D_eff**2, 4 * (1 + (np.divide(np.pi * D_eff**2, 4 * lambda_ * range_))**2 *
+                                                (1 - range_ / f_eff)**2 +
+                                                (D_eff / (2 * roo_zero))**2))
 
     return A_e
 
@@ -52,20 +62,23 @@ def focus_function(range_, A_e):
 
     """
 
-    T_f = np.divide(A_e, range_**2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        T_f = np.divide(A_e, range_**2)
 
     return T_f
 
 
-def attenuated_backscatter_coefficient(snr_, T_f, lambda_, eta_, E_):
+def attenuated_backscatter_coefficient(snr_, T_f, lambda_, eta_, E_, B_=_RECEIVER_BANDWIDTH):
     """Calculates attenuated backscatter coefficients given the telescope focus function T_f. For more details see
     Pentikainen et al. (2020) Eq. (4), https://doi.org/10.5194/amt-2019-491
 
     Args:
-        snr_ (np.ndarray): Background corrected signal-to-noise ratio (dB)
+        snr_ (np.ndarray): Background corrected signal-to-noise ratio (linear, unitless)
         T_f (np.ndarray): Telescope focus function (unitless)
         lambda_ (float): Wavelength of the laser (m)
         eta_ (float): Heterodyne efficiency (unitless)
+        E_ (float): Laser pulse energy (J)
+        B_ (float): Optional. Receiver bandwidth (Hz)
 
     Returns:
         beta_att : np.ndarray
@@ -75,9 +88,103 @@ def attenuated_backscatter_coefficient(snr_, T_f, lambda_, eta_, E_):
 
     h = _PLANCK_CONSTANT
     nu_ = optical_frequency(lambda_)
-    B = _BOLTZMANN_CONSTANT
     c = _SPEED_OF_LIGHT
 
-    beta_att = 2 * h * nu_ * B / (eta_ * c * E_) * np.divide(snr_, T_f)
+    beta_att = 2 * h * nu_ * B_ / (eta_ * c * E_) * np.divide(snr_, T_f)
 
     return beta_att
+
+
+def cached_focus_function(range_, D_eff, f_eff, lambda_, roo_zero=_ROO_ZERO):
+    """Telescope focus function T_f(r) of an instrument configuration, computed once per (D_eff, f_eff, lambda_,
+    roo_zero, range grid) and served from a cache afterwards. The returned array is read-only.
+
+    Args:
+        range_ (np.ndarray): Range from the instrument (m)
+        D_eff (float): Effective laser beam diameter (m)
+        f_eff (float): Effective focal length (m)
+        lambda_ (float): Wavelength of the laser (m)
+        roo_zero (float): Optional. Transverse coherence length of the turbulence (m), default infinite
+
+    Returns:
+        T_f (np.ndarray): Telescope focus function (unitless)
+
+    """
+
+    range_ = np.ascontiguousarray(range_, dtype=float)
+    key_ = (float(D_eff), float(f_eff), float(lambda_), float(roo_zero), range_.shape,
+            hashlib.sha1(range_.tobytes()).hexdigest())
+    T_f = _FOCUS_FUNCTIONS.get(key_)
+    if T_f is None:
+        T_f = focus_function(range_, effective_receiver_area(range_, D_eff, f_eff, lambda_, roo_zero=roo_zero))
+        T_f.setflags(write=False)
+        _FOCUS_FUNCTIONS.put(key_, T_f)
+
+    return T_f
+
+
+def clear_focus_function_cache():
+    """Empties the cache of focus functions and resets the statistics."""
+    _FOCUS_FUNCTIONS.clear()
+
+
+def calibrate_snr(snr_, range_, D_eff, f_eff, lambda_, eta_, E_, B_=_RECEIVER_BANDWIDTH, roo_zero=_ROO_ZERO,
+                  out=None):
+    """Converts a (time, range) SNR field to attenuated backscatter coefficients with a cached focus function, i.e.
+    Eq. (4) of Pentikainen et al. (2020) applied to the whole field at once.
+
+    Args:
+        snr_ (np.ndarray): Background corrected signal-to-noise ratio (linear, unitless), shape (time, range)
+        range_ (np.ndarray): Range from the instrument (m), shape (range,)
+        D_eff (float): Effective laser beam diameter (m)
+        f_eff (float): Effective focal length (m)
+        lambda_ (float): Wavelength of the laser (m)
+        eta_ (float): Heterodyne efficiency (unitless)
+        E_ (float): Laser pulse energy (J)
+        B_ (float): Optional. Receiver bandwidth (Hz)
+        roo_zero (float): Optional. Transverse coherence length of the turbulence (m), default infinite
+        out (np.ndarray): Optional. Output array, give 'snr_' itself to calibrate in place
+
+    Returns:
+        beta_att (np.ndarray): Calibrated attenuated backscatter coefficients (m-1 sr-1), shape (time, range)
+
+    """
+
+    T_f = cached_focus_function(range_, D_eff, f_eff, lambda_, roo_zero=roo_zero)
+
+    # constant part of Eq. (4) divided by T_f, one multiplication per element of the field
+    with np.errstate(divide='ignore'):
+        factor_ = 2 * _PLANCK_CONSTANT * optical_frequency(lambda_) * B_ / (eta_ * _SPEED_OF_LIGHT * E_) / T_f
+
+    return np.multiply(snr_, factor_, out=out)
+
+
+def calibrate_dial_channels(snr_on, snr_off, range_, D_eff, f_eff, eta_, E_on, E_off, B_=_RECEIVER_BANDWIDTH,
+                            roo_zero=_ROO_ZERO, in_place=False):
+    """Attenuated backscatter coefficients of the DIAL ON and OFF channels from their SNR fields.
+
+    Args:
+        snr_on (np.ndarray): SNR of the ON channel (linear, unitless), shape (time, range)
+        snr_off (np.ndarray): SNR of the OFF channel (linear, unitless), shape (time, range)
+        range_ (np.ndarray): Range from the instrument (m), shape (range,)
+        D_eff (float): Effective laser beam diameter (m)
+        f_eff (float): Effective focal length (m)
+        eta_ (float): Heterodyne efficiency (unitless)
+        E_on (float): Laser pulse energy of the ON channel (J)
+        E_off (float): Laser pulse energy of the OFF channel (J)
+        B_ (float): Optional. Receiver bandwidth (Hz)
+        roo_zero (float): Optional. Transverse coherence length of the turbulence (m), default infinite
+        in_place (bool): Optional. If True, 'snr_on' and 'snr_off' are overwritten with the results, default False
+
+    Returns:
+        beta_att_on (np.ndarray): ON channel attenuated backscatter coefficients (m-1 sr-1)
+        beta_att_off (np.ndarray): OFF channel attenuated backscatter coefficients (m-1 sr-1)
+
+    """
+
+    beta_att_on = calibrate_snr(snr_on, range_, D_eff, f_eff, constants.LAMBDA_ON, eta_, E_on, B_=B_,
+                                roo_zero=roo_zero, out=snr_on if in_place else None)
+    beta_att_off = calibrate_snr(snr_off, range_, D_eff, f_eff, constants.LAMBDA_OFF, eta_, E_off, B_=B_,
+                                 roo_zero=roo_zero, out=snr_off if in_place else None)
+
+    return beta_att_on, beta_att_off
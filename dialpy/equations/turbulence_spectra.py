@@ -57,6 +57,85 @@ def lomb_scargle_periodogram(t, x, ofac=4, hifac=1):
     return fg, pxg
 
 
+def lomb_scargle_periodogram_batch(t, x, ofac=4, hifac=1, chunk_size=512):
+    """Estimates the Lomb-Scargle (LS) based power spectra of many signals sharing an unevenly-spaced time vector,
+    e.g. all range gates of a vertical stare. Missing samples (NaN) are masked separately for each signal.
+
+    The tau offset is computed once per frequency and signal, and the sums over time are evaluated as matrix products
+    between the (frequency, time) sine and cosine kernels and the (time, signal) data. Frequencies are processed in
+    blocks of 'chunk_size' to bound the memory used by the kernels.
+
+    Args:
+        t (ndarray, float): time vector, shape (time,)
+        x (ndarray, float): variable, shape (time,) or (time, signals), e.g. (time, range), NaN for missing samples
+        ofac (int): oversampling parameter
+        hifac (float): highest frequency as a fraction of the (median) Nyquist frequency
+        chunk_size (int): number of frequencies evaluated at once
+
+    Returns:
+        fg (ndarray, float): frequencies, shape (frequency,)
+        pxg (ndarray, float): power spectra of 'x', shape (frequency,) or (frequency, signals)
+
+    References:
+        Press and Rybicki (1989), https://doi.org/10.1086/167197
+        http://mres.uni-potsdam.de/index.php/2017/08/22/data-voids-and-spectral-analysis-dont-be-afraid-of-gaps/
+    """
+    t = np.asarray(t, dtype=float)
+    x = np.asarray(x, dtype=float)
+    is_1d = x.ndim == 1
+    if is_1d:
+        x = x[:, np.newaxis]
+
+    # same frequency grid as in lomb_scargle_periodogram()
+    int_ = np.nanmedian(np.diff(t))
+    f_nyq = (2*int_)**(-1)
+    fg = np.arange(f_nyq / (len(t)*ofac), hifac*f_nyq, f_nyq / (len(t)*ofac))
+
+    # per signal masks, counts, means and variances
+    mask_ = np.isfinite(x)
+    n_ = np.sum(mask_, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_ = np.nansum(x, axis=0) / n_
+        x0 = np.where(mask_, x - mean_, 0)
+        var_ = np.sum(x0**2, axis=0) / n_
+    m_ = mask_.astype(float)
+
+    # shift time to reduce round off in w*t
+    t0 = t - t[0]
+
+    pxg = np.empty((len(fg), x.shape[1]))
+    pxg[:] = np.nan
+    for i0 in range(0, len(fg), chunk_size):
+        w_ = 2 * np.pi * fg[i0:i0+chunk_size, np.newaxis]
+        wt = w_ * t0
+
+        # tau offset, atan2(sum(sin(2wt)), sum(cos(2wt))) over valid samples of each signal
+        s2 = np.sin(2*wt) @ m_
+        c2 = np.cos(2*wt) @ m_
+        two_wtau = np.arctan2(s2, c2)
+        cos_wtau = np.cos(two_wtau / 2)
+        sin_wtau = np.sin(two_wtau / 2)
+
+        # sum(x*cos(wt - wtau)) and sum(x*sin(wt - wtau)) expanded with the angle difference identities
+        xc = np.cos(wt) @ x0
+        xs = np.sin(wt) @ x0
+        xc_tau = xc * cos_wtau + xs * sin_wtau
+        xs_tau = xs * cos_wtau - xc * sin_wtau
+
+        # sum(cos(wt - wtau)**2) and sum(sin(wt - wtau)**2) with the half-angle identities
+        hyp_ = np.hypot(s2, c2)
+        cc_tau = (n_ + hyp_) / 2
+        ss_tau = (n_ - hyp_) / 2
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pxg[i0:i0+chunk_size, :] = 1 / (2*var_) * (xc_tau**2 / cc_tau + xs_tau**2 / ss_tau)
+
+    # at least two samples needed
+    pxg[:, n_ < 2] = np.nan
+
+    return fg, pxg[:, 0] if is_1d else pxg
+
+
 def kristensen_model_a_parameter(mu_):
     """Calculate the 'a' parameter for Kristensen spectral intensity model
 
@@ -132,8 +211,8 @@ def kristensen_spectral_intensity(k_, sigma2_w, mu_, lambda_0):
         l_w = integral_scale_l_w(mu_, lambda_0)
 
         # calculate model-based spectral intensity
-        for ik in range(len(k_)):
-            s_[ik] = (sigma2_w*l_w)/(2*np.pi)*((3+8*((l_w*k_[ik])/a_)**(2*mu_))/(3*(1+((l_w*k_[ik])/a_)**(2*mu_))**(5/(6*mu_)+1)))
+        q_ = ((l_w*np.asarray(k_))/a_)**(2*mu_)
+        s_[:] = (sigma2_w*l_w)/(2*np.pi)*((3+8*q_)/(3*(1+q_)**(5/(6*mu_)+1)))
 
         k_sk = np.multiply(k_, s_)
 
@@ -142,3 +221,170 @@ def kristensen_spectral_intensity(k_, sigma2_w, mu_, lambda_0):
         k_sk[:] = 0
 
     return k_sk
+
+
+def _log_kristensen_k_sk(log_k, sigma2_w, mu_, lambda_0):
+    """Natural logarithm of the Kristensen model k*S(k), evaluated in log space to avoid overflow at large l_w*k.
+
+    Args:
+        log_k (ndarray): natural logarithm of wave number, shape (k,)
+        sigma2_w (ndarray): variance, shape (...)
+        mu_ (ndarray): curvature parameter, shape (...)
+        lambda_0 (ndarray): transition wavelength (m), shape (...)
+
+    Returns:
+        log_k_sk (ndarray): log of model-based spectral intensity multiplied with wavenumber, shape (..., k)
+
+    """
+    sigma2_w = np.asarray(sigma2_w, dtype=float)[..., np.newaxis]
+    mu_ = np.asarray(mu_, dtype=float)[..., np.newaxis]
+    lambda_0 = np.asarray(lambda_0, dtype=float)[..., np.newaxis]
+
+    a_ = kristensen_model_a_parameter(mu_)
+    l_w = integral_scale_l_w(mu_, lambda_0)
+
+    # log of q = (l_w*k/a)**(2*mu)
+    log_q = 2 * mu_ * (np.log(l_w / a_) + log_k)
+    log_1pq = np.logaddexp(0, log_q)
+    log_3p8q = np.logaddexp(np.log(3), np.log(8) + log_q)
+
+    return log_k + np.log(sigma2_w * l_w / (2*np.pi)) + log_3p8q - np.log(3) - (5/(6*mu_)+1) * log_1pq
+
+
+def kristensen_spectral_intensity_batch(k_, sigma2_w, mu_, lambda_0):
+    """Calculates Kristensen spectral intensity model for many parameter sets at once.
+
+    Args:
+        k_ (array like): wave number (rad m-1), shape (k,)
+        sigma2_w (array like): variance (m2 s-2), shape (...)
+        mu_ (array like): parameter controlling curvature of the spectrum across the transition from zero to −5/3
+                          slope, shape (...)
+        lambda_0 (array like): transition wavelength (m), shape (...)
+
+    Returns:
+        k_sk (ndarray): model-based spectral intensity multiplied with wavenumber, shape (..., k), NaN where any of the
+                        parameters is not finite
+
+    References:
+        Kristensen et al. (1989), https://doi.org/10.1007/BF00122327
+        Lothon et al. (2009), https://doi.org/10.1007/s10546-009-9398-y
+    """
+    sigma2_w, mu_, lambda_0 = np.broadcast_arrays(np.asarray(sigma2_w, dtype=float), np.asarray(mu_, dtype=float),
+                                                  np.asarray(lambda_0, dtype=float))
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        k_sk = np.exp(_log_kristensen_k_sk(np.log(np.asarray(k_, dtype=float)), sigma2_w, mu_, lambda_0))
+
+    return k_sk
+
+
+def fit_kristensen_model(k_, k_sk, sigma2_w=None, mu_=1., max_iter=50, tol=1e-6, mu_bounds=(.1, 10.)):
+    """Fits the Kristensen spectral intensity model to many observed spectra at once, e.g. to every (time window, range
+    gate) spectrum of a day for the 'turbulence_length_scale' product.
+
+    The fit minimizes the squared difference of log(k*S(k)) of the model and observations with a Levenberg-Marquardt
+    iteration which is carried out simultaneously for all spectra; the 3x3 normal equations of each spectrum are solved
+    as one batched linear system per iteration. The parameters are fitted in log space to keep them positive.
+
+    Initial guesses: lambda_0 = 2*pi/k at the maximum of the observed k*S(k), mu_ as given, and sigma2_w as given or
+    else the least-squares scaling of the model with the two other guesses.
+
+    Args:
+        k_ (array like): wave number (rad m-1), shape (k,)
+        k_sk (array like): observed spectral intensity multiplied with wavenumber, shape (..., k), NaN or
+                           non-positive values are ignored
+        sigma2_w (array like): Optional. Initial guess for variance, shape (...)
+        mu_ (scalar or array like): Optional. Initial guess for curvature parameter, default 1
+        max_iter (int): Optional. Maximum number of iterations, default 50
+        tol (float): Optional. Convergence tolerance for relative change of cost, default 1e-6
+        mu_bounds (tuple): Optional. Lower and upper limit for mu_, default (.1, 10)
+
+    Returns:
+        sigma2_w (ndarray): fitted variance, shape (...)
+        mu_ (ndarray): fitted curvature parameter, shape (...)
+        lambda_0 (ndarray): fitted transition wavelength (m), shape (...)
+
+    References:
+        Lothon et al. (2009), https://doi.org/10.1007/s10546-009-9398-y
+        Tonttila et al. (2015), https://doi.org/10.5194/acp-15-5873-2015
+    """
+    k_ = np.asarray(k_, dtype=float)
+    k_sk = np.asarray(k_sk, dtype=float)
+    shape_out = k_sk.shape[:-1]
+    y_ = k_sk.reshape(-1, len(k_))
+    n_spec = y_.shape[0]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w_ = (np.isfinite(y_) & (y_ > 0) & (k_ > 0)).astype(float)
+        log_y = np.where(w_ > 0, np.log(np.where(w_ > 0, y_, 1)), 0)
+        log_k = np.log(np.where(k_ > 0, k_, 1))
+    n_valid = np.sum(w_, axis=1)
+    ok_ = n_valid >= 3
+
+    # initial guesses, p = [log(sigma2_w), log(mu_), log(lambda_0)]
+    i_max = np.argmax(np.where(w_ > 0, y_, -np.inf), axis=1)
+    p_ = np.empty((n_spec, 3))
+    p_[:, 1] = np.log(np.broadcast_to(np.asarray(mu_, dtype=float), shape_out).reshape(-1))
+    p_[:, 2] = np.log(2 * np.pi / k_[i_max])
+    if sigma2_w is None:
+        p_[:, 0] = 0
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            r_ = log_y - _log_kristensen_k_sk(log_k, 1., np.exp(p_[:, 1]), np.exp(p_[:, 2]))
+        p_[:, 0] = np.sum(w_ * r_, axis=1) / np.maximum(n_valid, 1)
+    else:
+        p_[:, 0] = np.log(np.broadcast_to(np.asarray(sigma2_w, dtype=float), shape_out).reshape(-1))
+    log_mu_min, log_mu_max = np.log(mu_bounds[0]), np.log(mu_bounds[1])
+    p_[:, 1] = np.clip(p_[:, 1], log_mu_min, log_mu_max)
+    p_[~np.all(np.isfinite(p_), axis=1)] = 0
+
+    def residuals(p, idx):
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            r = w_[idx] * (_log_kristensen_k_sk(log_k, np.exp(p[:, 0]), np.exp(p[:, 1]), np.exp(p[:, 2])) - log_y[idx])
+        return np.where(np.isfinite(r), r, 1e3)
+
+    r_ = residuals(p_, slice(None))
+    cost = np.sum(r_**2, axis=1)
+    damping = np.full(n_spec, 1e-3)
+    active = ok_.copy()
+    h_ = 1e-6
+    for _ in range(max_iter):
+        if not np.any(active):
+            break
+        ia = np.flatnonzero(active)
+        pa = p_[ia]
+        ra = r_[ia]
+
+        # Jacobian, derivative with respect to log(sigma2_w) is w_ exactly, others by forward differences
+        jac = np.empty(ra.shape + (3,))
+        jac[..., 0] = w_[ia]
+        for j in (1, 2):
+            pj = pa.copy()
+            pj[:, j] += h_
+            jac[..., j] = (residuals(pj, ia) - ra) / h_
+
+        jtj = np.einsum('nki,nkj->nij', jac, jac)
+        jtr = np.einsum('nki,nk->ni', jac, ra)
+        diag_ = np.einsum('nii->ni', jtj)
+        lhs = jtj + damping[ia, np.newaxis, np.newaxis] * diag_[:, np.newaxis, :] * np.eye(3) + 1e-12 * np.eye(3)
+        step = -np.linalg.solve(lhs, jtr[..., np.newaxis])[..., 0]
+
+        p_try = pa + step
+        p_try[:, 1] = np.clip(p_try[:, 1], log_mu_min, log_mu_max)
+        r_try = residuals(p_try, ia)
+        cost_try = np.sum(r_try**2, axis=1)
+
+        better = cost_try < cost[ia]
+        i_better = ia[better]
+        converged = better & ((cost[ia] - cost_try) <= tol * np.maximum(cost[ia], 1e-30))
+        p_[i_better] = p_try[better]
+        r_[i_better] = r_try[better]
+        cost[i_better] = cost_try[better]
+        damping[ia] = np.where(better, damping[ia] / 10, damping[ia] * 10)
+        active[ia[converged | (damping[ia] > 1e10)]] = False
+
+    sigma2_w_out = np.exp(p_[:, 0])
+    mu_out = np.exp(p_[:, 1])
+    lambda_0_out = np.exp(p_[:, 2])
+    for v_ in (sigma2_w_out, mu_out, lambda_0_out):
+        v_[~ok_] = np.nan
+
+    return sigma2_w_out.reshape(shape_out), mu_out.reshape(shape_out), lambda_0_out.reshape(shape_out)
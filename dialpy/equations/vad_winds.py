@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for retrieving horizontal winds from velocity azimuth display (VAD) scans of a Doppler lidar.
+
+The radial velocity of a beam pointing to azimuth theta and elevation phi is, see conversions.wswd2vr,
+    v_r = u sin(theta) cos(phi) + v cos(theta) cos(phi) + w sin(phi),
+which is solved for (u, v, w) in the least squares sense. The pseudo-inverse of the design matrix depends only on the
+beam geometry, thus it is computed once per azimuth and elevation set, cached, and applied to all (scan, gate) samples
+as one batched matrix product. Samples with missing beams are solved with batched normal equations. For the precision
+estimates see Päschke et al. (2015) doi:10.5194/amt-8-2251-2015, and Newsom et al. (2017) doi:10.5194/amt-10-1229-2017.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+from functools import lru_cache
+import numpy as np
+from dialpy.utilities.dl_var_atts import dl_var_atts as vatts
+
+# (u, v, w) components
+_N_COMPONENTS = 3
+_WIND_COMPONENTS = ("u", "v", "w")
+
+
+def vad_design_matrix(azimuth_, elevation_):
+    """Design matrix of the VAD sinusoid fit.
+
+    Args:
+        azimuth_ (array like): azimuth of each beam (degrees from North), shape (beam,)
+        elevation_ (array like): elevation of each beam (degrees from horizon), shape (beam,) or scalar
+
+    Returns:
+        A_ (ndarray): shape (beam, 3), radial velocity = A_ @ (u, v, w)
+
+    """
+    theta_ = np.deg2rad(np.asarray(azimuth_, dtype=float))
+    phi_ = np.deg2rad(np.broadcast_to(np.asarray(elevation_, dtype=float), theta_.shape))
+    return np.stack([np.sin(theta_) * np.cos(phi_), np.cos(theta_) * np.cos(phi_), np.sin(phi_)], axis=-1)
+
+
+@lru_cache(maxsize=256)
+def _pseudo_inverse(azimuth_key, elevation_key):
+    """Pseudo-inverse and unscaled covariance (A^T A)^-1 of a beam configuration with all beams valid, read-only."""
+    A_ = vad_design_matrix(np.array(azimuth_key) / 10, np.array(elevation_key) / 10)
+    pinv_ = np.linalg.pinv(A_)
+    cov_ = np.linalg.inv(A_.T @ A_)
+    for array_ in (pinv_, cov_):
+        array_.setflags(write=False)
+    return pinv_, cov_
+
+
+def _masked_pseudo_inverse(A_, valid_):
+    """Pseudo-inverses (A_v^T A_v)^-1 A_v^T and unscaled covariances of the valid beams of each sample, batched
+    normal equations; invalid beams get zero weight.
+
+    Args:
+        A_ (ndarray): design matrix, shape (beam, 3)
+        valid_ (ndarray): valid beams, shape (sample, beam)
+
+    Returns:
+        pinv_ (ndarray): shape (sample, 3, beam)
+        cov_ (ndarray): shape (sample, 3, 3)
+
+    """
+    cov_ = np.linalg.inv(np.einsum('nb,bk,bl->nkl', valid_.astype(float), A_, A_))
+    pinv_ = np.einsum('nkl,bl->nkb', cov_, A_) * valid_[:, np.newaxis, :]
+    return pinv_, cov_
+
+
+def _geometry_key(values_, n_scans, n_beams):
+    """Integer (0.1 degree) keys of the beam geometry of each scan, shape (scan, beam)."""
+    return np.round(np.broadcast_to(np.asarray(values_, dtype=float), (n_scans, n_beams)) * 10).astype(int)
+
+
+def wind_speed_direction(u, v, var_u, var_v, cov_uv):
+    """Wind speed and direction, and their precisions by linear error propagation.
+
+    Args:
+        u, v (ndarray): eastward and northward wind (m s-1)
+        var_u, var_v (ndarray): variances of u and v (m2 s-2)
+        cov_uv (ndarray): covariance of u and v (m2 s-2)
+
+    Returns:
+        ws (ndarray): wind speed (m s-1)
+        wd (ndarray): wind direction (degree), meteorological convention
+        ws_precision (ndarray): (m s-1)
+        wd_precision (ndarray): (degree)
+
+    """
+    ws = np.hypot(u, v)
+    wd = np.mod(np.rad2deg(np.arctan2(-u, -v)), 360)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ws_precision = np.sqrt(np.abs(u**2 * var_u + v**2 * var_v + 2 * u * v * cov_uv)) / ws
+        wd_precision = np.rad2deg(np.sqrt(np.abs(v**2 * var_u + u**2 * var_v - 2 * u * v * cov_uv)) / ws**2)
+    return ws, wd, ws_precision, wd_precision
+
+
+def vad_winds(velo, azimuth_, elevation_, velo_precision=None, min_beams=4):
+    """Wind vector of every (scan, gate) of VAD scans. Samples with all beams valid are solved with the cached
+    pseudo-inverse of the beam geometry as one batched matrix product, samples with missing beams with batched normal
+    equations, thus there is no loop over gates.
+
+    Args:
+        velo (ndarray): radial velocities (m s-1), shape (scan, beam, range), missing beams as nan
+        azimuth_ (array like): azimuth of the beams (degrees from North), shape (beam,) or (scan, beam)
+        elevation_ (array like): elevation of the beams (degrees from horizon), scalar, (beam,) or (scan, beam)
+        velo_precision (array like): Optional. Instrumental precision of the radial velocities (m s-1), broadcastable
+                                     to 'velo', propagated into the *_instrumental_precision fields
+        min_beams (int): Optional. Minimum number of valid beams, gates with fewer are masked (nan), default 4
+
+    Returns:
+        winds (dict): 'u', 'v', 'w', 'wind_speed', 'wind_direction', and for each their '_precision' from the fit
+                      residuals and '_instrumental_precision' (if 'velo_precision' given), shape (scan, range)
+
+    """
+    velo = np.asarray(velo, dtype=float)
+    n_scans, n_beams, n_gates = velo.shape
+    if min_beams <= _N_COMPONENTS:
+        raise ValueError("min_beams has to be larger than {} for the precision estimates".format(_N_COMPONENTS))
+
+    azimuth_key = _geometry_key(azimuth_, n_scans, n_beams)
+    elevation_key = _geometry_key(elevation_, n_scans, n_beams)
+    # samples as rows, (scan * range, beam)
+    samples_ = np.moveaxis(velo, 1, 2).reshape(-1, n_beams)
+    valid_ = np.isfinite(samples_)
+    scan_ = np.repeat(np.arange(n_scans), n_gates)
+    if velo_precision is not None:
+        var_inst = np.moveaxis(np.broadcast_to(np.asarray(velo_precision, dtype=float)**2, velo.shape), 1, 2)\
+            .reshape(-1, n_beams)
+
+    n_valid = valid_.sum(axis=1)
+    wind_ = np.full((len(samples_), _N_COMPONENTS), np.nan)
+    cov_ = np.full((len(samples_), _N_COMPONENTS, _N_COMPONENTS), np.nan)
+    cov_inst = np.full((len(samples_), _N_COMPONENTS, _N_COMPONENTS), np.nan)
+
+    # one group per unique (azimuth set, elevation set), usually only one
+    geometry_ = np.concatenate([azimuth_key, elevation_key], axis=1)
+    geometries_, group_ = np.unique(geometry_, axis=0, return_inverse=True)
+    group_ = np.ravel(group_)[scan_]
+    for i_geometry, key_ in enumerate(geometries_):
+        A_ = vad_design_matrix(key_[:n_beams] / 10, key_[n_beams:] / 10)
+        in_group = group_ == i_geometry
+
+        # all beams valid: cached pseudo-inverse, missing beams: batched normal equations
+        idx_full = np.flatnonzero(in_group & (n_valid == n_beams))
+        idx_part = np.flatnonzero(in_group & (n_valid >= min_beams) & (n_valid < n_beams))
+        pinv_full, cov_full = _pseudo_inverse(tuple(key_[:n_beams]), tuple(key_[n_beams:]))
+        pinv_part, cov_part = _masked_pseudo_inverse(A_, valid_[idx_part])
+
+        for idx_, pinv_, cov_unscaled, subscripts in ((idx_full, pinv_full, cov_full, 'kb,nb->nk'),
+                                                      (idx_part, pinv_part, cov_part, 'nkb,nb->nk')):
+            if len(idx_) == 0:
+                continue
+            y_ = np.where(valid_[idx_], samples_[idx_], 0.)
+            x_ = np.einsum(subscripts, pinv_, y_)
+            wind_[idx_] = x_
+
+            # residual variance of the fit scales the covariance
+            residuals_ = np.where(valid_[idx_], y_ - x_ @ A_.T, 0.)
+            sigma2_ = np.sum(residuals_**2, axis=1) / (n_valid[idx_] - _N_COMPONENTS)
+            cov_[idx_] = sigma2_[:, np.newaxis, np.newaxis] * cov_unscaled
+
+            if velo_precision is not None:
+                pinv_ = np.broadcast_to(pinv_, (len(idx_),) + pinv_.shape[-2:])
+                cov_inst[idx_] = np.einsum('nkb,nb,nlb->nkl', pinv_, var_inst[idx_], pinv_)
+
+    winds = {}
+    shape_ = (n_scans, n_gates)
+    for k, name in enumerate(_WIND_COMPONENTS):
+        winds[name] = wind_[:, k].reshape(shape_)
+        winds[name + "_precision"] = np.sqrt(cov_[:, k, k]).reshape(shape_)
+        if velo_precision is not None:
+            winds[name + "_instrumental_precision"] = np.sqrt(cov_inst[:, k, k]).reshape(shape_)
+
+    winds["wind_speed"], winds["wind_direction"], winds["wind_speed_precision"], \
+        winds["wind_direction_precision"] = wind_speed_direction(wind_[:, 0], wind_[:, 1], cov_[:, 0, 0],
+                                                                 cov_[:, 1, 1], cov_[:, 0, 1])
+    if velo_precision is not None:
+        _, _, winds["wind_speed_instrumental_precision"], winds["wind_direction_instrumental_precision"] = \
+            wind_speed_direction(wind_[:, 0], wind_[:, 1], cov_inst[:, 0, 0], cov_inst[:, 1, 1], cov_inst[:, 0, 1])
+    for name in ("wind_speed", "wind_direction", "wind_speed_precision", "wind_direction_precision",
+                 "wind_speed_instrumental_precision", "wind_direction_instrumental_precision"):
+        if name in winds:
+            winds[name] = winds[name].reshape(shape_)
+
+    return winds
+
+
+def wind_nc_variables(time_, range_, winds):
+    """netCDF variables of a wind product, see nc_tools.write_nc_.
+
+    Args:
+        time_ (ndarray): time (hours UTC), shape (time,)
+        range_ (ndarray): range (m), shape (range,)
+        winds (dict): output of vad_winds or dbs_winds.dbs_winds, fields of shape (time, range)
+
+    Returns:
+        obs (list): VarBlueprint of time, range and the wind fields
+
+    """
+    dim_size = (len(time_), len(range_))
+    obs = [vatts("time", data=time_, dim_size=(len(time_), )),
+           vatts("range", data=range_, dim_size=(len(range_), ))]
+    for name, data_ in winds.items():
+        obs.append(vatts(name, data=data_, dim_size=dim_size))
+    return obs
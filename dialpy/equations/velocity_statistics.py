@@ -6,8 +6,8 @@ Created on Thu Jun 13 13:48:23 2019
 @author: manninan
 """
 
-from dopplerlidarpy.equations.acf import acf_fast_normalized
-from sklearn import linear_model
+from dialpy.equations.acf import acf_fast_normalized
+from dialpy.equations.acf import acf_fast_unnormalized_batch
 import numpy as np
 
 
@@ -21,6 +21,7 @@ def sigma2w_lenschow(velo_sel):
         velo_var (scalar): unbiased variance
 
     """
+    from sklearn import linear_model
 
     sigma2_w = np.nanvar(velo_sel[:])  # - np.nanvar(velo_error_sel[:])  --> negative values, TBD
     my_acf_norm = acf_fast_normalized(velo_sel[:])
@@ -42,3 +43,58 @@ def sigma2w_lenschow(velo_sel):
         velo_var = sigma2_w
 
     return velo_var
+
+
+def theil_sen_intercept(x, y):
+    """Theil-Sen estimate of a straight line fitted to each column of 'y', evaluated at x = 0. NaNs are ignored.
+
+    Args:
+        x (1D array): abscissa shared by all columns, shape (points,)
+        y (array like): ordinates, shape (points,) or (points, signals)
+
+    Returns:
+        intercept (ndarray): median of y - slope*x, shape () or (signals,)
+        slope (ndarray): median of pairwise slopes, shape () or (signals,)
+
+    References:
+        Sen (1968), https://doi.org/10.1080/01621459.1968.10480934
+
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    i_, j_ = np.triu_indices(len(x), k=1)
+    slopes = (y[j_] - y[i_]) / (x[j_] - x[i_]).reshape((-1,) + (1,) * (y.ndim - 1))
+    slope = np.nanmedian(slopes, axis=0)
+    intercept = np.nanmedian(y - slope * x.reshape((-1,) + (1,) * (y.ndim - 1)), axis=0)
+
+    return intercept, slope
+
+
+def sigma2w_lenschow_batch(velo, lags=range(1, 7)):
+    """Estimates radial velocity unbiased variance of many series at once by using the Lenschow et al. (2000) method:
+    the autocovariance at lags 'lags' is extrapolated to lag 0 with a Theil-Sen fit, and the difference to the lag 0
+    value (biased variance) is the noise variance. Deterministic and vectorized over series, unlike sigma2w_lenschow.
+
+    Args:
+        velo (array like): velocity values, shape (time,) or (time, series), e.g. (time, range), NaN for missing
+        lags (array like): Optional. Lags (in samples) used in the extrapolation, default 1, 2, ..., 6
+
+    Returns:
+        velo_var (ndarray): unbiased variance, shape () or (series,)
+        noise_var (ndarray): noise variance, shape () or (series,)
+
+    References:
+        Lenschow et al. (2000), https://doi.org/10.1175/1520-0426(2000)017<1330:MSTFOT>2.0.CO;2
+
+    """
+    lags = np.asarray(lags)
+    acov, _ = acf_fast_unnormalized_batch(velo, max_lag=int(lags.max()))
+
+    sigma2_w = acov[0]
+    velo_var, _ = theil_sen_intercept(lags, acov[lags])
+
+    # if unbiased variance less than 'biased' variance, no significant amount of noise --> used 'biased' variance
+    velo_var = np.where(velo_var < sigma2_w, velo_var, sigma2_w)
+    noise_var = sigma2_w - velo_var
+
+    return velo_var, noise_var
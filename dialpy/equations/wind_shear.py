@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for the vector wind shear product (windshear, windshear_vad, windshear_dbs).
+
+Vertical derivatives of u and v are second order finite differences on a non-uniform height grid, with the error of
+the winds propagated through the difference weights. Winds are averaged into 3 min blocks from cumulative sums, and
+block sums of consecutive files can be accumulated with WindShearBlocks, so a month of wind files is processed in one
+streaming pass.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations.rolling_statistics import BLOCK_LENGTH_3MIN, block_edges, block_index, nc_variables_3min
+
+
+def derivative_weights(z_):
+    """Weights of the second order finite difference of a non-uniform grid, first order at the ends:
+    df/dz[i] = w_[0, i] * f[i-1] + w_[1, i] * f[i] + w_[2, i] * f[i+1]
+
+    Args:
+        z_ (ndarray): heights, increasing, shape (height,), at least 2
+
+    Returns:
+        w_ (ndarray): shape (3, height)
+
+    """
+    z_ = np.asarray(z_, dtype=float)
+    w_ = np.zeros((3, len(z_)))
+    h_s = z_[1:-1] - z_[:-2]  # spacing below
+    h_d = z_[2:] - z_[1:-1]  # spacing above
+    w_[0, 1:-1] = -h_d / (h_s * (h_s + h_d))
+    w_[1, 1:-1] = (h_d - h_s) / (h_s * h_d)
+    w_[2, 1:-1] = h_s / (h_d * (h_s + h_d))
+    w_[1, 0], w_[2, 0] = -1 / (z_[1] - z_[0]), 1 / (z_[1] - z_[0])
+    w_[0, -1], w_[1, -1] = -1 / (z_[-1] - z_[-2]), 1 / (z_[-1] - z_[-2])
+    return w_
+
+
+def _apply_weights(w_, f_):
+    """Finite difference along the last axis of 'f_' with derivative_weights 'w_'."""
+    f_pad = np.concatenate([f_[..., :1], f_, f_[..., -1:]], axis=-1)  # edge values get zero weight
+    return w_[0] * f_pad[..., :-2] + w_[1] * f_pad[..., 1:-1] + w_[2] * f_pad[..., 2:]
+
+
+def vertical_derivative(z_, f_, f_error=None):
+    """Vertical derivative of a (time, height) field and its error, vectorized over the whole field.
+
+    Args:
+        z_ (ndarray): heights (m), increasing, shape (height,)
+        f_ (ndarray): field, shape (..., height)
+        f_error (ndarray): Optional. Errors (std) of 'f_', assumed independent between heights
+
+    Returns:
+        dfdz (ndarray): shape of 'f_'
+        dfdz_error (ndarray): None if 'f_error' not given
+
+    """
+    w_ = derivative_weights(z_)
+    dfdz = _apply_weights(w_, np.asarray(f_, dtype=float))
+    if f_error is None:
+        return dfdz, None
+    return dfdz, np.sqrt(_apply_weights(w_**2, np.asarray(f_error, dtype=float)**2))
+
+
+def vector_wind_shear(z_, u, v, u_error=None, v_error=None):
+    """Vector wind shear, sqrt((du/dz)^2 + (dv/dz)^2), and its error.
+
+    Args:
+        z_ (ndarray): heights (m), increasing, shape (height,)
+        u, v (ndarray): eastward and northward wind (m s-1), shape (time, height)
+        u_error, v_error (ndarray): Optional. Errors (std) of u and v (m s-1)
+
+    Returns:
+        shear (ndarray): (s-1), shape (time, height)
+        shear_error (ndarray): (s-1), None if the errors are not given
+
+    """
+    dudz, dudz_error = vertical_derivative(z_, u, u_error)
+    dvdz, dvdz_error = vertical_derivative(z_, v, v_error)
+    shear = np.hypot(dudz, dvdz)
+    if dudz_error is None or dvdz_error is None:
+        return shear, None
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shear_error = np.hypot(dudz * dudz_error, dvdz * dvdz_error) / shear
+    return shear, shear_error
+
+
+class WindShearBlocks:
+    """Streaming 3 min (or other) block averages of u and v and the resulting vector wind shear. Block sums of each
+    added file are computed from cumulative sums and accumulated, thus files can be added in any order.
+
+    Args:
+        z_ (ndarray): heights (m), increasing, shape (height,)
+        t_min (float): Optional. Start of the block grid, default 0 (hours)
+        t_max (float): Optional. End of the block grid, default 24 (hours), e.g. 24 * 31 for a month
+        block_length (float): Optional. Length of a block, default 3 min (hours)
+
+    """
+
+    # accumulated sums: count, u, u^2, v, v^2, u_error^2, v_error^2
+    _N_SUMS = 7
+
+    def __init__(self, z_, t_min=0, t_max=24, block_length=BLOCK_LENGTH_3MIN):
+        self.z_ = np.asarray(z_, dtype=float)
+        self.edges, self.time_blocks = block_edges(block_length=block_length, t_min=t_min, t_max=t_max)
+        self.sums = np.zeros((self._N_SUMS, len(self.time_blocks), len(self.z_)))
+        self.has_errors = True
+
+    def add(self, time_, u, v, u_error=None, v_error=None):
+        """Adds the winds of one file.
+
+        Args:
+            time_ (ndarray): times (hours), increasing, shape (time,)
+            u, v (ndarray): eastward and northward wind (m s-1), shape (time, height), nan for missing
+            u_error, v_error (ndarray): Optional. Errors (std) of u and v (m s-1)
+
+        """
+        u = np.asarray(u, dtype=float)
+        v = np.asarray(v, dtype=float)
+        valid_ = np.isfinite(u) & np.isfinite(v)
+        if u_error is None or v_error is None:
+            self.has_errors = False
+            u_error = v_error = np.zeros(u.shape)
+        fields = [valid_, u, u**2, v, v**2, np.asarray(u_error)**2, np.asarray(v_error)**2]
+        samples_ = np.stack([np.where(valid_, f_, 0.) for f_ in fields])
+
+        cs = np.zeros((self._N_SUMS, len(time_) + 1, len(self.z_)))
+        np.cumsum(samples_, axis=1, out=cs[:, 1:])
+        i_, _ = block_index(time_, self.edges)
+        self.sums += cs[:, i_[1:]] - cs[:, i_[:-1]]
+
+    def merge(self, other):
+        """Adds the sums of another WindShearBlocks of the same grid, e.g. computed in a parallel worker."""
+        self.sums += other.sums
+        self.has_errors = self.has_errors and other.has_errors
+
+    def result(self):
+        """Block mean winds and the vector wind shear.
+
+        Returns:
+            time_blocks (ndarray): block centers (hours), shape (blocks,)
+            shear (ndarray): vector wind shear (s-1), shape (blocks, height)
+            shear_error (ndarray): (s-1), from the errors of the winds if given to add(), otherwise from the standard
+                                   error of the block means
+            u, v (ndarray): block mean winds (m s-1)
+
+        """
+        n_, s_u, s_uu, s_v, s_vv, s_eu, s_ev = self.sums
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.where(n_ > 0, s_u / n_, np.nan)
+            v = np.where(n_ > 0, s_v / n_, np.nan)
+            if self.has_errors:
+                u_error = np.sqrt(s_eu) / n_
+                v_error = np.sqrt(s_ev) / n_
+            else:
+                u_error = np.sqrt(np.maximum(s_uu / n_ - u**2, 0) / (n_ - 1))
+                v_error = np.sqrt(np.maximum(s_vv / n_ - v**2, 0) / (n_ - 1))
+        shear, shear_error = vector_wind_shear(self.z_, u, v, u_error, v_error)
+        return self.time_blocks, shear, shear_error, u, v
+
+
+def wind_shear_3min(time_, z_, u, v, u_error=None, v_error=None, t_min=0, t_max=24):
+    """Vector wind shear in 3 min blocks of one file, see WindShearBlocks.
+
+    Returns:
+        time_3min (ndarray): block centers (hours)
+        shear (ndarray): vector wind shear (s-1), shape (blocks, height)
+        shear_error (ndarray): (s-1), shape (blocks, height)
+
+    """
+    blocks = WindShearBlocks(z_, t_min=t_min, t_max=t_max)
+    blocks.add(time_, u, v, u_error, v_error)
+    time_3min, shear, shear_error, _, _ = blocks.result()
+    return time_3min, shear, shear_error
+
+
+def wind_shear_nc_variables(time_3min, range_, shear, shear_error):
+    """netCDF variables of the wind shear product, see nc_tools.write_nc_.
+
+    Returns:
+        obs (list): VarBlueprint of time_3min, range, vector_wind_shear_3min, and vector_wind_shear_error_3min
+
+    """
+    return nc_variables_3min(time_3min, range_, {"vector_wind_shear_3min": shear,
+                                                 "vector_wind_shear_error_3min": shear_error})
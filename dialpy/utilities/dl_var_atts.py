@@ -55,6 +55,9 @@ class VarBlueprint:
         self.plot_scale = plot_scale
         self.plot_range = plot_range
         self.extra_attributes = extra_attributes
+        if extra_attributes is not None:  # e.g. flag_values and flag_meanings of a classification
+            for attr_extra, value_extra in extra_attributes.items():
+                setattr(self, attr_extra, value_extra)
         self.calendar = calendar
         self.error_variable = error_variable
         self.bias_variable = bias_variable
@@ -98,7 +101,9 @@ def dl_var_atts(var_name, data=None, dim_size=None):
                             comment=att[var_name]["comment"],
                             data=data,
                             dim_name=att[var_name]["dim_name"],
-                            dim_size=dim_size)
+                            dim_size=dim_size,
+                            data_type=att[var_name].get("data_type", "f8"),
+                            extra_attributes=att[var_name].get("extra_attributes"))
 
 
 def fill_in_atts(ncvar, atts):
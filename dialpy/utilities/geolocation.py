@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for geolocating lidar range gates of VAD, DBS and RHI scans.
+
+Ranges are broadcast over the azimuth and elevation of each ray to a full (ray, range) mesh, and the Cartesian
+coordinates are converted to latitude and longitude with a pyproj.Transformer that is cached per site.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+from functools import lru_cache
+import numpy as np
+import pyproj
+
+# effective radius of earth (m), 4/3 of the mean radius, see pyart_coordinate_tools.antenna_to_cartesian
+_EFFECTIVE_EARTH_RADIUS = 6371.0 * 1000.0 * 4.0 / 3.0
+
+
+@lru_cache(maxsize=32)
+def site_transformer(lat_0, lon_0):
+    """Transformer from the azimuthal equidistant projection centered at the site to WGS84 longitude and latitude.
+
+    Args:
+        lat_0 (float): latitude of the instrument (degrees north)
+        lon_0 (float): longitude of the instrument (degrees east)
+
+    Returns:
+        transformer (pyproj.Transformer): cached transformer, (x, y) --> (lon, lat)
+
+    """
+    aeqd = pyproj.CRS.from_dict({'proj': 'aeqd', 'lat_0': lat_0, 'lon_0': lon_0, 'datum': 'WGS84', 'units': 'm'})
+    return pyproj.Transformer.from_crs(aeqd, 'EPSG:4326', always_xy=True)
+
+
+def antenna_to_cartesian_mesh(range_, azimuth_, elevation_, dtype=np.float64, out=None):
+    """Cartesian coordinates of every (ray, range) gate, the 4/3 earth radius model of
+    pyart_coordinate_tools.antenna_to_cartesian broadcast over rays.
+
+    Args:
+        range_ (ndarray): distance to the center of the range gates (m), shape (range,)
+        azimuth_ (ndarray): azimuth of each ray (degrees from North), shape (ray,)
+        elevation_ (ndarray or float): elevation of each ray (degrees from horizon), shape (ray,) or scalar
+        dtype (type): Optional. Floating point type of the outputs, e.g. np.float32, default np.float64
+        out (tuple): Optional. Preallocated x, y, z arrays of shape (ray, range) to write into
+
+    Returns:
+        x, y, z (ndarray): Cartesian coordinates from the instrument (m), shape (ray, range)
+
+    """
+    range_ = np.asarray(range_, dtype=dtype)[np.newaxis, :]
+    azimuth_ = np.asarray(azimuth_, dtype=dtype)
+    theta_a = np.deg2rad(azimuth_)[:, np.newaxis]
+    theta_e = np.deg2rad(np.broadcast_to(np.asarray(elevation_, dtype=dtype), azimuth_.shape))[:, np.newaxis]
+    R = dtype(_EFFECTIVE_EARTH_RADIUS)
+
+    if out is None:
+        shape_ = (theta_a.shape[0], range_.shape[1])
+        out = (np.empty(shape_, dtype=dtype), np.empty(shape_, dtype=dtype), np.empty(shape_, dtype=dtype))
+    x, y, z = out
+
+    np.sqrt(range_ ** 2 + R ** 2 + 2.0 * range_ * R * np.sin(theta_e), out=z)
+    z -= R
+    s = R * np.arcsin(range_ * np.cos(theta_e) / (R + z))  # arc length in m
+    np.multiply(s, np.sin(theta_a), out=x)
+    np.multiply(s, np.cos(theta_a), out=y)
+
+    return x, y, z
+
+
+def antenna_to_geographic(range_, azimuth_, elevation_, lat_0, lon_0, alt_0=0., dtype=np.float64, out=None):
+    """Latitude, longitude and altitude of every (ray, range) gate of a scan.
+
+    Args:
+        range_ (ndarray): distance to the center of the range gates (m), shape (range,)
+        azimuth_ (ndarray): azimuth of each ray (degrees from North), shape (ray,)
+        elevation_ (ndarray or float): elevation of each ray (degrees from horizon), shape (ray,) or scalar
+        lat_0 (float): latitude of the instrument (degrees north)
+        lon_0 (float): longitude of the instrument (degrees east)
+        alt_0 (float): Optional. Altitude of the instrument above the geoid (m), default 0
+        dtype (type): Optional. Floating point type of the outputs, e.g. np.float32, default np.float64
+        out (tuple): Optional. Preallocated lat, lon, altitude arrays of shape (ray, range) to write into
+
+    Returns:
+        lat, lon, altitude (ndarray): shape (ray, range)
+
+    """
+    shape_ = (np.size(azimuth_), np.size(range_))
+    if out is None:
+        out = (np.empty(shape_, dtype=dtype), np.empty(shape_, dtype=dtype), np.empty(shape_, dtype=dtype))
+    lat, lon, altitude = out
+
+    # projection is done in double precision, results are cast into the outputs
+    x, y, z = antenna_to_cartesian_mesh(range_, azimuth_, elevation_, dtype=np.float64)
+    lon_, lat_ = site_transformer(float(lat_0), float(lon_0)).transform(x, y, inplace=True)
+    np.copyto(lon, lon_, casting='same_kind')
+    np.copyto(lat, lat_, casting='same_kind')
+    np.add(z, alt_0, out=altitude, casting='same_kind')
+
+    return lat, lon, altitude
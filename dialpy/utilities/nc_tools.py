@@ -10,6 +10,7 @@ from netCDF4 import Dataset
 from datetime import datetime
 from dialpy.utilities import dialpy_version
 from dialpy.utilities import general_utils as gu
+from dialpy.utilities.profiling import timed_stage
 import getpass
 import uuid
 
@@ -59,6 +60,7 @@ def create_nc_var(rootgrp, var):
     return rootgrp, ncvar
 
 
+@timed_stage("write_nc")
 def write_nc_(date_txt, file_name, obs, additional_gatts=None, title_="", institution_="", location_="", source_=""):
     """Writes a netCDF file with name and full path specified by 'file_name' with attributes as listed by 'obs'.
 
@@ -17,6 +17,7 @@ import matplotlib.pylab as plt
 import matplotlib.colors as mcolors
 from netCDF4 import Dataset
 import numpy as np
+from dialpy.utilities.profiling import timed_stage
 
 _YMIN = 0
 _YMAX = 3
@@ -97,6 +98,7 @@ def create_pcolor_plot(fig_=None, ax_=None, x_=None, y_=None, Z=None):
     fig_.colorbar(im, ax=ax_, use_gridspec=True, extend=var_.cextend, label=var_.units)
 
 
+@timed_stage("plot")
 def plot_stare(args):
     """Generates a plot of calibrated Doppler lidar nc measured in vertical stare pointing mode.
 
@@ -220,6 +222,7 @@ def plot_stare(args):
         plt.close()
 
 
+@timed_stage("plot")
 def plot_wstats(args):
     """Generates a plot of vertical velocity statistics (wstats) estimated from Doppler lidar measurements.
 
@@ -232,6 +235,7 @@ def plot_wstats(args):
     cmap = plt.get_cmap('cubehelix')
 
 
+@timed_stage("plot")
 def plot_epsilon(args):
     """Generates a plot of turbulent kinetic energy dissipation rate estimated from Doppler lidar measurements.
         Args:
@@ -296,6 +300,7 @@ def plot_epsilon(args):
         plt.close()
 
 
+@timed_stage("plot")
 def plot_windshear(args):
     """Generates a plot of turbulent kinetic energy dissipation rate estimated from Doppler lidar measurements.
         Args:
@@ -360,6 +365,7 @@ def plot_windshear(args):
         plt.close()
 
 
+@timed_stage("plot")
 def plot_windvad(args):
     """Generates a plot of turbulent kinetic energy dissipation rate estimated from Doppler lidar measurements.
         Args:
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lightweight timing and profiling hooks for the stages of the DIAL processing chain.
+
+Stages are marked with the 'stage' context manager or the 'timed_stage' decorator. Nothing is recorded until
+enable() is called; while disabled the decorator only checks one module level flag before calling the function.
+
+Examples:
+    from dialpy.utilities import profiling
+    profiling.enable(track_memory=True, profile_stage="retrieval")
+    ...  # run processing
+    print(profiling.summary_table())
+    profiling.write_summary_json("timing_20200508.json")
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_ENABLED = False
+_TRACK_MEMORY = False
+# tracemalloc was started by enable(), thus disable() stops it
+_STARTED_TRACING = False
+_PROFILE_STAGE = None
+_PROFILE_DIR = "."
+_PROFILER = "cprofile"
+_STATS = {}
+_ACTIVE = []
+
+
+def enable(track_memory=False, profile_stage=None, profile_dir=".", profiler="cprofile"):
+    """Starts recording stage timings.
+
+    Args:
+        track_memory (bool): Optional. Record peak traced memory per stage with tracemalloc (slows down the run)
+        profile_stage (str): Optional. Name of a stage to profile, a dump is written for each call of it
+        profile_dir (str): Optional. Folder for the profiler dumps, default current working directory
+        profiler (str): Optional. 'cprofile' (.prof, read with pstats or snakeviz) or 'pyinstrument' (.html)
+
+    """
+    global _ENABLED, _TRACK_MEMORY, _STARTED_TRACING, _PROFILE_STAGE, _PROFILE_DIR, _PROFILER
+    if profiler not in ("cprofile", "pyinstrument"):
+        raise ValueError("Optional input profiler= can be 'cprofile' or 'pyinstrument'")
+    _ENABLED = True
+    _TRACK_MEMORY = track_memory
+    _PROFILE_STAGE = profile_stage
+    _PROFILE_DIR = profile_dir
+    _PROFILER = profiler
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STARTED_TRACING = True
+
+
+def disable():
+    """Stops recording, already recorded statistics are kept until reset(). Memory tracing is stopped only if enable()
+    started it, tracing started by the caller is left running."""
+    global _ENABLED, _STARTED_TRACING
+    _ENABLED = False
+    if _STARTED_TRACING and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _STARTED_TRACING = False
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def reset():
+    """Clears the recorded statistics."""
+    _STATS.clear()
+
+
+def _dump_name(name, extension):
+    n_calls = _STATS[name]["calls"] if name in _STATS else 0
+    return os.path.join(_PROFILE_DIR, "{}_{:04d}.{}".format(name, n_calls + 1, extension))
+
+
+@contextmanager
+def _profiled(name):
+    """Runs the enclosed block under the selected profiler and writes a dump."""
+    if _PROFILER == "pyinstrument":
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(_dump_name(name, "html"), "w") as f:
+                f.write(profiler.output_html())
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(_dump_name(name, "prof"))
+
+
+@contextmanager
+def stage(name):
+    """Context manager timing the enclosed block as stage 'name'. Nested stages are recorded separately; the peak
+    memory of an outer stage may be underestimated when stages are nested.
+
+    Args:
+        name (str): stage name, e.g. "spectroscopy", "dial_differencing", "retrieval", "write_nc", "plot"
+
+    """
+    if not _ENABLED:
+        yield
+        return
+
+    if _TRACK_MEMORY:
+        mem_start, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+    _ACTIVE.append(name)
+    t_start = time.perf_counter()
+    try:
+        if name == _PROFILE_STAGE and _ACTIVE.count(name) == 1:
+            with _profiled(name):
+                yield
+        else:
+            yield
+    finally:
+        elapsed = time.perf_counter() - t_start
+        _ACTIVE.pop()
+        stats = _STATS.setdefault(name, {"calls": 0, "wall_time": 0., "max_wall_time": 0., "peak_memory": 0})
+        stats["calls"] += 1
+        stats["wall_time"] += elapsed
+        stats["max_wall_time"] = max(stats["max_wall_time"], elapsed)
+        if _TRACK_MEMORY and tracemalloc.is_tracing():
+            _, mem_peak = tracemalloc.get_traced_memory()
+            stats["peak_memory"] = max(stats["peak_memory"], mem_peak - mem_start)
+
+
+def timed_stage(name):
+    """Decorator timing every call of the decorated function as stage 'name', see stage().
+
+    Args:
+        name (str): stage name
+
+    """
+    def decorator(fun):
+        @functools.wraps(fun)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return fun(*args, **kwargs)
+            with stage(name):
+                return fun(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """Recorded statistics per stage.
+
+    Returns:
+        stats (dict): {stage name: {"calls", "wall_time" (s), "mean_wall_time" (s), "max_wall_time" (s),
+                       "peak_memory" (bytes)}}
+
+    """
+    return {name: dict(stats, mean_wall_time=stats["wall_time"] / stats["calls"]) for name, stats in _STATS.items()}
+
+
+def summary_table():
+    """Human readable table of the recorded statistics, stages sorted by total wall time.
+
+    Returns:
+        table (str):
+
+    """
+    rows = sorted(summary().items(), key=lambda item: item[1]["wall_time"], reverse=True)
+    lines = ["{:<24s} {:>8s} {:>12s} {:>12s} {:>12s} {:>12s}".format(
+        "stage", "calls", "total (s)", "mean (s)", "max (s)", "peak (MB)")]
+    for name, stats in rows:
+        lines.append("{:<24s} {:>8d} {:>12.4f} {:>12.4f} {:>12.4f} {:>12.1f}".format(
+            name, stats["calls"], stats["wall_time"], stats["mean_wall_time"], stats["max_wall_time"],
+            stats["peak_memory"] / 1e6))
+    return "\n".join(lines)
+
+
+def write_summary_json(file_name, additional_info=None):
+    """Writes the recorded statistics into a json file.
+
+    Args:
+        file_name (str): full path to the file
+        additional_info (dict): Optional. Extra items to store, e.g. {"date": "20200508", "site": "kuopio"}
+
+    """
+    content = {"stages": summary()}
+    if additional_info is not None:
+        content.update(additional_info)
+    with open(file_name, "w") as f:
+        json.dump(content, f, indent=2)
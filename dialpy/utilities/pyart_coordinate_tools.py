@@ -38,10 +38,22 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 #
 
+from functools import lru_cache
 import numpy as np
 import pyproj
 
 
+@lru_cache(maxsize=32)
+def _proj(params_key):
+    """pyproj.Proj of hashable projection parameters, a tuple of (name, value) pairs or a string, see _get_proj."""
+    return pyproj.Proj(dict(params_key) if isinstance(params_key, tuple) else params_key)
+
+
+def _get_proj(projparams):
+    """Returns a pyproj.Proj for 'projparams', built only once for each distinct set of parameters."""
+    return _proj(tuple(sorted(projparams.items())) if isinstance(projparams, dict) else projparams)
+
+
 def antenna_to_cartesian(ranges_, azimuths_, elevations_):
     """
     Return Cartesian coordinates from antenna coordinates.
@@ -129,7 +141,7 @@ def cartesian_to_geographic(x, y, projparams):
         #         "with a projection other than pyart_aeqd but it is not "
         #         "installed")
 
-    proj = pyproj.Proj(projparams)
+    proj = _get_proj(projparams)
     lon, lat = proj(x, y, inverse=True)
 
     return lon, lat
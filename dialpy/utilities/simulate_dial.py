@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Python3 functions for simulating DIAL measurements, e.g. for benchmarks and regression tests.
+
+A (time, range) scene of ON and OFF channel powers and attenuated backscatter coefficients is generated from a
+prescribed CO2 concentration, temperature and pressure field. The absorption cross sections are calculated with the
+HITRAN line parameters and the spectroscopy engine of the package, and noise is drawn from a seeded generator.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import constants
+from dialpy.equations import spectroscopy
+
+
+def absorption_cross_section(lambda_, T_, P_, co2_ppm=400.):
+    """Absorption cross section of CO2 at the laser wavelength, sum of the Voigt shaped HITRAN lines, see
+    spectroscopy.absorption_cross_section.
+
+    Args:
+        lambda_ (float): Wavelength of the laser (m)
+        T_ (array like): temperature (K)
+        P_ (array like): pressure (atm)
+        co2_ppm (array like): Optional. CO2 concentration (ppm), for self broadening, default 400
+
+    Returns:
+        sigma_abs (ndarray): absorption cross section (m2), shape of the broadcast inputs
+
+    """
+    return spectroscopy.absorption_cross_section(spectroscopy.wavelength_to_wavenumber(lambda_), T_, P_, co2_ppm)
+
+
+def default_atmosphere(time_, range_, abl_height=1500., co2_background=400., co2_abl_excess=10.):
+    """Simple diurnal atmosphere: linear temperature lapse rate, exponential pressure, and CO2 enhanced inside a
+    boundary layer whose depth grows from morning to afternoon.
+
+    Args:
+        time_ (ndarray): time (hours UTC), shape (time,)
+        range_ (ndarray): range from the instrument (m), shape (range,)
+        abl_height (float): Optional. Maximum boundary layer height (m), default 1500
+        co2_background (float): Optional. Free troposphere CO2 (ppm), default 400
+        co2_abl_excess (float): Optional. CO2 enhancement in the boundary layer (ppm), default 10
+
+    Returns:
+        co2_ppm (ndarray): CO2 concentration (ppm), shape (time, range)
+        T_ (ndarray): temperature (K), shape (time, range)
+        P_ (ndarray): pressure (atm), shape (time, range)
+        h_abl (ndarray): boundary layer height (m), shape (time,)
+
+    """
+    h_abl = abl_height * (.3 + .7 * np.clip(np.sin(np.pi * (time_ - 6) / 14), 0, 1))
+    z_ = range_[np.newaxis, :]
+    in_abl = .5 * (1 - np.tanh((z_ - h_abl[:, np.newaxis]) / 100))
+    co2_ppm = co2_background + co2_abl_excess * in_abl
+    T_ = np.broadcast_to(293 - .0065 * z_, co2_ppm.shape)
+    P_ = np.broadcast_to(np.exp(-z_ / 8000), co2_ppm.shape)
+
+    return co2_ppm, T_, P_, h_abl
+
+
+def simulate_dial_scene(n_time=3600, n_range=400, dt=1., delta_range=constants.DELTA_RANGE, co2_ppm=None, T_=None,
+                        P_=None, P_out_on=constants.POWER_OUT_LAMBDA_ON, P_out_off=constants.POWER_OUT_LAMBDA_OFF,
+                        P_bkg=1e-6, n_accumulations=1e4, bkg_noise=1e-7, seed=None, dtype=np.float64):
+    """Generates a (time, range) DIAL scene of ON and OFF channel powers and attenuated backscatter coefficients.
+
+    The backscatter coefficient has a boundary layer aerosol structure, the two-way transmission of each channel is
+    calculated from the CO2 number density and the absorption cross sections, and the noise consists of speckle
+    (relative std 1/sqrt(n_accumulations)) and additive Gaussian background noise (std 'bkg_noise').
+
+    Args:
+        n_time (int): Optional. Number of profiles, default 3600
+        n_range (int): Optional. Number of range gates, default 400
+        dt (float): Optional. Time between profiles (s), default 1
+        delta_range (float): Optional. Range resolution (m), default constants.DELTA_RANGE
+        co2_ppm (ndarray): Optional. CO2 concentration (ppm), shape (time, range) or (range,), default from
+                           default_atmosphere
+        T_ (ndarray): Optional. Temperature (K), shape (time, range) or (range,), default from default_atmosphere
+        P_ (ndarray): Optional. Pressure (atm), shape (time, range) or (range,), default from default_atmosphere
+        P_out_on (float): Optional. Transmitted power, ON channel
+        P_out_off (float): Optional. Transmitted power, OFF channel
+        P_bkg (float): Optional. Mean background power, default 1e-6
+        n_accumulations (float): Optional. Number of accumulated pulses per profile, default 1e4
+        bkg_noise (float): Optional. Std of the background noise, default 1e-7
+        seed (int): Optional. Seed of the random number generator
+        dtype (type): Optional. Floating point type of the outputs, default np.float64
+
+    Returns:
+        scene (dict): 'time' (hours), 'range' (m), 'co2_ppm', 'temperature' (K), 'pressure' (atm), 'number_density',
+                      'delta_sigma_abs' (m2), 'beta' (m-1 sr-1), 'beta_att_on', 'beta_att_off', 'power_on',
+                      'power_off', and 'P_bkg', all fields of shape (time, range)
+
+    """
+    rng = np.random.default_rng(seed)
+    time_ = np.arange(n_time) * dt / 3600 + 12  # hours UTC, start at noon
+    range_ = (np.arange(n_range) + 1) * delta_range
+
+    co2_def, T_def, P_def, h_abl = default_atmosphere(time_, range_)
+    co2_ppm = co2_def if co2_ppm is None else np.broadcast_to(co2_ppm, (n_time, n_range))
+    T_ = T_def if T_ is None else np.broadcast_to(T_, (n_time, n_range))
+    P_ = P_def if P_ is None else np.broadcast_to(P_, (n_time, n_range))
+
+    # cross sections, evaluated only once when T and P are constant in time
+    if np.all(T_ == T_[:1]) and np.all(P_ == P_[:1]):
+        sigma_on = absorption_cross_section(constants.LAMBDA_ON, T_[0], P_[0], co2_ppm[0])[np.newaxis, :]
+        sigma_off = absorption_cross_section(constants.LAMBDA_OFF, T_[0], P_[0], co2_ppm[0])[np.newaxis, :]
+    else:
+        sigma_on = absorption_cross_section(constants.LAMBDA_ON, T_, P_, co2_ppm)
+        sigma_off = absorption_cross_section(constants.LAMBDA_OFF, T_, P_, co2_ppm)
+
+    # one-way optical depths and aerosol backscatter
+    N_d = spectroscopy.number_density_cm3(T_, P_, co2_ppm) * 1e6  # (m-3)
+    tau_on = np.cumsum(sigma_on * N_d * delta_range, axis=1)
+    tau_off = np.cumsum(sigma_off * N_d * delta_range, axis=1)
+    z_ = range_[np.newaxis, :]
+    beta = 2e-7 * (1 + np.tanh((h_abl[:, np.newaxis] - z_) / 150)) + 5e-8 * np.exp(-z_ / 8000)
+    beta_att_on = beta * np.exp(-2 * tau_on)
+    beta_att_off = beta * np.exp(-2 * tau_off)
+
+    # received powers with speckle and background noise, see differential_co2_concentration.xco2_beta
+    speckle = 1 / np.sqrt(n_accumulations)
+    power_on = P_out_on * delta_range * beta_att_on * (1 + speckle * rng.standard_normal(beta.shape)) + \
+        P_bkg + bkg_noise * rng.standard_normal(beta.shape)
+    power_off = P_out_off * delta_range * beta_att_off * (1 + speckle * rng.standard_normal(beta.shape)) + \
+        P_bkg + bkg_noise * rng.standard_normal(beta.shape)
+
+    fields = {'time': time_,
+              'range': range_,
+              'co2_ppm': co2_ppm,
+              'temperature': T_,
+              'pressure': P_,
+              'number_density': N_d,
+              'delta_sigma_abs': np.broadcast_to(sigma_on - sigma_off, beta.shape),
+              'beta': beta,
+              'beta_att_on': beta_att_on,
+              'beta_att_off': beta_att_off,
+              'power_on': power_on,
+              'power_off': power_off,
+              'P_bkg': np.full(beta.shape, P_bkg)}
+
+    return {key_: np.ascontiguousarray(value_, dtype=dtype) for key_, value_ in fields.items()}
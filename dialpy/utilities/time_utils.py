@@ -181,41 +181,132 @@ def datetime_range(start_datetime, end_datetime):
         : (range) Datetime range from start_datetime to end_datetime
 
     """
-    # date format for this function
-    d_format = "%Y%m%d%H%M%S"
-
-    # Convert to Epoch time
-    start_date_epoch = date_txt2epoch(start_datetime.strftime(d_format), d_format)
-    end_date_epoch = date_txt2epoch(end_datetime.strftime(d_format), d_format)
 
     # Get range of date-times from start_date to end_date with timedelta 1 second
-    for n in range(start_date_epoch, end_date_epoch):
-        the_date_txt = epoch2date_txt(n, d_format)
-        yield datetime.strptime(the_date_txt, d_format)
+    for the_date in datetime64_range(start_datetime, end_datetime).astype(datetime):
+        yield the_date
 
 
-def time_hrs_utc2epoch(year_, month_, day_, time_hrs):
+def datetime64_range(start_datetime, end_datetime, step_seconds=1):
+    """Range of date-times as a numpy datetime64 array, vectorized counterpart of datetime_range.
+
+    Args:
+        start_datetime: (datetime or datetime64) Start date, e.g. datetime(2001,1,1,00,00,00)
+        end_datetime: (datetime or datetime64) End date (exclusive), e.g. datetime(2001,12,31,23,59,59)
+        step_seconds: (int) Optional. Step in seconds, default 1
+
+    Returns:
+        dt64: (ndarray) datetime64[s] array from start_datetime to end_datetime
+
     """
 
+    start_ = np.datetime64(start_datetime, 's')
+    end_ = np.datetime64(end_datetime, 's')
+
+    return np.arange(start_, end_, np.timedelta64(step_seconds, 's'))
+
+
+def midnight_datetime64(year_, month_, day_):
+    """Midnight UTC of the given day as datetime64.
+
     Args:
-        year_:
-        month_:
-        day_:
-        time_hrs:
+        year_: (int)
+        month_: (int)
+        day_: (int)
 
     Returns:
+        midnight: (datetime64[s])
 
     """
-    hrs_ = np.floor(time_hrs[:])
-    mins_ = np.floor((time_hrs[:] - hrs_) * 60)
-    secs_ = np.round((((time_hrs[:] - hrs_) * 60) - mins_) * 60)
-
-    unix_time_ = np.empty([len(time_hrs)])
-    unix_time_[:] = np.nan
-    for i in range(len(time_hrs)):
-        thedate = "{}-{:02d}-{:02d}_{:02d}:{:02d}:{:02d}".format(year_, int(month_), int(day_), int(hrs_[i]), int(mins_[i]), int(secs_[i]))
-        thedate.replace(" ", "0")
-        date_format = check_date_format(thedate)
-        unix_time_[i] = date_txt2epoch(thedate, date_format)
-
-    return unix_time_
+
+    return np.datetime64("{:04d}-{:02d}-{:02d}".format(int(year_), int(month_), int(day_)), 's')
+
+
+def hrs_utc2datetime64(year_, month_, day_, time_hrs):
+    """Converts time in hours since midnight UTC to datetime64, vectorized.
+
+    Args:
+        year_: (int)
+        month_: (int)
+        day_: (int)
+        time_hrs: (array like) hours since midnight UTC
+
+    Returns:
+        dt64: (ndarray) datetime64[s], rounded to the nearest second, NaT for NaN inputs
+
+    """
+
+    secs_ = np.round(np.asarray(time_hrs, dtype=float) * 3600)
+    dt64 = np.full(secs_.shape, np.datetime64('NaT'), dtype='datetime64[s]')
+    valid_ = np.isfinite(secs_)
+    dt64[valid_] = midnight_datetime64(year_, month_, day_) + secs_[valid_].astype('timedelta64[s]')
+
+    return dt64
+
+
+def datetime642epoch(dt64):
+    """Converts datetime64 to UNIX Epoch time, vectorized.
+
+    Args:
+        dt64: (array like) datetime64
+
+    Returns:
+        epoch_: (ndarray) seconds since 1970-01-01 00:00:00 UTC (float), NaN for NaT
+
+    """
+
+    dt64 = np.asarray(dt64, dtype='datetime64[ns]')
+    epoch_ = dt64.astype('int64') / 1e9
+    epoch_ = np.where(np.isnat(dt64), np.nan, epoch_)
+
+    return epoch_
+
+
+def epoch2datetime64(epoch_):
+    """Converts UNIX Epoch time to datetime64, vectorized.
+
+    Args:
+        epoch_: (array like) seconds since 1970-01-01 00:00:00 UTC
+
+    Returns:
+        dt64: (ndarray) datetime64[ns], NaT for NaN inputs
+
+    """
+
+    ns_ = np.round(np.asarray(epoch_, dtype=float) * 1e9)
+    dt64 = np.full(ns_.shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+    valid_ = np.isfinite(ns_)
+    dt64[valid_] = ns_[valid_].astype('int64').astype('datetime64[ns]')
+
+    return dt64
+
+
+def epoch2hrs_utc(epoch_):
+    """Converts UNIX Epoch time to hours since midnight UTC of the same day, vectorized.
+
+    Args:
+        epoch_: (array like) seconds since 1970-01-01 00:00:00 UTC
+
+    Returns:
+        time_hrs: (ndarray) hours since midnight UTC
+
+    """
+
+    return np.mod(np.asarray(epoch_, dtype=float), 86400) / 3600
+
+
+def time_hrs_utc2epoch(year_, month_, day_, time_hrs):
+    """Converts time in hours since midnight UTC to UNIX Epoch time, rounded to the nearest second.
+
+    Args:
+        year_: (int)
+        month_: (int)
+        day_: (int)
+        time_hrs: (array like) hours since midnight UTC
+
+    Returns:
+        unix_time_: (ndarray) seconds since 1970-01-01 00:00:00 UTC
+
+    """
+
+    return datetime642epoch(hrs_utc2datetime64(year_, month_, day_, time_hrs))
@@ -12,10 +12,18 @@ from dialpy.pyOptimalEstimation import pyOptimalEstimation as pyOE
 from dialpy.equations.differential_co2_concentration import xco2_beta
 from dialpy.equations.differential_co2_concentration import xco2_power
 from dialpy.equations import constants
+from dialpy.equations import atmospheric_profiles
 from scripts import simulated_inputs as sims
 import matplotlib.pyplot as plt
 from dialpy.utilities.dl_var_atts import dl_var_atts as vatts
 from dialpy.utilities import nc_tools
+from dialpy.utilities import profiling
+import os
+
+# Set DIALPY_PROFILE=1 to print the processing time of each stage, DIALPY_PROFILE=<stage name> to also profile it
+if os.environ.get("DIALPY_PROFILE"):
+    profiling.enable(track_memory=True,
+                     profile_stage=None if os.environ["DIALPY_PROFILE"] == "1" else os.environ["DIALPY_PROFILE"])
 
 # Read inputs
 time_ = np.array([0])  # If time is array, add another loop
@@ -25,8 +33,13 @@ obs_beta_off, obs_beta_on = sims.sim_noisy_beta_att(len(range_), type_='poly2')
 
 # first guess for X - can be from a model, sounding, in-situ observation...
 co2_ppm = np.repeat(400, len(range_) - 1)  # (ppm)
-T_ = np.repeat(293, len(range_) - 1)  # (K)
-P_ = np.repeat(1, len(range_) - 1)  # (atm)
+# Set DIALPY_PROFILES=<netCDF or .csv file> to take T and P from a model or sounding, see atmospheric_profiles
+if os.environ.get("DIALPY_PROFILES"):
+    T_, P_ = atmospheric_profiles.temperature_pressure(os.environ["DIALPY_PROFILES"], time_, range_[:-1] * 1000)
+    T_, P_ = T_[0], P_[0]
+else:
+    T_ = np.repeat(293, len(range_) - 1)  # (K)
+    P_ = np.repeat(1, len(range_) - 1)  # (atm)
 
 # if you have calibrated (or wish to run retrieval with uncalibrated) attenuated beta, use:
 N_d, log_ratio_of_powers = xco2_beta(delta_sigma_abs, obs_beta_on, obs_beta_off)
@@ -67,33 +80,34 @@ y_vars = ["N_d"]
 
 # for j in range(len(time_)):  # loop over time stamps
 
-# Loop over range gates - this should be done a profile at a time to speed up. pyOEcore.py gives errors though!
-for i in range(len(range_)-1):
+with profiling.stage("retrieval"):
+    # Loop over range gates - this should be done a profile at a time to speed up. pyOEcore.py gives errors though!
+    for i in range(len(range_)-1):
 
-    x_ap = [co2_ppm[i], T_[i], P_[i]]
+        x_ap = [co2_ppm[i], T_[i], P_[i]]
 
-    # covariance matrix for X, uncertainties
-    x_cov = np.array([[5, 0, 0], [0, 1, 0], [0, 0, .1]])  # units: [[(ppm), 0, 0], [0, (K), 0]. [0, 0, (atm)]]
+        # covariance matrix for X, uncertainties
+        x_cov = np.array([[5, 0, 0], [0, 1, 0], [0, 0, .1]])  # units: [[(ppm), 0, 0], [0, (K), 0]. [0, 0, (atm)]]
 
-    # covariance matrix for Y, uncertainty
-    y_cov = np.array([1])  # units: m-2 / 1e21  --> scaled!
+        # covariance matrix for Y, uncertainty
+        y_cov = np.array([1])  # units: m-2 / 1e21  --> scaled!
 
-    # measured observation of Y, Y_i = [y_below, y_above], delta_sigma_abs, beta_on, beta_off
-    y_obs = np.array(N_d[i]/1e21)  # scale to within same ball park (order of magnitude) as with other inputs
+        # measured observation of Y, Y_i = [y_below, y_above], delta_sigma_abs, beta_on, beta_off
+        y_obs = np.array(N_d[i]/1e21)  # scale to within same ball park (order of magnitude) as with other inputs
 
-    # create optimal estimation object
-    oe = pyOE.optimalEstimation(x_vars, x_ap, x_cov, y_vars, y_obs, y_cov, forward)
+        # create optimal estimation object
+        oe = pyOE.optimalEstimation(x_vars, x_ap, x_cov, y_vars, y_obs, y_cov, forward)
 
-    # run the retrieval
-    converged = oe.doRetrieval(maxIter=100)  # check options within, max time can be set as well
+        # run the retrieval
+        converged = oe.doRetrieval(maxIter=100)  # check options within, max time can be set as well
 
-    if converged:
-        # Store results in xarray DataArray
-        summary = oe.summarize()
-        print(range_[i], summary['x_op'][0], summary['y_op'][0])
+        if converged:
+            # Store results in xarray DataArray
+            summary = oe.summarize()
+            print(range_[i], summary['x_op'][0], summary['y_op'][0])
 
-        res[i, 1] = float(summary['x_op'][0])
-        res[i, 2] = float(summary['y_op'][0]*1e22)
+            res[i, 1] = float(summary['x_op'][0])
+            res[i, 2] = float(summary['y_op'][0]*1e22)
 
 # Prepare outputs for writing into netcdf
 temperature_out = vatts("temperature", data=T_, dim_size=(len(time_), len(T_)))
@@ -134,6 +148,11 @@ ax2.set_xlabel("(ppm)")
 ax2.grid()
 
 fig.tight_layout()
-plt.savefig("DIAL_OE_test_co2.png", facecolor='w', edgecolor='w',
-            format="png", bbox_inches="tight", pad_inches=0.1)
+with profiling.stage("plot"):
+    plt.savefig("DIAL_OE_test_co2.png", facecolor='w', edgecolor='w',
+                format="png", bbox_inches="tight", pad_inches=0.1)
 plt.close()
+
+if profiling.is_enabled():
+    print(profiling.summary_table())
+    profiling.write_summary_json("DIAL_retrieval_timing.json")
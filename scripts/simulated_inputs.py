@@ -38,12 +38,13 @@ def sim_delta_sigma_abs(range_):
     return np.repeat(8e-27 - 2.5e-28, len(range_))
 
 
-def sim_noisy_beta_att(len_=400, type_='poly1'):
+def sim_noisy_beta_att(len_=400, type_='poly1', seed=None):
     """
 
     Args:
         len_ (int): len of arrays
         type_ (str): Optional. 'poly1' or 'poly2'
+        seed (int): Optional. Seed of the random number generator
 
     Returns:
         beta_att_off (numpy array): estimated attenuated backscatter coefficient, off channel
@@ -52,29 +53,20 @@ def sim_noisy_beta_att(len_=400, type_='poly1'):
     """
 
     # generate simulated att beta profiles
-    if type_ is 'poly1':
+    if type_ == 'poly1':
         b = np.linspace(1, 1, num=len_)
         b_n = b
-    elif type_ is 'poly2':
+    elif type_ == 'poly2':
         b = -np.linspace(0, 1, len_) ** 2 + -np.linspace(0, 1, len_) + 0
         b_n = gu.renormalize(b, [b.min(), b.max()], [0, 1])
     else:
         raise ValueError("Optional input type_= can be 'poly1' or 'poly2' ")
 
-    c_on = np.empty(400, )
-    c_off = np.empty(400, )
-
-    for i in range(len_):
-        # role dice to add or subtract noise
-        dice = np.random.rand()
-        if dice > .5:
-            c_on[i] = b_n[i] + np.random.rand()*.33
-            c_off[i] = b_n[i] + np.random.rand()*.33
-            print(b_n[i], c_on[i])
-
-        else:
-            c_on[i] = b_n[i] - np.random.rand()*.33
-            c_off[i] = b_n[i] - np.random.rand()*.33
+    # role dice to add or subtract noise
+    rng = np.random.default_rng(seed)
+    sign_ = np.where(rng.random(len_) > .5, 1, -1)
+    c_on = b_n + sign_ * rng.random(len_)*.33
+    c_off = b_n + sign_ * rng.random(len_)*.33
 
     # generate off channel, normalize between reasonable values beta_att (Mm-1 sr-1)
     obs_beta_off = gu.renormalize(c_off, [c_off.min(), c_off.max()], [160, 240])
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the boundary layer classification of a synthetic day with known layers.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+import pytest
+from dialpy.equations.abl_classification import ABL_CLASSES, abl_class
+
+Z = 30. * np.arange(1, 41)
+N_TIMES = 20
+
+
+def synthetic_inputs():
+    """Surface connected turbulence in gates 0-9, an elevated turbulent layer in 20-24 with strong shear in the first
+    half of the day, turbulence below a cloud in 27-29, the cloud in 30-34, and no signal above it."""
+    epsilon = np.full((N_TIMES, len(Z)), 1e-6)
+    epsilon[:, :10] = epsilon[:, 20:25] = epsilon[:, 27:30] = 1e-3
+    epsilon[:, 35:] = np.nan
+    shear = np.full(epsilon.shape, .01)
+    shear[:N_TIMES // 2, 20:25] = .05
+    beta_att = np.full(epsilon.shape, 1e-6)
+    beta_att[:, 30:35] = 1e-4
+    beta_att[:, 35:] = 1e-9
+    return beta_att, epsilon, shear
+
+
+def test_layers_of_synthetic_day():
+    beta_att, epsilon, shear = synthetic_inputs()
+
+    classes = abl_class(Z, beta_att=beta_att, epsilon=epsilon, shear=shear)
+
+    assert classes.dtype == np.int8
+    expected_ = [(np.s_[:, :10], "convective_mixing"),
+                 (np.s_[:N_TIMES // 2, 20:25], "wind_shear_driven"),
+                 (np.s_[N_TIMES // 2:, 20:25], "intermittent_turbulence"),
+                 (np.s_[:, 27:30], "cloud_driven"),
+                 (np.s_[:, 30:35], "in_cloud"),
+                 (np.s_[:, 35:], "no_signal")]
+    for cells_, name in expected_:
+        np.testing.assert_array_equal(classes[cells_], ABL_CLASSES[name], err_msg=name)
+
+
+def test_variance_replaces_missing_epsilon():
+    beta_att, epsilon, shear = synthetic_inputs()
+    w_variance = np.where(epsilon > 1e-4, 1., .01)
+    epsilon[:, :10] = np.nan
+
+    classes = abl_class(Z, beta_att=beta_att, w_variance=w_variance, epsilon=epsilon, shear=shear)
+
+    np.testing.assert_array_equal(classes[:, :10], ABL_CLASSES["convective_mixing"])
+
+
+def test_without_inputs():
+    with pytest.raises(ValueError):
+        abl_class(Z)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the interpolation of model profiles onto the lidar grid against np.interp.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+from dialpy.equations import atmospheric_profiles
+
+TIME_SRC = np.array([0., 1., 2., 3.])
+TIME = np.array([-.5, 0., .25, 1.5, 2.9, 3.5])  # beyond the source times at both ends
+HEIGHT = np.array([-10., 0., 35., 150., 610., 990., 2500.])  # beyond the levels at both ends
+
+
+def expected_interpolation(height_src, field_, log_=False):
+    """np.interp in height at each source time, then in time."""
+    height_src = np.broadcast_to(height_src, field_.shape)
+    field_ = np.log(field_) if log_ else field_
+    f_z = np.array([np.interp(HEIGHT, z_, f_) for z_, f_ in zip(height_src, field_)])
+    f_t = np.array([np.interp(TIME, TIME_SRC, f_) for f_ in f_z.T]).T
+    return np.exp(f_t) if log_ else f_t
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    atmospheric_profiles.clear_cache()
+
+
+@pytest.mark.parametrize("height_src", [
+    np.array([0., 100., 300., 700., 1500.]),
+    np.array([[0., 100., 300., 700., 1500.],
+              [5., 90., 320., 650., 1400.],
+              [2., 110., 280., 720., 1600.],
+              [0., 100., 300., 700., 1500.]])])
+def test_grid_weights_match_np_interp(height_src):
+    rng = np.random.default_rng(4)
+    field_ = rng.uniform(200., 300., (len(TIME_SRC), 5))
+
+    weights_ = atmospheric_profiles.grid_weights(TIME_SRC, height_src, TIME, HEIGHT)
+
+    np.testing.assert_allclose(atmospheric_profiles.interpolate_to_grid(weights_, field_),
+                               expected_interpolation(height_src, field_))
+    np.testing.assert_allclose(atmospheric_profiles.interpolate_to_grid(weights_, field_, log_=True),
+                               expected_interpolation(height_src, field_, log_=True))
+
+
+def test_grid_weights_are_cached():
+    height_src = np.array([0., 100., 300., 700., 1500.])
+    weights_ = atmospheric_profiles.grid_weights(TIME_SRC, height_src, TIME, HEIGHT)
+
+    assert atmospheric_profiles.grid_weights(TIME_SRC.copy(), height_src.copy(), TIME, HEIGHT) is weights_
+    assert atmospheric_profiles.cache_info()["hits"] == 1
+    assert not weights_.z_weight.flags.writeable
+    # time-invariant levels are bracketed once
+    assert weights_.z_weight.shape == HEIGHT.shape
+
+
+def test_temperature_pressure_of_top_down_file(tmp_path):
+    height_src = np.array([1500., 700., 300., 100., 0.])  # model levels from the top down
+    temperature_ = 288. - 6.5e-3 * height_src + np.arange(len(TIME_SRC))[:, np.newaxis]
+    pressure_ = 1013.25 * np.exp(-height_src / 8000.) * np.ones((len(TIME_SRC), 1))
+    file_name = str(tmp_path / "model.nc")
+    with Dataset(file_name, "w") as nc:
+        nc.createDimension("time", len(TIME_SRC))
+        nc.createDimension("level", len(height_src))
+        nc.createVariable("time", "f8", ("time", ))[:] = TIME_SRC
+        nc.createVariable("height", "f8", ("level", ))[:] = height_src
+        nc.createVariable("temperature", "f8", ("time", "level"))[:] = temperature_
+        nc.createVariable("pressure", "f8", ("time", "level"))[:] = pressure_
+
+    T_, P_ = atmospheric_profiles.temperature_pressure(file_name, TIME, HEIGHT)
+
+    np.testing.assert_allclose(T_, expected_interpolation(height_src[::-1], temperature_[:, ::-1]))
+    np.testing.assert_allclose(P_, expected_interpolation(height_src[::-1], pressure_[:, ::-1] / 1013.25, log_=True))
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the cloud and precipitation masks, run from the repository root: python -m pytest tests
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import cloud_precip
+
+BETA_CLEAR = 1e-7
+BETA_CLOUD = 1e-4
+
+
+def clear_scene(n_time=40, n_range=60):
+    return np.full((n_time, n_range), BETA_CLEAR)
+
+
+def test_cloud_touching_time_and_range_borders():
+    beta_att = clear_scene()
+    beta_att[:10, :5] = BETA_CLOUD  # fog from the first profile and gate
+    beta_att[-10:, 30:40] = BETA_CLOUD  # cloud until the last profile
+    beta_att[15:25, -6:] = BETA_CLOUD  # cloud beyond the last gate
+
+    cloud_, precipitation_, cloud_base = cloud_precip.cloud_precip_masks(beta_att)
+
+    np.testing.assert_array_equal(cloud_, beta_att > BETA_CLEAR)
+    assert not precipitation_.any()
+    np.testing.assert_array_equal(cloud_base[:10], 0)
+    np.testing.assert_array_equal(cloud_base[-10:], 30)
+    np.testing.assert_array_equal(cloud_base[15:25], 54)
+    np.testing.assert_array_equal(cloud_base[10:15], -1)
+
+
+def test_small_objects_removed():
+    beta_att = clear_scene()
+    beta_att[0, 0] = BETA_CLOUD
+    beta_att[20:22, 20:22] = BETA_CLOUD
+
+    cloud_, _, cloud_base = cloud_precip.cloud_precip_masks(beta_att)
+
+    assert not cloud_.any()
+    np.testing.assert_array_equal(cloud_base, -1)
+
+
+def test_precipitation_below_cloud():
+    beta_att = clear_scene()
+    velo = np.zeros(beta_att.shape)
+    beta_att[:, 40:50] = BETA_CLOUD
+    beta_att[:, :40] = 1e-5 / 2
+    velo[:, :40] = -2.
+
+    flag_ = cloud_precip.cloud_precip_flag(*cloud_precip.cloud_precip_masks(beta_att, velo=velo))
+
+    assert np.all(flag_[:, :40] == cloud_precip.PRECIPITATION)
+    assert np.all(flag_[:, 40:50] == cloud_precip.CLOUD)
+    assert np.all(flag_[:, 50:] == cloud_precip.ABOVE_CLOUD_BASE)
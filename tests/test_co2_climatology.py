@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the streaming diurnal cycle climatology against numpy statistics of the same samples.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import co2_climatology
+
+HEIGHT_EDGES = np.array([0., 200., 400.])
+RANGE = np.array([50., 150., 250., 350., 450.])  # the last gate is above the grid
+TIME = np.arange(0., 24., 1 / 60)  # 1 min samples
+
+
+def daily_fields(n_days, seed=3):
+    rng = np.random.default_rng(seed)
+    # diurnal cycle, decreasing with height, and a skewed spread
+    cycle_ = 410. + 5 * np.sin(2 * np.pi * TIME / 24)[:, np.newaxis] - RANGE / 100
+    return [cycle_ + rng.gamma(2., 1.5, (len(TIME), len(RANGE))) for _ in range(n_days)]
+
+
+def bin_samples(days, hour, height):
+    in_hour = (TIME >= hour) & (TIME < hour + 1)
+    in_height = (RANGE >= HEIGHT_EDGES[height]) & (RANGE < HEIGHT_EDGES[height + 1])
+    return np.concatenate([day_[np.ix_(in_hour, in_height)].ravel() for day_ in days])
+
+
+def test_climatology_matches_numpy():
+    days = daily_fields(10)
+    days[0][:30, 0] = np.nan
+    climatology = co2_climatology.Climatology(HEIGHT_EDGES)
+    for day_ in days:
+        climatology.add(7, TIME, RANGE, day_)
+
+    stats = climatology.result(quantiles=(.05, .5, .95))
+
+    assert stats["quantiles"].shape == (12, 24, 2, 3)
+    assert np.all(stats["count"][:6] == 0) and np.all(np.isnan(stats["mean"][:6]))
+    for hour in (0, 13):
+        for height in (0, 1):
+            samples_ = bin_samples(days, hour, height)
+            samples_ = samples_[np.isfinite(samples_)]
+            assert stats["count"][6, hour, height] == len(samples_)
+            np.testing.assert_allclose(stats["mean"][6, hour, height], np.mean(samples_))
+            np.testing.assert_allclose(stats["std"][6, hour, height], np.std(samples_, ddof=1))
+            # the sketch is accurate to a tenth of the spread
+            np.testing.assert_allclose(stats["quantiles"][6, hour, height], np.quantile(samples_, (.05, .5, .95)),
+                                       atol=.1 * np.std(samples_))
+
+
+def test_merged_and_saved_climatologies(tmp_path):
+    days = daily_fields(6)
+    one_ = co2_climatology.Climatology(HEIGHT_EDGES, period="season")
+    first_ = co2_climatology.Climatology(HEIGHT_EDGES, period="season")
+    second_ = co2_climatology.Climatology(HEIGHT_EDGES, period="season")
+    for i_, day_ in enumerate(days):
+        one_.add(1, TIME, RANGE, day_)
+        (first_ if i_ % 2 else second_).add(1, TIME, RANGE, day_)
+    second_.save(tmp_path / "partial.npz")
+    first_.merge(co2_climatology.Climatology.load(tmp_path / "partial.npz"))
+
+    expected_, merged_ = one_.result(), first_.result()
+
+    np.testing.assert_array_equal(merged_["count"], expected_["count"])
+    np.testing.assert_allclose(merged_["mean"], expected_["mean"])
+    np.testing.assert_allclose(merged_["std"], expected_["std"])
+    samples_ = bin_samples(days, 5, 1)
+    np.testing.assert_allclose(merged_["quantiles"][0, 5, 1], np.quantile(samples_, co2_climatology.DEFAULT_QUANTILES),
+                               atol=.1 * np.std(samples_))
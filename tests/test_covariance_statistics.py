@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the streaming block statistics of attenuated backscatter and vertical velocity against numpy.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import covariance_statistics
+
+# 10 s samples of one hour, off the 3 min block edges
+TIME = np.arange(0., 1., 1 / 360) + 1 / 720
+SAMPLES_PER_BLOCK = 18
+
+
+def synthetic_fields(n_gates=4):
+    rng = np.random.default_rng(1)
+    velo = rng.standard_normal((len(TIME), n_gates))
+    beta_att = 1e-6 * (1 + .3 * velo + .1 * rng.standard_normal(velo.shape))
+    velo[40:45, 1] = np.nan
+    beta_att[50, 2] = np.nan
+    return beta_att, velo
+
+
+def test_block_statistics_match_numpy():
+    beta_att, velo = synthetic_fields()
+
+    stats = covariance_statistics.covariance_3min(TIME, beta_att, velo, t_max=1)
+
+    for b_ in range(len(stats["time_3min"])):
+        block_ = slice(b_ * SAMPLES_PER_BLOCK, (b_ + 1) * SAMPLES_PER_BLOCK)
+        for g_ in range(velo.shape[1]):
+            x, y = beta_att[block_, g_], velo[block_, g_]
+            both_ = np.isfinite(x) & np.isfinite(y)
+            np.testing.assert_allclose(stats["attbeta_mean"][b_, g_], np.nanmean(x))
+            np.testing.assert_allclose(stats["attbeta_variance"][b_, g_], np.nanvar(x, ddof=1))
+            np.testing.assert_allclose(stats["w_mean"][b_, g_], np.nanmean(y))
+            np.testing.assert_allclose(stats["w_variance"][b_, g_], np.nanvar(y, ddof=1))
+            np.testing.assert_allclose(stats["attbeta_velo_covariance"][b_, g_], np.cov(x[both_], y[both_])[0, 1])
+            np.testing.assert_allclose(stats["attbeta_velo_correlation"][b_, g_],
+                                       np.corrcoef(x[both_], y[both_])[0, 1])
+
+
+def test_merged_chunks_equal_one_chunk():
+    beta_att, velo = synthetic_fields()
+    one_ = covariance_statistics.CovarianceBlocks(velo.shape[1], t_max=1)
+    one_.add(TIME, beta_att, velo)
+
+    # split within a block
+    first_ = covariance_statistics.CovarianceBlocks(velo.shape[1], t_max=1)
+    second_ = covariance_statistics.CovarianceBlocks(velo.shape[1], t_max=1)
+    first_.add(TIME[:100], beta_att[:100], velo[:100])
+    second_.add(TIME[100:], beta_att[100:], velo[100:])
+    first_.merge(second_)
+
+    expected_, merged_ = one_.result(), first_.result()
+    for name in expected_:
+        np.testing.assert_allclose(merged_[name], expected_[name])
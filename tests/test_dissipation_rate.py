@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the TKE dissipation rate with synthetic vertical velocities.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import dissipation_rate
+
+
+def test_epsilon_inverts_the_structure_function_variance():
+    epsilon_true = np.array([1e-5, 1e-4, 1e-2])
+    wind_speed, n_samples, dwell_time, a_ = 5., 180, 1., dissipation_rate.KOLMOGOROV_CONSTANT
+    l_1, l_n = wind_speed * dwell_time, wind_speed * dwell_time * n_samples
+    sigma2_w = (epsilon_true / (2 * np.pi))**(2/3) * 1.5 * a_ * (l_n**(2/3) - l_1**(2/3))
+
+    epsilon = dissipation_rate.epsilon_from_variance(sigma2_w, wind_speed, n_samples, dwell_time)
+
+    np.testing.assert_allclose(epsilon, epsilon_true)
+    assert np.isnan(dissipation_rate.epsilon_from_variance(0., wind_speed, n_samples, dwell_time))
+
+
+def test_block_variance_separates_noise():
+    rng = np.random.default_rng(2)
+    # 1 s samples of one hour, a slow signal of variance 0.5 and white noise of variance 0.04
+    time_ = (np.arange(3600) + .5) / 3600
+    phase_ = rng.uniform(0, 2 * np.pi, 3)
+    signal_ = np.sin(2 * np.pi * time_ * 3600 / 180 + phase_[:, np.newaxis]).T
+    velo = signal_ + .2 * rng.standard_normal(signal_.shape)
+
+    time_blocks, n_, velo_var, noise_var = dissipation_rate.block_velocity_variance(time_, velo, t_max=1)
+
+    assert len(time_blocks) == 20
+    np.testing.assert_array_equal(n_, 180)
+    np.testing.assert_allclose(np.mean(velo_var), .5, rtol=.05)
+    np.testing.assert_allclose(np.mean(noise_var), .04, rtol=.2)
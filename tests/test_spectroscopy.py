@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the spectroscopy engine against a direct evaluation of the bundled 14 line HITRAN file, and of the legacy
+adapters against the engine.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import wofz
+from dialpy.equations import constants
+from dialpy.equations import spectroscopy
+from dialpy.equations import spectroscopy_cache
+from dialpy.equations import bytran_abs_cross_section
+from dialpy.equations import Johnsson_absroption_cross_section
+
+# strongest line of the bundled file (cm-1) and its air pressure shift (cm-1 atm-1)
+NU_STRONGEST = 6363.7276
+DELTA_AIR_STRONGEST = -0.005770
+# cross section at the shifted center of the strongest line at 296 K, 1 atm, 400 ppm (m2)
+SIGMA_STRONGEST = 6.9477e-27
+
+
+def direct_cross_section(nu_, co2_ppm=400.):
+    """Sum of HITRAN Voigt lines at 296 K and 1 atm, where the line intensities equal S_0, evaluated term by term."""
+    table_ = pd.read_csv(constants.PATH_TO_HITRAN, delimiter='\t', header=None).values
+    nu_0, S_0, gamma_air, gamma_self, delta_air = (table_[:, i].astype(float) for i in (1, 2, 4, 5, 8))
+    x_self = co2_ppm / 1e6
+    gamma_ = gamma_air * (1 - x_self) + gamma_self * x_self
+    molecule_mass = 43.989830e-3 / constants.AVOGADRO_NUMBER  # (kg)
+    alpha_doppler = nu_0 / constants.SPEED_OF_LIGHT * np.sqrt(2 * constants.BOLTZMANNS_CONSTANT * 296. * np.log(2) /
+                                                             molecule_mass)
+    sigma_gauss = alpha_doppler / np.sqrt(2 * np.log(2))
+    z_ = (nu_ - (nu_0 + delta_air) + 1j * gamma_) / (sigma_gauss * np.sqrt(2))
+    voigt_ = np.real(wofz(z_)) / (sigma_gauss * np.sqrt(2 * np.pi))
+    return np.sum(S_0 * voigt_) * 1e-4  # cm2 --> m2
+
+
+def test_line_center_cross_section():
+    nu_ = NU_STRONGEST + DELTA_AIR_STRONGEST
+    sigma_ = spectroscopy.absorption_cross_section(nu_, 296., 1.)
+
+    np.testing.assert_allclose(sigma_, direct_cross_section(nu_), rtol=1e-10)
+    np.testing.assert_allclose(sigma_, SIGMA_STRONGEST, rtol=1e-4)
+
+
+def test_spectrum_against_direct_evaluation():
+    nu_ = np.linspace(6363.5, 6364.5, 11)
+    sigma_ = spectroscopy.absorption_cross_section(nu_, 296., 101325., pressure_units='Pa')
+
+    np.testing.assert_allclose(sigma_, [direct_cross_section(n_) for n_ in nu_], rtol=1e-10)
+
+
+def test_cross_section_broadcasts_states():
+    T_ = np.array([[250.], [296.]])
+    sigma_ = spectroscopy.absorption_cross_section(6363.72, T_, np.array([.5, 1.]), co2_ppm=410.)
+
+    assert sigma_.shape == (2, 2)
+    np.testing.assert_allclose(sigma_[1, 1], spectroscopy.absorption_cross_section(6363.72, 296., 1., co2_ppm=410.))
+
+
+def test_memoized_cross_section_with_line_list():
+    lines = spectroscopy.load_line_list()
+    T_ = np.array([250., 250., 296.])
+    expected = spectroscopy.absorption_cross_section(NU_STRONGEST, T_, 1., lines=lines)
+
+    spectroscopy_cache.enable()
+    try:
+        spectroscopy.absorption_cross_section(NU_STRONGEST, T_, 1., lines=lines)
+        cached = spectroscopy.absorption_cross_section(NU_STRONGEST, T_, 1., lines=lines)
+        info = spectroscopy_cache.cache_info()["_cross_section"]
+    finally:
+        spectroscopy_cache.disable()
+
+    np.testing.assert_allclose(cached, expected, rtol=1e-4)
+    assert info["misses"] == 2 and info["hits"] == 2
+
+
+def test_static_key_of_arrays():
+    read_only = np.arange(5.)
+    read_only.setflags(write=False)
+    writeable = np.arange(5.)
+
+    # equal data gives equal keys, the digest of a read-only array is kept until the array is freed
+    assert spectroscopy_cache._static_key(read_only) == spectroscopy_cache._static_key(writeable)
+    assert id(read_only) in spectroscopy_cache._DIGESTS
+    writeable[0] = 1.
+    assert spectroscopy_cache._static_key(read_only) != spectroscopy_cache._static_key(writeable)
+    id_ = id(read_only)
+    del read_only
+    assert id_ not in spectroscopy_cache._DIGESTS
+
+
+def test_bytran_adapter():
+    T_ = np.array([250., 280., 296.])
+    P_ = np.array([.6, .8, 1.])
+    nu_ = spectroscopy.wavelength_to_wavenumber(constants.LAMBDA_ON)
+    tau_ = bytran_abs_cross_section.absorption_coefficient(500., nu_, T_, 400., P_)
+
+    sigma_ = spectroscopy.absorption_cross_section(nu_, T_, P_, 400.)
+    expected = sigma_ * 1e4 * spectroscopy.number_density_cm3(T_, P_, 400.) * 500. * 1e2 * 2
+    np.testing.assert_allclose(tau_, expected, rtol=1e-12)
+
+
+def test_johnsson_adapter():
+    T_ = np.array([250., 280., 296.])
+    P_ = np.array([6e4, 8e4, 101325.])
+    delta_sigma = Johnsson_absroption_cross_section.delta_absorption_cross_section(T_, P_)
+
+    expected = spectroscopy.differential_absorption_cross_section(
+        spectroscopy.wavelength_to_wavenumber(constants.LAMBDA_ON),
+        spectroscopy.wavelength_to_wavenumber(constants.LAMBDA_OFF), T_, P_, intensity_model='power_law',
+        width_model='air', pressure_units='Pa', pressure_shift=False)
+    np.testing.assert_allclose(delta_sigma, expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('fwhm_hz', [5e6, 200e6])
+def test_johnsson_adapter_with_laser_line(fwhm_hz):
+    T_ = np.array([250., 296.])
+    P_ = np.array([8e4, 101325.])
+    fwhm = spectroscopy.frequency_to_wavenumber(fwhm_hz)
+    delta_sigma = Johnsson_absroption_cross_section.delta_absorption_cross_section(T_, P_, laser_fwhm=fwhm)
+    monochromatic = Johnsson_absroption_cross_section.delta_absorption_cross_section(T_, P_)
+
+    # a laser line much narrower than the absorption line changes the cross section by little
+    np.testing.assert_allclose(delta_sigma, monochromatic, rtol=1e-3 if fwhm_hz < 1e7 else 1e-1)
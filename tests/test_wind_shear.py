@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Tests of the vector wind shear against analytic profiles.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import wind_shear
+
+DUDZ, DVDZ = .02, -.01
+
+
+def test_derivative_of_quadratic_on_uneven_grid():
+    z_ = np.array([0., 30., 50., 100., 180., 200.])
+
+    dfdz, _ = wind_shear.vertical_derivative(z_, z_**2)
+
+    # second order is exact inside the grid
+    np.testing.assert_allclose(dfdz[1:-1], 2 * z_[1:-1])
+
+
+def test_vector_wind_shear_of_linear_profile():
+    z_ = np.linspace(100., 1000., 31)
+    u = np.tile(DUDZ * z_, (5, 1))
+    v = np.tile(DVDZ * z_, (5, 1))
+
+    shear, shear_error = wind_shear.vector_wind_shear(z_, u, v, np.full(u.shape, .1), np.full(v.shape, .1))
+
+    np.testing.assert_allclose(shear, np.hypot(DUDZ, DVDZ))
+    assert np.all(shear_error > 0)
+
+
+def test_blocks_of_two_files_equal_one_file():
+    z_ = np.linspace(100., 1000., 31)
+    time_ = np.arange(0., 1., 1 / 360) + 1 / 720
+    u = DUDZ * z_ + np.sin(time_)[:, np.newaxis]
+    v = DVDZ * z_ + np.cos(time_)[:, np.newaxis]
+    u[100:110] = np.nan
+
+    one_ = wind_shear.WindShearBlocks(z_, t_max=1)
+    one_.add(time_, u, v)
+    first_, second_ = wind_shear.WindShearBlocks(z_, t_max=1), wind_shear.WindShearBlocks(z_, t_max=1)
+    first_.add(time_[:137], u[:137], v[:137])
+    second_.add(time_[137:], u[137:], v[137:])
+    first_.merge(second_)
+
+    for expected_, merged_ in zip(one_.result(), first_.result()):
+        np.testing.assert_allclose(merged_, expected_)
+    _, shear, _, u_mean, _ = one_.result()
+    np.testing.assert_allclose(shear, np.hypot(DUDZ, DVDZ))
+    np.testing.assert_allclose(u_mean[0, 0], np.mean(u[:18, 0]))
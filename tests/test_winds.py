@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Round trip tests of the VAD and DBS wind retrievals with a known wind.
+
+Created 2020-05-20
+Antti J Manninen
+Finnish Meteorological Institute
+"""
+
+import numpy as np
+from dialpy.equations import dbs_winds, vad_winds
+
+U_, V_, W_ = 3., -4., .2
+
+
+def radial_velocity(azimuth_, elevation_, u=U_, v=V_, w=W_):
+    return vad_winds.vad_design_matrix(azimuth_, elevation_) @ np.array([u, v, w])
+
+
+def test_vad_round_trip_with_masked_beams():
+    azimuth_ = np.arange(0., 360., 30.)
+    n_scans, n_gates = 4, 50
+    u = U_ * np.linspace(.5, 1.5, n_gates)
+    winds_true = np.stack([u, np.full(n_gates, V_), np.full(n_gates, W_)])
+    # (scan, beam, range)
+    velo = np.broadcast_to(vad_winds.vad_design_matrix(azimuth_, 75.) @ winds_true, (n_scans, len(azimuth_), n_gates))
+    velo = velo.copy()
+    velo[1, :3, :] = np.nan  # partially masked beams
+    velo[2, :9, 10] = np.nan  # too few valid beams in one gate
+
+    winds = vad_winds.vad_winds(velo, azimuth_, 75.)
+
+    valid_ = np.ones((n_scans, n_gates), dtype=bool)
+    valid_[2, 10] = False
+    np.testing.assert_allclose(winds["u"][valid_], np.broadcast_to(u, (n_scans, n_gates))[valid_], atol=1e-10)
+    np.testing.assert_allclose(winds["v"][valid_], V_, atol=1e-10)
+    np.testing.assert_allclose(winds["w"][valid_], W_, atol=1e-10)
+    assert np.isnan(winds["u"][2, 10])
+    np.testing.assert_allclose(winds["wind_speed"][0, 25], np.hypot(u[25], V_))
+    # wind from the northwest, blowing to the southeast
+    np.testing.assert_allclose(winds["wind_direction"][0, 25], np.rad2deg(np.arctan2(-u[25], -V_)) % 360)
+
+
+def test_vad_precision_of_noisy_scans():
+    rng = np.random.default_rng(0)
+    azimuth_ = np.arange(0., 360., 15.)
+    velo = radial_velocity(azimuth_, 70.)[np.newaxis, :, np.newaxis] + .1 * rng.standard_normal((200, 24, 1))
+
+    winds = vad_winds.vad_winds(velo, azimuth_, 70., velo_precision=.1)
+
+    # scatter of the estimates matches the instrumental precision
+    np.testing.assert_allclose(np.std(winds["u"]), np.median(winds["u_instrumental_precision"]), rtol=.2)
+    np.testing.assert_allclose(np.mean(winds["u"]), U_, atol=.01)
+
+
+def test_dbs_round_trip():
+    azimuth_ = np.array([0., 90., 180., 270., 0.])
+    elevation_ = np.array([75., 75., 75., 75., 90.])
+    n_gates = 30
+    # beams measured one after another, winds constant in time
+    time_ = [np.arange(0., 1., .1) + k * .02 for k in range(len(azimuth_))]
+    velo = [np.full((len(t_), n_gates), radial_velocity(a_, e_)) for t_, a_, e_ in zip(time_, azimuth_, elevation_)]
+
+    winds = dbs_winds.dbs_winds(velo, time_, azimuth_, elevation_, time_out=np.array([.15, .5, .85]),
+                                velo_precision=[.1] * len(azimuth_))
+
+    np.testing.assert_allclose(winds["u"], U_, atol=1e-10)
+    np.testing.assert_allclose(winds["v"], V_, atol=1e-10)
+    np.testing.assert_allclose(winds["w"], W_, atol=1e-10)
+    assert np.all(winds["u_instrumental_precision"] > 0)
+
+
+def test_dbs_interpolation_masks_gaps():
+    i_0, weight_ = dbs_winds.interpolation_weights(np.array([0., 1., 5.]), np.array([.5, 3., 6.]), max_time_gap=2.)
+
+    np.testing.assert_array_equal(i_0, [0, 1, 1])
+    np.testing.assert_allclose(weight_, [.5, np.nan, np.nan])